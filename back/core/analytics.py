@@ -0,0 +1,199 @@
+"""
+Time-in-status (SLA) analytics over CorrespondenceStatusLog.
+
+A letter's dwell in a status is the time between the log row that moved it
+into the status and the next log row of the same letter. Consecutive rows
+are paired in SQL with ``LAG()`` over each letter's log ordered by
+``(created_at, id)``.
+
+The statistics are materialized in ``StatusDwellRollup`` (one row per
+correspondence type and status). A refresh only looks at log rows with an id
+above the ``RollupCheckpoint``: it re-reads the logs of the letters those
+rows belong to, so each new row finds its predecessor, and merges the closed
+dwells into the rollup. Dashboards read the rollup and never scan the log;
+the dwell-times endpoint folds in at most one batch per request, and
+``manage.py refresh_status_analytics`` catches up on any backlog.
+
+Percentiles are estimated from a log-scale histogram (about 19% per bucket),
+which, unlike exact percentiles, can be merged incrementally. Log rows are
+assumed append-only with ``auto_now_add`` timestamps; run
+``refresh_status_analytics --rebuild`` after editing history.
+"""
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import Lag
+from django.utils import timezone
+
+from .models import CorrespondenceStatusLog, StatusDwellRollup, RollupCheckpoint
+
+
+CHECKPOINT_NAME = 'status_dwell'
+BUCKETS_PER_DOUBLING = 4
+BATCH_SIZE = 5000
+
+
+# ====================================== HISTOGRAMS ======================================
+def bucket_for(seconds):
+    """Histogram bucket of a duration; bucket 0 holds everything under a second"""
+    if seconds < 1:
+        return 0
+    return int(math.floor(math.log2(seconds) * BUCKETS_PER_DOUBLING)) + 1
+
+
+def bucket_bounds(index):
+    """``(lower, upper)`` seconds covered by a bucket"""
+    if index == 0:
+        return 0.0, 1.0
+    return 2 ** ((index - 1) / BUCKETS_PER_DOUBLING), 2 ** (index / BUCKETS_PER_DOUBLING)
+
+
+def estimate_percentile(histogram, q, low=None, high=None):
+    """Estimate the ``q`` quantile (0..1) from bucket counts, clamped to the observed range"""
+    count = sum(histogram.values())
+    if not count:
+        return None
+    rank = q * count
+    seen = 0
+    for index in sorted(histogram, key=int):
+        in_bucket = histogram[index]
+        if in_bucket and seen + in_bucket >= rank:
+            lower, upper = bucket_bounds(int(index))
+            value = lower + (upper - lower) * (rank - seen) / in_bucket
+            if low is not None:
+                value = max(value, low)
+            if high is not None:
+                value = min(value, high)
+            return value
+        seen += in_bucket
+    return high
+
+
+# ====================================== REFRESH ======================================
+def closed_dwells(after_id, upto_id):
+    """
+    Yield ``(type_id, status_name, seconds)`` for every dwell closed by a log
+    row with ``after_id < id <= upto_id``.
+    """
+    touched = CorrespondenceStatusLog.objects.filter(id__gt=after_id, id__lte=upto_id).values('correspondence_id')
+    window = {
+        'partition_by': [F('correspondence_id')],
+        'order_by': [F('created_at').asc(), F('id').asc()],
+    }
+    rows = (
+        CorrespondenceStatusLog.objects
+        .filter(correspondence_id__in=touched)
+        .annotate(
+            previous_status=Window(Lag('to_status_name'), **window),
+            previous_at=Window(Lag('created_at'), **window),
+        )
+        .filter(previous_at__isnull=False)
+        .values_list('id', 'correspondence__type_id', 'previous_status', 'previous_at', 'created_at')
+    )
+    # The id range is checked here: filtering it in SQL would hide the
+    # predecessors from LAG()
+    for log_id, type_id, status_name, entered_at, left_at in rows:
+        if after_id < log_id <= upto_id and status_name:
+            yield type_id, status_name, max((left_at - entered_at).total_seconds(), 0.0)
+
+
+def merge_dwells(dwells):
+    """Add ``(type_id, status_name, seconds)`` dwells to the rollup rows"""
+    grouped = defaultdict(list)
+    for type_id, status_name, seconds in dwells:
+        grouped[(type_id, status_name)].append(seconds)
+    if not grouped:
+        return
+
+    existing = {
+        (rollup.correspondence_type_id, rollup.status_name): rollup
+        for rollup in StatusDwellRollup.objects.select_for_update().filter(
+            status_name__in={status_name for _, status_name in grouped}
+        )
+    }
+    to_create, to_update = [], []
+    for (type_id, status_name), durations in grouped.items():
+        rollup = existing.get((type_id, status_name))
+        if rollup is None:
+            rollup = StatusDwellRollup(correspondence_type_id=type_id, status_name=status_name, histogram={})
+            to_create.append(rollup)
+        else:
+            to_update.append(rollup)
+        rollup.count += len(durations)
+        rollup.total_seconds += sum(durations)
+        rollup.min_seconds = min(durations + ([rollup.min_seconds] if rollup.min_seconds is not None else []))
+        rollup.max_seconds = max(durations + ([rollup.max_seconds] if rollup.max_seconds is not None else []))
+        for seconds in durations:
+            key = str(bucket_for(seconds))
+            rollup.histogram[key] = rollup.histogram.get(key, 0) + 1
+        rollup.updated_at = timezone.now()
+
+    StatusDwellRollup.objects.bulk_create(to_create)
+    StatusDwellRollup.objects.bulk_update(
+        to_update, ['count', 'total_seconds', 'min_seconds', 'max_seconds', 'histogram', 'updated_at']
+    )
+
+
+def refresh_dwell_rollup(batch_size=BATCH_SIZE, max_batches=None):
+    """
+    Fold the status logs added since the last refresh into the rollup.
+
+    Works in batches of ``batch_size`` log rows, one transaction each, and
+    stops after ``max_batches`` batches (default: when caught up). The
+    checkpoint is advanced with a compare-and-set, so when two refreshes race
+    only one of them merges a batch. Returns the number of dwells merged.
+    """
+    merged = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        batches += 1
+        with transaction.atomic():
+            checkpoint, _ = RollupCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+            after_id = checkpoint.last_id
+            new_ids = list(
+                CorrespondenceStatusLog.objects.filter(id__gt=after_id)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not new_ids:
+                return merged
+            upto_id = new_ids[-1]
+            claimed = RollupCheckpoint.objects.filter(pk=checkpoint.pk, last_id=after_id).update(
+                last_id=upto_id, refreshed_at=timezone.now()
+            )
+            if not claimed:
+                return merged
+            dwells = list(closed_dwells(after_id, upto_id))
+            merge_dwells(dwells)
+            merged += len(dwells)
+    return merged
+
+
+def rollup_is_current():
+    """Whether every status log row has been folded into the rollup"""
+    checkpoint = RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+    return not CorrespondenceStatusLog.objects.filter(id__gt=checkpoint.last_id if checkpoint else 0).exists()
+
+
+def rebuild_dwell_rollup(batch_size=BATCH_SIZE):
+    """Drop the rollup and recompute it from the whole log"""
+    with transaction.atomic():
+        StatusDwellRollup.objects.all().delete()
+        RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).delete()
+    return refresh_dwell_rollup(batch_size)
+
+
+def dwell_statistics(rollup):
+    """Public statistics of a rollup row (durations in seconds)"""
+    return {
+        'correspondence_type': rollup.correspondence_type_id,
+        'type_name': rollup.correspondence_type.type_name if rollup.correspondence_type else None,
+        'status_name': rollup.status_name,
+        'count': rollup.count,
+        'mean_seconds': rollup.total_seconds / rollup.count if rollup.count else None,
+        'p50_seconds': estimate_percentile(rollup.histogram, 0.5, rollup.min_seconds, rollup.max_seconds),
+        'p95_seconds': estimate_percentile(rollup.histogram, 0.95, rollup.min_seconds, rollup.max_seconds),
+        'min_seconds': rollup.min_seconds,
+        'max_seconds': rollup.max_seconds,
+    }
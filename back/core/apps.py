@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def repair_search_index(sender, using, **kwargs):
+    """Reinstall the full-text triggers a SQLite table rebuild may have dropped"""
+    from django.db import connections
+    from .search import ensure_search_index
+    ensure_search_index(connections[using])
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import signals, tasks  # noqa: F401
+        post_migrate.connect(repair_search_index, sender=self)
@@ -0,0 +1,56 @@
+"""
+Arabic text normalization for name search.
+
+Names typed at the gate desk often differ from the stored record only by
+spelling variants that Arabic readers treat as equivalent. Both the stored
+search key and the user's query go through ``normalize_arabic`` so that:
+
+- alef forms (أ إ آ ٱ) match bare alef (ا)
+- hamza on waw / ya (ؤ ئ) match waw / ya (و ي)
+- alef maqsura (ى) matches ya (ي)
+- ta marbuta (ة) matches ha (ه)
+- diacritics (tashkeel) and tatweel are ignored
+- Latin text is case-folded
+"""
+import re
+
+_TRANSLATION = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ؤ': 'و', 'ئ': 'ي',
+    'ى': 'ي',
+    'ة': 'ه',
+    'ـ': None,  # tatweel
+})
+
+# Harakat, tanween, shadda, sukun, superscript alef and Quranic marks
+_DIACRITICS_RE = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed]')
+_NON_WORD_RE = re.compile(r'[^\w\s]', re.UNICODE)
+_SPACES_RE = re.compile(r'\s+')
+
+# Upper bound appended to a prefix to turn it into an index-friendly range
+PREFIX_RANGE_END = '\U0010ffff'
+
+
+def normalize_arabic(text):
+    """Return the normalized search form of ``text`` ('' for empty input)"""
+    if not text:
+        return ''
+    text = _DIACRITICS_RE.sub('', text)
+    text = text.translate(_TRANSLATION).casefold()
+    text = _NON_WORD_RE.sub(' ', text)
+    return _SPACES_RE.sub(' ', text).strip()
+
+
+def name_tokens(*names):
+    """Return the distinct normalized tokens of the given names"""
+    tokens = []
+    for name in names:
+        for token in normalize_arabic(name).split():
+            if token not in tokens:
+                tokens.append(token)
+    return tokens
+
+
+def prefix_range(prefix):
+    """``(lower, upper)`` bounds matching every string starting with ``prefix``"""
+    return prefix, prefix + PREFIX_RANGE_END
@@ -0,0 +1,211 @@
+"""
+API benchmark suite.
+
+Each scenario is one request to a hot endpoint, sent through the Django test
+client against a generated dataset (see ``populate_fake_data``). A scenario
+is repeated ``iterations`` times after a warm-up and reported as p50/p95
+latency, the number of queries and the peak Python memory (``tracemalloc``,
+measured in extra traced runs so tracing does not skew the timings). The
+lowest peak of ``MEMORY_RUNS`` runs is kept: process-wide structures (e.g.
+the test client's signal registry) occasionally grow inside whichever
+request happens to hit their resize, which says nothing about the endpoint.
+
+``compare`` checks a run against stored baselines. A scenario regresses
+when its p95 latency or peak memory grows by more than the tolerance, or
+when it runs more queries than its baseline. Growth smaller than a fixed
+margin, or than a few times the baseline's own p50-to-p95 spread, is
+treated as noise: a p95 over a few dozen samples moves about that much
+between runs on an unchanged tree.
+"""
+import gc
+import time
+import tracemalloc
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .models import Correspondence, PeopleHistory
+
+
+# Absolute margins below which a relative increase is treated as noise
+MIN_LATENCY_DELTA_MS = 5.0
+MIN_MEMORY_DELTA_KB = 64
+# p95 growth up to this many times the baseline's (p95 - p50) spread is noise
+SPREAD_FACTOR = 3
+MEMORY_RUNS = 3
+
+
+def minimal_pdf(text):
+    """A one-page PDF showing ``text`` in Helvetica"""
+    stream = f'BT /F1 12 Tf 72 770 Td ({text}) Tj ET'.encode('latin-1')
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R '
+        b'/Resources << /Font << /F1 5 0 R >> >> >>',
+        b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    pdf = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        pdf += b'%010d 00000 n \n' % offset
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(pdf)
+
+
+class Scenario:
+    """
+    One benchmarked request. ``path`` and ``data`` may be callables taking the
+    suite context, so ids and upload files are fresh on every call. An
+    ``optional`` scenario is skipped (not failed) when it answers 500, e.g.
+    because an optional library is missing.
+    """
+
+    def __init__(self, name, path, method='get', data=None, expect=200, optional=False, authenticated=True):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.data = data
+        self.expect = expect
+        self.optional = optional
+        self.authenticated = authenticated
+
+    def request(self, client, anonymous, context):
+        path = self.path(context) if callable(self.path) else self.path
+        data = self.data(context) if callable(self.data) else self.data
+        target = client if self.authenticated else anonymous
+        kwargs = {'format': 'multipart'} if self.method == 'post' else {}
+        response = getattr(target, self.method)(path, data, **kwargs)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+
+def _upload(context):
+    return {
+        'correspondence_id': context['letter_id'],
+        'files': SimpleUploadedFile('benchmark.pdf', context['pdf'], content_type='application/pdf'),
+    }
+
+
+def _pdf_file(context):
+    return {'file': SimpleUploadedFile('7612 dd 22072025_Benchmark.pdf', context['pdf'], content_type='application/pdf')}
+
+
+SCENARIOS = [
+    Scenario('correspondence-list', '/api/correspondence/'),
+    Scenario('correspondence-search', '/api/correspondence/', data={'search': 'clearance'}),
+    Scenario('correspondence-filter', '/api/correspondence/', data={
+        'direction': 'Incoming', 'priority': 'high', 'ordering': '-correspondence_date',
+    }),
+    Scenario('correspondence-detail', lambda context: f"/api/correspondence/{context['letter_id']}/"),
+    Scenario('people-search', '/api/people-history/', data=lambda context: {'search': context['person_name']}),
+    Scenario('permits-expiring-soon', '/api/permits/expiring_soon/'),
+    Scenario('dashboard-stats', '/api/dashboard/stats/'),
+    Scenario('login', '/api/auth/login/', method='post', authenticated=False,
+             data=lambda context: {'username': context['username'], 'password': context['password']}),
+    Scenario('attachment-upload', '/api/attachments/upload/', method='post', data=_upload, expect=201),
+    Scenario('attachment-download', lambda context: f"/api/attachments/{context['attachment_id']}/download/"),
+    Scenario('parse-pdf-content', '/api/parse-pdf-content/', method='post', data=_pdf_file, optional=True),
+]
+
+
+def build_context(client, username, password):
+    """Ids and inputs the scenarios need, taken from the generated dataset"""
+    letter_id = Correspondence.objects.order_by('-correspondence_id').values_list('pk', flat=True).first()
+    name = PeopleHistory.objects.filter(is_current=True).values_list('full_name_arabic', flat=True).first()
+    context = {
+        'letter_id': letter_id,
+        'person_name': name.split()[0] if name else 'محمد',
+        'username': username,
+        'password': password,
+        'pdf': minimal_pdf('7612 dd 22.07.2025'),
+    }
+    response = client.post('/api/attachments/upload/', _upload(context), format='multipart')
+    context['attachment_id'] = response.data['files'][0]['attachment_id']
+    return context
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of ``values`` (0 < q <= 100)"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def run_scenario(scenario, client, anonymous, context, iterations=100, warmup=10):
+    """Measure one scenario; returns a result dict"""
+    for _ in range(max(1, warmup)):
+        response = scenario.request(client, anonymous, context)
+    if response.status_code != scenario.expect:
+        if scenario.optional and response.status_code >= 500:
+            return {'status': 'skipped', 'detail': f'HTTP {response.status_code}'}
+        return {'status': 'error', 'detail': f'HTTP {response.status_code}, expected {scenario.expect}'}
+
+    timings, queries = [], []
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            scenario.request(client, anonymous, context)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(ctx.captured_queries))
+
+    peaks = []
+    for _ in range(MEMORY_RUNS):
+        # Collect earlier garbage now, not inside the traced request
+        gc.collect()
+        tracemalloc.start()
+        try:
+            scenario.request(client, anonymous, context)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'status': 'ok',
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'queries': max(queries),
+        'peak_kb': round(min(peaks) / 1024),
+    }
+
+
+def run_suite(client, anonymous, context, scenarios=None, iterations=100, warmup=10):
+    """``{scenario name: result}`` for every scenario, in order"""
+    return {
+        scenario.name: run_scenario(scenario, client, anonymous, context, iterations, warmup)
+        for scenario in scenarios or SCENARIOS
+    }
+
+
+def compare(results, baselines, tolerance=0.5):
+    """Human-readable regressions of ``results`` against ``baselines`` (both ``{name: result}``)"""
+    regressions = []
+    for name, result in results.items():
+        if result['status'] == 'error':
+            regressions.append(f"{name}: {result['detail']}")
+            continue
+        baseline = baselines.get(name)
+        if result['status'] != 'ok' or not baseline:
+            continue
+        latency_allowance = max(
+            baseline['p95_ms'] * tolerance,
+            MIN_LATENCY_DELTA_MS,
+            SPREAD_FACTOR * (baseline['p95_ms'] - baseline.get('p50_ms', baseline['p95_ms'])),
+        )
+        if result['p95_ms'] - baseline['p95_ms'] > latency_allowance:
+            regressions.append(f"{name}: p95 {result['p95_ms']}ms > baseline {baseline['p95_ms']}ms")
+        if result['queries'] > baseline['queries']:
+            regressions.append(f"{name}: {result['queries']} queries > baseline {baseline['queries']}")
+        if (result['peak_kb'] > baseline['peak_kb'] * (1 + tolerance)
+                and result['peak_kb'] - baseline['peak_kb'] > MIN_MEMORY_DELTA_KB):
+            regressions.append(f"{name}: peak memory {result['peak_kb']}KB > baseline {baseline['peak_kb']}KB")
+    return regressions
@@ -0,0 +1,248 @@
+"""
+Bulk writes for correspondence: imports and status transitions.
+
+``bulk_create_correspondence`` validates a whole import in one pass. Fields
+are checked row by row without queries, then related ids and the
+``reference_number`` + ``correspondence_date`` uniqueness are checked with a
+handful of set-based queries for the whole batch. Valid rows are written
+with ``bulk_create`` (letters, then their initial status logs) in
+transactions of ``BULK_BATCH_SIZE`` rows.
+
+``bulk_transition`` moves many letters to a procedure with a single
+``UPDATE`` and a single ``bulk_create`` of their status logs.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import (
+    Correspondence, CorrespondenceTypes, Contacts, CorrespondenceTypeProcedure, CorrespondenceStatusLog
+)
+from .serializers import CorrespondenceBulkItemSerializer
+
+
+INITIAL_LOG_REASON = 'Initial correspondence creation'
+
+# validated_data key -> (public field name, related model)
+RELATED_FIELDS = {
+    'parent_correspondence_id': ('parent_correspondence', Correspondence),
+    'type_id': ('type', CorrespondenceTypes),
+    'contact_id': ('contact', Contacts),
+    'assigned_to_id': ('assigned_to', get_user_model()),
+}
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _existing_ids(model, ids, batch_size):
+    found = set()
+    for chunk in _chunks(sorted(ids), batch_size):
+        found.update(model.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+    return found
+
+
+def _existing_keys(rows, batch_size):
+    """(reference_number, correspondence_date) pairs of ``rows`` already in the database"""
+    found = set()
+    references = sorted({data['reference_number'] for _, data in rows})
+    for chunk in _chunks(references, batch_size):
+        found.update(
+            Correspondence.objects.filter(reference_number__in=chunk)
+            .values_list('reference_number', 'correspondence_date')
+        )
+    return found
+
+
+def _error(index, errors, outcome='invalid'):
+    return {'index': index, 'status': outcome, 'errors': errors}
+
+
+def validate_rows(rows, batch_size):
+    """
+    Validate import rows.
+
+    Returns ``(results, valid, procedures)``: ``results`` holds an error entry
+    for each rejected row (None for accepted ones), ``valid`` the
+    ``(index, validated_data)`` of accepted rows and ``procedures`` maps
+    status id -> procedure name for the accepted rows.
+    """
+    results = [None] * len(rows)
+    valid = []
+    for index, row in enumerate(rows):
+        item = CorrespondenceBulkItemSerializer(data=row)
+        if item.is_valid():
+            valid.append((index, item.validated_data))
+        else:
+            results[index] = _error(index, item.errors)
+
+    existing = {
+        key: _existing_ids(model, {data[key] for _, data in valid if data.get(key)}, batch_size)
+        for key, (_, model) in RELATED_FIELDS.items()
+    }
+    status_ids = {data['current_status_id'] for _, data in valid if data.get('current_status_id')}
+    procedures = {}
+    for chunk in _chunks(sorted(status_ids), batch_size):
+        for pk, type_id, name in CorrespondenceTypeProcedure.objects.filter(pk__in=chunk).values_list(
+            'pk', 'correspondence_type_id', 'procedure_name'
+        ):
+            procedures[pk] = (type_id, name)
+    taken = _existing_keys(valid, batch_size)
+
+    accepted = []
+    for index, data in valid:
+        errors = {}
+        for key, (field, _) in RELATED_FIELDS.items():
+            if data.get(key) and data[key] not in existing[key]:
+                errors[field] = [f'Invalid pk "{data[key]}" - object does not exist.']
+        status_id = data.get('current_status_id')
+        if status_id:
+            if status_id not in procedures:
+                errors['current_status'] = [f'Invalid pk "{status_id}" - object does not exist.']
+            elif data.get('type_id') and procedures[status_id][0] != data['type_id']:
+                errors['current_status'] = ['Procedure does not belong to the correspondence type.']
+        key = (data['reference_number'], data['correspondence_date'])
+        if key in taken:
+            errors['non_field_errors'] = [
+                'The fields reference_number, correspondence_date must make a unique set.'
+            ]
+        if errors:
+            results[index] = _error(index, errors)
+        else:
+            taken.add(key)
+            accepted.append((index, data))
+    return results, accepted, {pk: name for pk, (_, name) in procedures.items()}
+
+
+def _write_batch(rows, procedures, user):
+    """Insert one batch of letters and their initial status logs; returns the letters"""
+    letters = Correspondence.objects.bulk_create([Correspondence(**data) for _, data in rows])
+    if any(letter.pk is None for letter in letters):
+        # Backends that cannot return ids from a bulk insert
+        ids = dict(
+            ((reference, day), pk) for pk, reference, day in
+            Correspondence.objects.filter(reference_number__in={letter.reference_number for letter in letters})
+            .values_list('pk', 'reference_number', 'correspondence_date')
+        )
+        for letter in letters:
+            letter.pk = ids[(letter.reference_number, letter.correspondence_date)]
+    CorrespondenceStatusLog.objects.bulk_create([
+        CorrespondenceStatusLog(
+            correspondence=letter,
+            form_status_name=None,
+            to_status_name=procedures[letter.current_status_id],
+            changed_by=user,
+            change_reason=INITIAL_LOG_REASON,
+        )
+        for letter in letters if letter.current_status_id
+    ])
+    return letters
+
+
+def bulk_create_correspondence(rows, user=None, all_or_nothing=False, batch_size=None):
+    """
+    Create correspondence from a list of row dicts.
+
+    Returns ``(results, created)`` where ``results`` has one entry per input
+    row, in order: ``{'index', 'status': 'created', 'correspondence_id'}`` or
+    ``{'index', 'status': 'invalid' | 'failed' | 'skipped', 'errors'}``. With
+    ``all_or_nothing`` nothing is written unless every row is valid.
+    """
+    batch_size = batch_size or getattr(settings, 'BULK_BATCH_SIZE', 500)
+    user = user if user is not None and user.is_authenticated else None
+    results, accepted, procedures = validate_rows(rows, batch_size)
+
+    if all_or_nothing and len(accepted) != len(rows):
+        for index, _ in accepted:
+            results[index] = _error(index, {'non_field_errors': ['Not written because other rows are invalid.']}, 'skipped')
+        return results, 0
+
+    batches = list(_chunks(accepted, batch_size))
+    written = []
+    if all_or_nothing:
+        try:
+            with transaction.atomic():
+                written = [(batch, _write_batch(batch, procedures, user)) for batch in batches]
+        except IntegrityError:
+            for index, _ in accepted:
+                results[index] = _error(index, {'non_field_errors': ['Conflicting write, nothing was written.']}, 'failed')
+            return results, 0
+    else:
+        for batch in batches:
+            try:
+                with transaction.atomic():
+                    written.append((batch, _write_batch(batch, procedures, user)))
+            except IntegrityError:
+                for index, _ in batch:
+                    results[index] = _error(index, {'non_field_errors': ['Conflicting write, retry this row.']}, 'failed')
+
+    created = 0
+    for batch, letters in written:
+        for (index, _), letter in zip(batch, letters):
+            results[index] = {'index': index, 'status': 'created', 'correspondence_id': letter.pk}
+        created += len(letters)
+    return results, created
+
+
+def bulk_transition(ids, procedure, user=None, reason=None, all_or_nothing=False):
+    """
+    Move the letters ``ids`` to ``procedure``.
+
+    Inside one transaction: one locking SELECT of the letters, one SELECT of
+    their current procedure names, one ``UPDATE`` and one ``bulk_create`` of
+    status logs. The locking SELECT has no joins: PostgreSQL refuses
+    ``FOR UPDATE`` on the nullable side of an outer join. A letter is rejected when it does
+    not exist, has no type or its type is not the procedure's type; letters
+    already in ``procedure`` are left alone. Returns ``(changed, rejected)``
+    lists of dicts.
+    """
+    user = user if user is not None and user.is_authenticated else None
+    ids = list(dict.fromkeys(ids))
+    with transaction.atomic():
+        letters = {
+            pk: (type_id, status_id)
+            for pk, type_id, status_id in Correspondence.objects.select_for_update()
+            .filter(pk__in=ids)
+            .values_list('pk', 'type_id', 'current_status_id')
+        }
+        status_names = dict(
+            CorrespondenceTypeProcedure.objects
+            .filter(pk__in={status_id for _, status_id in letters.values() if status_id is not None})
+            .values_list('pk', 'procedure_name')
+        )
+        changed, rejected = [], []
+        for pk in ids:
+            if pk not in letters:
+                rejected.append({'correspondence_id': pk, 'reason': 'Correspondence not found.'})
+                continue
+            type_id, status_id = letters[pk]
+            if type_id != procedure.correspondence_type_id:
+                rejected.append({'correspondence_id': pk, 'reason': 'Procedure does not belong to the correspondence type.'})
+            elif status_id == procedure.pk:
+                rejected.append({'correspondence_id': pk, 'reason': 'Already in this status.'})
+            else:
+                changed.append({
+                    'correspondence_id': pk, 'from_status': status_names.get(status_id),
+                    'to_status': procedure.procedure_name
+                })
+
+        if not changed or (all_or_nothing and rejected):
+            return [], rejected
+
+        Correspondence.objects.filter(pk__in=[row['correspondence_id'] for row in changed]).update(
+            current_status=procedure, updated_at=timezone.now()
+        )
+        CorrespondenceStatusLog.objects.bulk_create([
+            CorrespondenceStatusLog(
+                correspondence_id=row['correspondence_id'],
+                form_status_name=row['from_status'],
+                to_status_name=row['to_status'],
+                changed_by=user,
+                change_reason=reason,
+            )
+            for row in changed
+        ])
+    return changed, rejected
@@ -0,0 +1,130 @@
+"""
+Dashboard statistics.
+
+Every figure is computed with one aggregate query (a GROUP BY, or a single
+row of conditional counts), and the whole payload is cached for
+``DASHBOARD_CACHE_TIMEOUT`` seconds.
+
+Recomputing is single-flighted. Inside a worker, a lock lets one thread
+compute while the others wait for its result. Across workers, a short-lived
+cache lock (``cache.add``) elects one computing worker, and the rest poll the
+cache for up to ``DASHBOARD_LOCK_WAIT`` seconds before computing themselves.
+"""
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import (
+    Correspondence, Permits, CardPermits, Relocation, PeopleHistory, Vehicle, Accidents
+)
+
+
+CACHE_KEY = 'dashboard:stats'
+LOCK_KEY = 'dashboard:stats:lock'
+EXPIRING_WITHIN_DAYS = 30
+MONTHS = 12
+
+_compute_lock = threading.Lock()
+
+
+def _grouped(queryset, path):
+    """``[{'value', 'count'}]`` from one GROUP BY over ``path``"""
+    rows = queryset.order_by().values_list(path).annotate(count=Count('pk')).order_by('-count', path)
+    return [{'value': value, 'count': count} for value, count in rows]
+
+
+def _first_month(today, months):
+    year, month = today.year, today.month - (months - 1)
+    while month < 1:
+        month += 12
+        year -= 1
+    return date(year, month, 1)
+
+
+def compute_dashboard_stats():
+    """Build the dashboard payload (one query per figure, no caching)"""
+    today = timezone.localdate()
+    soon = today + timedelta(days=EXPIRING_WITHIN_DAYS)
+    letters = Correspondence.objects.all()
+
+    by_month = (
+        letters.filter(correspondence_date__gte=_first_month(today, MONTHS))
+        .order_by()
+        .annotate(month=TruncMonth('correspondence_date'))
+        .values_list('month')
+        .annotate(count=Count('pk'))
+        .order_by('month')
+    )
+    permits = Permits.objects.aggregate(
+        total=Count('pk'),
+        active=Count('pk', filter=Q(permit_status='Active')),
+        expiring_soon=Count('pk', filter=Q(permit_status='Active', expiry_date__gte=today, expiry_date__lte=soon)),
+    )
+    card_permits = CardPermits.objects.aggregate(
+        total=Count('pk'),
+        active=Count('pk', filter=Q(status='Active')),
+        expiring_soon=Count('pk', filter=Q(status='Active', expiration_date__gte=today, expiration_date__lte=soon)),
+    )
+    relocations = Relocation.objects.aggregate(
+        total=Count('pk'),
+        open=Count('pk', filter=~Q(approval_status='حاصل') | Q(approval_status__isnull=True)),
+    )
+    by_direction = _grouped(letters, 'direction')
+
+    return {
+        'generated_at': timezone.now().isoformat(),
+        'totals': {
+            'people': PeopleHistory.objects.filter(is_current=True).count(),
+            'correspondence': sum(row['count'] for row in by_direction),
+            'permits': permits['total'],
+            'vehicles': Vehicle.objects.count(),
+            'card_permits': card_permits['total'],
+            'accidents': Accidents.objects.count(),
+        },
+        'correspondence': {
+            'by_direction': by_direction,
+            'by_priority': _grouped(letters, 'priority'),
+            'by_type': _grouped(letters, 'type__type_name'),
+            'by_status': _grouped(letters, 'current_status__procedure_name'),
+            'by_month': [{'value': month.strftime('%Y-%m'), 'count': count} for month, count in by_month],
+        },
+        'permits': permits,
+        'card_permits': card_permits,
+        'relocations': relocations,
+    }
+
+
+def get_dashboard_stats():
+    """Cached, single-flighted dashboard payload"""
+    data = cache.get(CACHE_KEY)
+    if data is not None:
+        return data
+
+    timeout = getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 30)
+    with _compute_lock:
+        data = cache.get(CACHE_KEY)
+        if data is not None:
+            return data
+
+        if cache.add(LOCK_KEY, True, timeout):
+            try:
+                data = compute_dashboard_stats()
+                cache.set(CACHE_KEY, data, timeout)
+            finally:
+                cache.delete(LOCK_KEY)
+            return data
+
+        # Another worker is computing: wait for its result rather than piling on
+        deadline = time.monotonic() + getattr(settings, 'DASHBOARD_LOCK_WAIT', 5)
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            data = cache.get(CACHE_KEY)
+            if data is not None:
+                return data
+        return compute_dashboard_stats()
@@ -0,0 +1,24 @@
+"""
+Per-table generation counters for cache invalidation.
+
+A cached value is stored under a key that includes the current generation
+of every table it was built from. Writing to one of those tables bumps its
+generation, so later reads use a new key and the stale entry simply expires.
+"""
+from django.db.models import F
+
+from .models import TableGeneration
+
+
+def get_generations(names):
+    """Current generation of each table name, in the given order (0 if never bumped)"""
+    found = dict(TableGeneration.objects.filter(name__in=names).values_list('name', 'generation'))
+    return [found.get(name, 0) for name in names]
+
+
+def bump_generation(name):
+    """Invalidate everything cached from table ``name``"""
+    if not TableGeneration.objects.filter(name=name).update(generation=F('generation') + 1):
+        _, created = TableGeneration.objects.get_or_create(name=name, defaults={'generation': 1})
+        if not created:
+            TableGeneration.objects.filter(name=name).update(generation=F('generation') + 1)
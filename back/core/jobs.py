@@ -0,0 +1,161 @@
+"""
+Database-backed background job queue.
+
+Heavy file work (PDF parsing, .msg extraction) is accepted by an endpoint
+with ``enqueue`` in a single insert and processed off the request path by
+``manage.py run_workers``. There is no broker: the ``jobs`` table is the
+queue, and ``/api/jobs/{id}/`` reports status and results.
+
+A worker claims a job with a conditional ``UPDATE`` that only succeeds if
+the row is still as the worker read it (status and attempt count), so
+exactly one worker wins each job on any database. The claim leases the job
+for ``JOB_VISIBILITY_TIMEOUT`` seconds; if the worker dies, the lease runs
+out and the job is claimed again. The timeout must therefore exceed the
+longest job. A failed attempt is retried after ``JOB_RETRY_BACKOFF`` seconds,
+doubled on each further attempt, until ``max_attempts``. Handlers raise
+``PermanentJobError`` for failures that a retry cannot fix.
+
+Handlers are registered with ``@task('<kind>')`` (see core/tasks.py). They
+take the job's payload and return a JSON-serializable result. Storage files
+listed in ``Job.files`` are deleted once the job succeeds or finally fails.
+"""
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+
+HANDLERS = {}
+
+
+class PermanentJobError(Exception):
+    """A job failure that retrying cannot fix"""
+
+
+def task(kind):
+    """Register the decorated function as the handler of jobs of ``kind``"""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(kind, payload=None, files=(), user=None, max_attempts=None):
+    """Queue a job of a registered ``kind``; ``files`` are storage names owned by the job"""
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind!r}')
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        files=list(files),
+        created_by=user if user is not None and user.is_authenticated else None,
+        max_attempts=max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 3),
+    )
+
+
+def claim(worker_id):
+    """Lease the next due job (queued, or running with an expired lease) to ``worker_id``; None if there is none"""
+    while True:
+        now = timezone.now()
+        candidate = (
+            Job.objects.filter(Q(status='queued', available_at__lte=now) | Q(status='running', locked_until__lt=now))
+            .order_by('available_at', 'job_id')
+            .values('job_id', 'status', 'attempts')
+            .first()
+        )
+        if candidate is None:
+            return None
+
+        lease = now + timedelta(seconds=getattr(settings, 'JOB_VISIBILITY_TIMEOUT', 300))
+        won = Job.objects.filter(
+            job_id=candidate['job_id'], status=candidate['status'], attempts=candidate['attempts']
+        ).update(
+            status='running', locked_by=worker_id, locked_until=lease, attempts=F('attempts') + 1, started_at=now
+        )
+        if not won:
+            # Another worker claimed it first
+            continue
+
+        job = Job.objects.get(job_id=candidate['job_id'])
+        if job.attempts > job.max_attempts:
+            # The lease of the last attempt ran out: its worker died or the job hangs
+            _finish(job, worker_id, 'failed', error=job.error or 'Worker lease expired')
+            continue
+        return job
+
+
+def _finish(job, worker_id, status, result=None, error=''):
+    """Record the outcome of ``job`` unless its lease was lost to another worker meanwhile"""
+    finished = Job.objects.filter(
+        job_id=job.job_id, status='running', locked_by=worker_id, attempts=job.attempts
+    ).update(
+        status=status, result=result, error=error, finished_at=timezone.now(), locked_until=None
+    )
+    if finished:
+        for name in job.files:
+            default_storage.delete(name)
+    return bool(finished)
+
+
+def _retry(job, worker_id, error):
+    backoff = getattr(settings, 'JOB_RETRY_BACKOFF', 10) * 2 ** (job.attempts - 1)
+    return bool(Job.objects.filter(
+        job_id=job.job_id, status='running', locked_by=worker_id, attempts=job.attempts
+    ).update(
+        status='queued', error=error, available_at=timezone.now() + timedelta(seconds=backoff), locked_until=None
+    ))
+
+
+def run_job(job, worker_id):
+    """Run a claimed job's handler and record success, a retry or a failure"""
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise PermanentJobError(f'No handler for job kind {job.kind!r}')
+        result = handler(job.payload)
+    except PermanentJobError as e:
+        _finish(job, worker_id, 'failed', error=str(e))
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+        if job.attempts >= job.max_attempts:
+            _finish(job, worker_id, 'failed', error=error)
+        else:
+            _retry(job, worker_id, error)
+    else:
+        _finish(job, worker_id, 'succeeded', result=result)
+
+
+def work(worker_id=None, stop=None, burst=False, poll_interval=None):
+    """
+    Claim and run jobs until ``stop`` (an Event) is set or, with ``burst``,
+    until no job is due. Returns the number of jobs run.
+    """
+    worker_id = worker_id or default_worker_id()
+    poll_interval = poll_interval or getattr(settings, 'JOB_POLL_INTERVAL', 1)
+    processed = 0
+    while stop is None or not stop.is_set():
+        close_old_connections()
+        job = claim(worker_id)
+        if job is None:
+            if burst:
+                break
+            if stop is None:
+                time.sleep(poll_interval)
+            else:
+                stop.wait(poll_interval)
+            continue
+        run_job(job, worker_id)
+        processed += 1
+    return processed
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import PeopleHistory, PeopleNameToken
+
+
+class Command(BaseCommand):
+    help = 'Populate the name token index for existing people records'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of people records processed per transaction'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = PeopleHistory.objects.count()
+        self.stdout.write(f'Backfilling name search index for {total} people records...')
+
+        processed = 0
+        last_id = 0
+        while True:
+            batch = list(
+                PeopleHistory.objects
+                .filter(person_record_id__gt=last_id)
+                .order_by('person_record_id')
+                .only('person_record_id', 'full_name_arabic', 'full_name_english')[:batch_size]
+            )
+            if not batch:
+                break
+
+            with transaction.atomic():
+                tokens = []
+                for person in batch:
+                    tokens.extend(person.build_name_tokens())
+                PeopleNameToken.objects.filter(person__in=batch).delete()
+                PeopleNameToken.objects.bulk_create(tokens, batch_size=batch_size)
+
+            processed += len(batch)
+            last_id = batch[-1].person_record_id
+            self.stdout.write(f'  {processed}/{total}')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully backfilled {processed} people records!'))
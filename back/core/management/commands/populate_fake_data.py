@@ -1,465 +1,605 @@
-from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
-from django.utils import timezone
-from datetime import date, timedelta
 import random
+import time
 import uuid
-from faker import Faker
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.analytics import refresh_dwell_rollup
+from core.bulk import INITIAL_LOG_REASON
+from core.generations import bump_generation
 from core.models import (
-    PeopleHistory, CompaniesHistory, EmploymentHistory, FamilyRelationships,
-    CorrespondenceTypes, Contacts, Correspondence, CorrespondenceContacts,
-    Attachments, CorrespondenceProcedures, Permits, ApprovalDecisions,
-    Accidents, Relocation, RelocationPeriod, Vehicle, CarPermit,
-    CardPermits, CardPhotos
+    PeopleHistory, PeopleNameToken, CompaniesHistory, EmploymentHistory, FamilyRelationships,
+    CorrespondenceTypes, CorrespondenceTypeProcedure, Contacts, Correspondence,
+    CorrespondenceStatusLog, Attachments, StatusDwellRollup, RollupCheckpoint,
+    Permits, ApprovalDecisions, Accidents, Relocation, RelocationPeriod,
+    Vehicle, CarPermit, CardPermits, CardPhotos
 )
 
 User = get_user_model()
-fake = Faker(['ar_EG', 'en_US'])  # Arabic and English locales
+
+# Base volumes; everything else is derived from them (see Command.volumes)
+SCALES = {
+    'small': {'correspondence': 1_000, 'people': 500},
+    'medium': {'correspondence': 100_000, 'people': 50_000},
+    'large': {'correspondence': 1_000_000, 'people': 500_000},
+}
+
+# Children before parents, so plain DELETEs never trip a foreign key
+CLEAR_ORDER = [
+    CardPhotos, CardPermits, CarPermit, Vehicle, RelocationPeriod, Relocation, Accidents,
+    ApprovalDecisions, Permits, Attachments, CorrespondenceStatusLog, StatusDwellRollup, RollupCheckpoint,
+    PeopleNameToken, FamilyRelationships, EmploymentHistory, PeopleHistory, Correspondence,
+    CompaniesHistory, CorrespondenceTypeProcedure, Contacts, CorrespondenceTypes,
+]
+
+# Correspondence type -> ordered workflow (the last step is final)
+WORKFLOWS = {
+    ('Security Clearance Request', 'General'): ['Received', 'Under Review', 'Sent for Approval', 'Approved', 'Closed'],
+    ('Permit Application', 'General'): ['Received', 'Documents Check', 'Sent for Approval', 'Issued'],
+    ('Incident Report', 'General'): ['Received', 'Investigation', 'Report Filed'],
+    ('Access Request', 'General'): ['Received', 'Under Review', 'Granted'],
+    ('Renewal Application', 'General'): ['Received', 'Documents Check', 'Renewed'],
+    ('Complaint', 'General'): ['Received', 'Investigation', 'Replied', 'Closed'],
+    ('Site Access Letter', 'Russian'): ['Received', 'Translated', 'Under Review', 'Replied'],
+    ('Vehicle Access Letter', 'Russian'): ['Received', 'Translated', 'Replied'],
+    ('Staff List', 'Russian'): ['Received', 'Translated', 'Checked', 'Archived'],
+}
+
+FIRST_NAMES = [
+    ('أحمد', 'Ahmed'), ('محمد', 'Mohamed'), ('علي', 'Ali'), ('حسن', 'Hassan'), ('خالد', 'Khaled'),
+    ('عمر', 'Omar'), ('يوسف', 'Youssef'), ('إبراهيم', 'Ibrahim'), ('مصطفى', 'Mostafa'), ('محمود', 'Mahmoud'),
+    ('فاطمة', 'Fatma'), ('مريم', 'Mariam'), ('عائشة', 'Aisha'), ('نور', 'Nour'), ('سارة', 'Sara'),
+    ('هدى', 'Hoda'), ('ياسمين', 'Yasmin'), ('كريم', 'Karim'), ('طارق', 'Tarek'), ('سامي', 'Sami'),
+]
+FAMILY_NAMES = [
+    ('المصري', 'El-Masry'), ('عبد الله', 'Abdallah'), ('الشامي', 'El-Shamy'), ('السيد', 'El-Sayed'),
+    ('عبد الرحمن', 'Abdelrahman'), ('حسين', 'Hussein'), ('سليمان', 'Soliman'), ('إسماعيل', 'Ismail'),
+    ('النجار', 'El-Naggar'), ('الشريف', 'El-Sherif'), ('فؤاد', 'Fouad'), ('منصور', 'Mansour'),
+]
+NATIONALITIES = ['Egyptian', 'Egyptian', 'Egyptian', 'Russian', 'Saudi', 'Jordanian', 'Sudanese', 'Syrian']
+QUALIFICATIONS = ['Bachelor', 'Master', 'PhD', 'Diploma', 'High School', 'Technical']
+ACCESS_AREAS = ['A', 'B', 'C', 'All Areas']
+CITIES = ['Cairo', 'Alexandria', 'Giza', 'Matrouh', 'El Dabaa', 'Assiut', 'Luxor', 'Aswan']
+JOB_TITLES = ['Security Guard', 'Supervisor', 'Manager', 'Technician', 'Engineer', 'Driver', 'Administrator']
+COMPANY_WORDS = ['Nile', 'Delta', 'Pyramid', 'Atom', 'Sinai', 'Orient', 'Horizon', 'Golden', 'United', 'Modern']
+COMPANY_TYPES = ['Construction', 'Security', 'Maintenance', 'Cleaning', 'Catering', 'IT Services']
+APPROVERS = ['Ministry of Interior', 'Security Department', 'HR Department', 'Legal Department', 'Safety Committee']
+SUBJECT_TOPICS = [
+    'Site access', 'Security clearance', 'Vehicle permit', 'Staff list update', 'Card renewal',
+    'Relocation request', 'Incident follow-up', 'Visit request', 'Work permit', 'Equipment entry',
+]
+SUBJECT_OBJECTS = [
+    'for contractor staff', 'for the main building', 'for night shift workers', 'for visiting engineers',
+    'for company vehicles', 'for the training center', 'for new employees', 'for the warehouse area',
+]
+ATTACHMENT_TYPES = [('pdf', 'application/pdf'), ('jpg', 'image/jpeg'), ('docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document')]
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the values of auto_now / auto_now_add fields instead of stamping 'now'"""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
 
 
 class Command(BaseCommand):
-    help = 'Populate the database with fake data for testing'
+    help = (
+        'Replace the data with a deterministic fake dataset. Pick a --scale preset '
+        '(small: 1k, medium: 100k, large: 1M correspondence) and a --seed; the same seed '
+        'and volumes always produce the same data. Users are kept.'
+    )
 
     def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            choices=sorted(SCALES),
+            default='small',
+            help='Volume preset (default: small)'
+        )
+        parser.add_argument(
+            '--correspondence',
+            type=int,
+            help='Number of correspondence records (overrides the preset)'
+        )
         parser.add_argument(
             '--people',
             type=int,
-            default=50,
-            help='Number of people records to create'
+            help='Number of distinct people, each with 1-3 PeopleHistory versions (overrides the preset)'
         )
         parser.add_argument(
             '--companies',
             type=int,
-            default=20,
-            help='Number of companies to create'
+            help='Number of companies (default: derived from --people)'
         )
         parser.add_argument(
-            '--correspondence',
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed (default: 42)'
+        )
+        parser.add_argument(
+            '--batch-size',
             type=int,
-            default=100,
-            help='Number of correspondence records to create'
+            default=5000,
+            help='Rows inserted per bulk_create / transaction'
         )
 
     def handle(self, *args, **options):
-        self.stdout.write(self.style.SUCCESS('Starting to populate fake data...'))
-        
-        # Clear existing data (optional - comment out if you want to keep existing data)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(
+                f'{connection.vendor} does not return ids from bulk inserts; use PostgreSQL or SQLite 3.35+.'
+            )
+
+        self.seed = options['seed']
+        self.batch_size = options['batch_size']
+        self.volumes = self.get_volumes(options)
+        self.now = timezone.now()
+        self.today = timezone.localdate()
+        started = time.monotonic()
+
+        self.stdout.write(self.style.SUCCESS(
+            'Populating fake data (seed {}): {}'.format(
+                self.seed, ', '.join(f'{name}={count}' for name, count in self.volumes.items())
+            )
+        ))
         self.clear_existing_data()
-        
-        # Create fake data
-        self.create_users(10)
-        self.create_correspondence_types()
-        self.create_contacts(30)
-        self.create_companies(options['companies'])
-        self.create_people(options['people'])
-        self.create_employment_history()
-        self.create_family_relationships()
-        self.create_correspondence(options['correspondence'])
-        self.create_permits()
-        self.create_accidents()
-        self.create_relocations()
-        self.create_vehicles()
-        self.create_card_permits()
-        
-        self.stdout.write(self.style.SUCCESS('Successfully populated database with fake data!'))
+
+        self.step('users', self.create_users)
+        self.step('correspondence types', self.create_correspondence_types)
+        self.step('contacts', self.create_contacts)
+        self.step('companies', self.create_companies)
+        self.step('correspondence', self.create_correspondence)
+        self.step('people', self.create_people)
+        self.step('employment history', self.create_employment_history)
+        self.step('family relationships', self.create_family_relationships)
+        self.step('permits', self.create_permits)
+        self.step('accidents', self.create_accidents)
+        self.step('relocations', self.create_relocations)
+        self.step('vehicles', self.create_vehicles)
+        self.step('card permits', self.create_card_permits)
+
+        # Raw deletes and bulk_create send no signals: invalidate the cached lookup lists by hand
+        for model in (CorrespondenceTypes, CorrespondenceTypeProcedure, Contacts):
+            bump_generation(model._meta.db_table)
+        self.step('time-in-status rollup', refresh_dwell_rollup)
+
+        self.print_summary()
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully populated fake data in {time.monotonic() - started:.1f}s!'
+        ))
+
+    # ------------------------------------------------------------------ helpers
+
+    def get_volumes(self, options):
+        preset = SCALES[options['scale']]
+        correspondence = options['correspondence'] or preset['correspondence']
+        people = options['people'] or preset['people']
+        return {
+            'correspondence': correspondence,
+            'people': people,
+            'companies': options['companies'] or max(20, people // 250),
+            'contacts': max(30, correspondence // 1000),
+            'permits': max(40, people // 2),
+            'accidents': max(15, people // 50),
+            'relocations': max(20, people // 20),
+            'vehicles': max(25, correspondence // 20),
+            'card_permits': max(35, people * 3 // 5),
+        }
+
+    def rng(self, name):
+        """Independent random stream per table, so the output does not depend on --batch-size"""
+        return random.Random(f'{self.seed}:{name}')
+
+    def make_uuid(self, rng):
+        return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+    def moment(self, day, rng):
+        """An aware datetime at a random working-hours time on ``day``"""
+        naive = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randint(8 * 3600, 17 * 3600))
+        return timezone.make_aware(naive)
+
+    def step(self, label, func):
+        started = time.monotonic()
+        created = func()
+        suffix = f' ({created} rows)' if created is not None else ''
+        self.stdout.write(f'  {label}{suffix} in {time.monotonic() - started:.1f}s')
+
+    def insert(self, model, rows, children=None):
+        """
+        bulk_create ``rows`` (any iterable) in batches of ``batch_size``, one
+        transaction each. ``children(batch)`` is called once the batch has its
+        primary keys and yields ``(model, rows)`` pairs written in the same
+        transaction. Returns the number of parent rows.
+        """
+        rows = iter(rows)
+        created = 0
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return created
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+                if children:
+                    for child_model, child_rows in children(batch):
+                        child_model.objects.bulk_create(child_rows, batch_size=self.batch_size)
+            created += len(batch)
 
     def clear_existing_data(self):
-        """Clear existing data - be careful with this in production!"""
+        """Delete all generated tables with plain DELETEs - be careful with this in production!"""
         self.stdout.write('Clearing existing data...')
-        
-        # Clear in reverse order of dependencies
-        CardPhotos.objects.all().delete()
-        CardPermits.objects.all().delete()
-        CarPermit.objects.all().delete()
-        Vehicle.objects.all().delete()
-        RelocationPeriod.objects.all().delete()
-        Relocation.objects.all().delete()
-        Accidents.objects.all().delete()
-        ApprovalDecisions.objects.all().delete()
-        Permits.objects.all().delete()
-        CorrespondenceProcedures.objects.all().delete()
-        Attachments.objects.all().delete()
-        CorrespondenceContacts.objects.all().delete()
-        Correspondence.objects.all().delete()
-        FamilyRelationships.objects.all().delete()
-        EmploymentHistory.objects.all().delete()
-        PeopleHistory.objects.all().delete()
-        CompaniesHistory.objects.all().delete()
-        Contacts.objects.all().delete()
-        CorrespondenceTypes.objects.all().delete()
-        # Keep users for login purposes
-        
-        self.stdout.write('Existing data cleared.')
-
-    def create_users(self, count):
-        """Create fake users"""
-        self.stdout.write(f'Creating {count} users...')
-        
-        # Create admin user if not exists
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model in CLEAR_ORDER:
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+
+    # ------------------------------------------------------------------ tables
+
+    def create_users(self):
+        """Create the admin account and ten staff users (kept between runs)"""
         if not User.objects.filter(username='admin').exists():
-            User.objects.create_superuser('admin', 'admin@securityoffice.com', 'admin123')
-        
-        for i in range(count):
-            User.objects.create_user(
-                username=fake.user_name() + str(i),
-                email=fake.email(),
-                first_name=fake.first_name(),
-                last_name=fake.last_name(),
-                password='password123'
-            )
+            User.objects.create_superuser('admin', 'admin@securityoffice.com', 'admin123', role='admin')
+        usernames = [f'staff{n:02d}' for n in range(1, 11)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        password = make_password('password123')
+        User.objects.bulk_create([
+            User(username=name, email=f'{name}@securityoffice.com', password=password)
+            for name in usernames if name not in existing
+        ])
+        self.user_ids = list(User.objects.filter(username__in=usernames).order_by('username').values_list('pk', flat=True))
+        return len(usernames) - len(existing)
 
     def create_correspondence_types(self):
-        """Create correspondence types"""
-        self.stdout.write('Creating correspondence types...')
-        
-        types = [
-            'Security Clearance Request',
-            'Permit Application',
-            'Incident Report',
-            'Access Request',
-            'Renewal Application',
-            'Complaint',
-            'Investigation Report',
-            'Policy Update',
-            'Training Certificate',
-            'Emergency Notice'
-        ]
-        
-        for type_name in types:
-            CorrespondenceTypes.objects.create(type_name=type_name)
-
-    def create_contacts(self, count):
-        """Create fake contacts"""
-        self.stdout.write(f'Creating {count} contacts...')
-        
-        # Create some organization approvers
-        organizations = [
-            'Ministry of Interior',
-            'Security Department',
-            'HR Department',
-            'Legal Department',
-            'Safety Committee'
-        ]
-        
-        for org in organizations:
-            Contacts.objects.create(
-                name=org,
-                contact_type='Organization',
-                is_approver=True
-            )
-        
-        # Create individual contacts
-        for _ in range(count - len(organizations)):
-            Contacts.objects.create(
-                name=fake.name(),
-                contact_type=random.choice(['Person', 'Organization']),
-                is_approver=random.choice([True, False])
-            )
+        self.workflows = []
+        for (type_name, category), steps in WORKFLOWS.items():
+            corr_type = CorrespondenceTypes.objects.create(type_name=type_name, category=category)
+            procedures = CorrespondenceTypeProcedure.objects.bulk_create([
+                CorrespondenceTypeProcedure(
+                    correspondence_type=corr_type, procedure_name=name, procedure_order=order,
+                    is_initial=order == 0, is_final=order == len(steps) - 1
+                )
+                for order, name in enumerate(steps)
+            ])
+            self.workflows.append((corr_type.pk, [(p.pk, p.procedure_name) for p in procedures]))
+        return len(self.workflows)
 
-    def create_companies(self, count):
-        """Create fake companies with version control"""
-        self.stdout.write(f'Creating {count} companies...')
-        
-        company_types = ['Construction', 'Security', 'Maintenance', 'Cleaning', 'Catering', 'IT Services']
-        
-        for _ in range(count):
-            company_name = fake.company()
-            CompaniesHistory.objects.create(
-                company_name=company_name,
-                company_type=random.choice(company_types),
-                contact_info=fake.address(),
-                start_date=timezone.now() - timedelta(days=random.randint(30, 365)),
-                is_current=True,
-                version=1
-            )
+    def create_contacts(self):
+        rng = self.rng('contacts')
+        rows = [Contacts(name=name, contact_type='Organization', is_approver=True) for name in APPROVERS]
+        for n in range(self.volumes['contacts'] - len(APPROVERS)):
+            if rng.random() < 0.5:
+                first, family = rng.choice(FIRST_NAMES), rng.choice(FAMILY_NAMES)
+                rows.append(Contacts(name=f'{first[1]} {family[1]}', contact_type='Person'))
+            else:
+                rows.append(Contacts(name=f'{rng.choice(COMPANY_WORDS)} Office {n + 1}', contact_type='Organization'))
+        self.insert(Contacts, rows)
+        self.contact_ids = [row.pk for row in rows]
+        self.approver_ids = self.contact_ids[:len(APPROVERS)]
+        return len(rows)
 
-    def create_people(self, count):
-        """Create fake people with version control"""
-        self.stdout.write(f'Creating {count} people...')
-        
-        nationalities = ['Egyptian', 'Saudi', 'Jordanian', 'Lebanese', 'Syrian', 'Palestinian']
-        qualifications = ['Bachelor', 'Master', 'PhD', 'Diploma', 'High School', 'Technical']
-        
-        self.people_guids = []  # Store for later use
-        
-        for _ in range(count):
-            person_guid = uuid.uuid4()
-            self.people_guids.append(person_guid)
-            
-            # Arabic name
-            arabic_first = random.choice(['أحمد', 'محمد', 'علي', 'حسن', 'خالد', 'عمر', 'يوسف', 'إبراهيم'])
-            arabic_last = random.choice(['المصري', 'العربي', 'الشامي', 'الخليجي', 'السوري', 'اللبناني'])
-            full_name_arabic = f"{arabic_first} {arabic_last}"
-            
-            PeopleHistory.objects.create(
-                person_guid=person_guid,
-                full_name_arabic=full_name_arabic,
-                full_name_english=fake.name(),
-                nationality=random.choice(nationalities),
-                national_id=fake.numerify('##############'),
-                access_areas=random.choice(['A', 'B', 'C', 'All Areas']),
-                date_of_birth=fake.date_of_birth(minimum_age=20, maximum_age=65),
-                qualification=random.choice(qualifications),
-                id_address=fake.address(),
-                alive=random.choice([True, True, True, False]),  # Mostly alive
-                start_date=timezone.now() - timedelta(days=random.randint(1, 730)),
+    def create_companies(self):
+        rng = self.rng('companies')
+        rows = [
+            CompaniesHistory(
+                company_name=f'{rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_TYPES)} Co. {n + 1}',
+                company_type=rng.choice(COMPANY_TYPES),
+                contact_info=f'{rng.randint(1, 200)} {rng.choice(CITIES)} St.',
+                start_date=self.now - timedelta(days=rng.randint(30, 3650)),
                 is_current=True,
-                version=1
+                version=1,
             )
+            for n in range(self.volumes['companies'])
+        ]
+        self.insert(CompaniesHistory, rows)
+        self.company_ids = [row.pk for row in rows]
+        return len(rows)
+
+    def create_correspondence(self):
+        """Letters spread over three years, each walked through part of its type's workflow"""
+        rng = self.rng('correspondence')
+        children_rng = self.rng('correspondence-children')
+        total = self.volumes['correspondence']
+        first_day = self.today - timedelta(days=3 * 365)
+        self.letter_ids = []
+
+        def rows():
+            for n in range(total):
+                type_id, workflow = rng.choice(self.workflows)
+                steps = rng.randint(1, len(workflow))
+                day = first_day + timedelta(days=n * 3 * 365 // total)
+                created = self.moment(day, rng)
+                letter = Correspondence(
+                    reference_number=f'SEC-{n + 1:07d}',
+                    correspondence_date=day,
+                    type_id=type_id,
+                    contact_id=rng.choice(self.contact_ids),
+                    subject=f'{rng.choice(SUBJECT_TOPICS)} {rng.choice(SUBJECT_OBJECTS)}',
+                    direction=rng.choices(['Incoming', 'Outgoing', 'Internal'], weights=[6, 3, 1])[0],
+                    priority=rng.choices(['high', 'normal', 'low'], weights=[1, 6, 2])[0],
+                    summary=f'Ref. {n + 1}: {rng.choice(SUBJECT_TOPICS).lower()}' if rng.random() < 0.6 else None,
+                    current_status_id=workflow[steps - 1][0],
+                    assigned_to_id=rng.choice(self.user_ids),
+                    created_at=created,
+                    updated_at=created,
+                )
+                letter.walk = workflow[:steps]
+                yield letter
+
+        def children(batch):
+            logs, attachments = [], []
+            for letter in batch:
+                self.letter_ids.append(letter.pk)
+                moment, previous = letter.created_at, None
+                for _, name in letter.walk:
+                    logs.append(CorrespondenceStatusLog(
+                        correspondence_id=letter.pk,
+                        form_status_name=previous,
+                        to_status_name=name,
+                        changed_by_id=children_rng.choice(self.user_ids),
+                        change_reason=INITIAL_LOG_REASON if previous is None else None,
+                        created_at=moment,
+                    ))
+                    previous = name
+                    moment += timedelta(seconds=children_rng.randint(3600, 14 * 86400))
+                for n in range(children_rng.choices([0, 1, 2], weights=[5, 4, 1])[0]):
+                    extension, mime_type = children_rng.choice(ATTACHMENT_TYPES)
+                    file_name = f'{letter.reference_number}-{n + 1}.{extension}'
+                    attachments.append(Attachments(
+                        correspondence_id=letter.pk,
+                        file=f'attachments/{letter.pk}/{file_name}',
+                        file_name=file_name,
+                        file_type=mime_type,
+                        file_size=children_rng.randint(20_000, 5_000_000),
+                        uploaded_at=letter.created_at,
+                    ))
+            return [(CorrespondenceStatusLog, logs), (Attachments, attachments)]
+
+        fields = [
+            Correspondence._meta.get_field('created_at'), Correspondence._meta.get_field('updated_at'),
+            CorrespondenceStatusLog._meta.get_field('created_at'), Attachments._meta.get_field('uploaded_at'),
+        ]
+        with explicit_timestamps(*fields):
+            created = self.insert(Correspondence, rows(), children)
+        self.link_replies()
+        return created
+
+    def link_replies(self):
+        """Make about one letter in ten a reply to an earlier letter (threads of any depth)"""
+        rng = self.rng('replies')
+        replies = [
+            Correspondence(pk=pk, parent_correspondence_id=self.letter_ids[rng.randrange(n)])
+            for n, pk in enumerate(self.letter_ids) if n and rng.random() < 0.1
+        ]
+        for start in range(0, len(replies), self.batch_size):
+            with transaction.atomic():
+                Correspondence.objects.bulk_update(replies[start:start + self.batch_size], ['parent_correspondence'])
+
+    def create_people(self):
+        """Distinct people with 1-3 PeopleHistory versions each, plus their name token rows"""
+        rng = self.rng('people')
+        self.person_guids = []
+
+        def rows():
+            for _ in range(self.volumes['people']):
+                guid = self.make_uuid(rng)
+                self.person_guids.append(guid)
+                first, father, family = rng.choice(FIRST_NAMES), rng.choice(FIRST_NAMES), rng.choice(FAMILY_NAMES)
+                arabic = f'{first[0]} {father[0]} {family[0]}'
+                english = f'{first[1]} {father[1]} {family[1]}'
+                versions = rng.choices([1, 2, 3], weights=[6, 3, 1])[0]
+                start = self.now - timedelta(days=rng.randint(300 * versions, 1500))
+                person = {
+                    'person_guid': guid,
+                    'full_name_arabic': arabic,
+                    'full_name_english': english,
+                    'nationality': rng.choice(NATIONALITIES),
+                    'national_id': f'{rng.randint(2, 3)}{rng.randrange(10 ** 13):013d}',
+                    'date_of_birth': self.today - timedelta(days=rng.randint(20 * 365, 65 * 365)),
+                    'alive': rng.random() < 0.98,
+                    'sc_request_letter_id': rng.choice(self.letter_ids) if rng.random() < 0.5 else None,
+                }
+                for version in range(1, versions + 1):
+                    end = start + timedelta(days=rng.randint(10, 300)) if version < versions else None
+                    yield PeopleHistory(
+                        **person,
+                        access_areas=rng.choice(ACCESS_AREAS),
+                        qualification=rng.choice(QUALIFICATIONS),
+                        id_address=f'{rng.randint(1, 200)} {rng.choice(CITIES)} St.',
+                        start_date=start,
+                        end_date=end,
+                        is_current=end is None,
+                        version=version,
+                    )
+                    start = end
+
+        def children(batch):
+            return [(PeopleNameToken, [token for person in batch for token in person.build_name_tokens()])]
+
+        return self.insert(PeopleHistory, rows(), children)
 
     def create_employment_history(self):
-        """Create employment history records"""
-        self.stdout.write('Creating employment history...')
-        
-        companies = list(CompaniesHistory.objects.filter(is_current=True))
-        job_titles = ['Security Guard', 'Supervisor', 'Manager', 'Technician', 'Administrator', 'Cleaner']
-        
-        for person_guid in self.people_guids[:30]:  # Employment for first 30 people
-            EmploymentHistory.objects.create(
-                person_guid=person_guid,
-                company=random.choice(companies),
-                job_title=random.choice(job_titles),
-                still_hired=random.choice([True, True, False]),  # Mostly still hired
-                start_date=timezone.now() - timedelta(days=random.randint(30, 365)),
-                is_current=True,
-                version=1
-            )
+        rng = self.rng('employment')
+
+        def rows():
+            for guid in self.person_guids:
+                if rng.random() < 0.6:
+                    yield EmploymentHistory(
+                        person_guid=guid,
+                        company_id=rng.choice(self.company_ids),
+                        job_title=rng.choice(JOB_TITLES),
+                        still_hired=rng.random() < 0.85,
+                        start_date=self.now - timedelta(days=rng.randint(30, 1500)),
+                        is_current=True,
+                        version=1,
+                    )
+
+        return self.insert(EmploymentHistory, rows())
 
     def create_family_relationships(self):
-        """Create family relationships"""
-        self.stdout.write('Creating family relationships...')
-        
-        relationship_types = ['Spouse', 'Son', 'Daughter', 'Father', 'Mother']
-        statuses = ['Active', 'Active', 'Active', 'Left', 'Deceased']
-        
-        # Create relationships for first 20 people (workers)
-        for worker_guid in self.people_guids[:20]:
-            # Each worker has 1-3 family members
-            num_family = random.randint(1, 3)
-            family_guids = random.sample(self.people_guids[20:], num_family)
-            
-            for family_guid in family_guids:
-                FamilyRelationships.objects.create(
-                    worker_person_guid=worker_guid,
-                    family_member_person_guid=family_guid,
-                    relationship_type=random.choice(relationship_types),
-                    status=random.choice(statuses)
-                )
+        rng = self.rng('family')
+        relationship_types = [choice for choice, _ in FamilyRelationships.RELATIONSHIP_CHOICES]
 
-    def create_correspondence(self, count):
-        """Create correspondence records"""
-        self.stdout.write(f'Creating {count} correspondence records...')
-        
-        types = list(CorrespondenceTypes.objects.all())
-        contacts = list(Contacts.objects.all())
-        directions = ['Incoming', 'Outgoing', 'Internal']
-        priorities = ['high', 'normal', 'low']
-        
-        correspondences = []
-        
-        for i in range(count):
-            correspondence = Correspondence.objects.create(
-                reference_number=f"SEC-{timezone.now().year}-{i+1:04d}",
-                correspondence_date=fake.date_between(start_date='-1y', end_date='today'),
-                type=random.choice(types),
-                subject=fake.sentence(nb_words=6),
-                direction=random.choice(directions),
-                priority=random.choice(priorities),
-                summary=fake.text(max_nb_chars=200)
-            )
-            correspondences.append(correspondence)
-            
-            # Add contacts to correspondence
-            selected_contacts = random.sample(contacts, random.randint(1, 3))
-            roles = ['Sender', 'Recipient', 'CC']
-            
-            for j, contact in enumerate(selected_contacts):
-                CorrespondenceContacts.objects.create(
-                    correspondence=correspondence,
-                    contact=contact,
-                    role=roles[j % len(roles)]
-                )
-            
-            # Add attachments (some correspondences)
-            if random.choice([True, False]):
-                Attachments.objects.create(
-                    correspondence=correspondence,
-                    file_name=fake.file_name(),
-                    file_path=f"/media/attachments/{fake.file_name()}",
-                    file_type=random.choice(['application/pdf', 'image/jpeg', 'application/docx']),
-                    file_size=random.randint(1024, 5242880)  # 1KB to 5MB
-                )
-        
-        # Create procedures for some correspondence
-        users = list(User.objects.all())
-        statuses = ['Pending', 'In Progress', 'Completed']
-        
-        for correspondence in random.sample(correspondences, min(50, len(correspondences))):
-            CorrespondenceProcedures.objects.create(
-                responsible_person=random.choice(users),
-                letter=correspondence,
-                procedure_date=fake.date_between(start_date=correspondence.correspondence_date, end_date='today'),
-                description=fake.text(max_nb_chars=500),
-                status=random.choice(statuses),
-                notes=fake.text(max_nb_chars=200) if random.choice([True, False]) else None
-            )
+        def rows():
+            for guid in self.person_guids:
+                if rng.random() < 0.1:
+                    for _ in range(rng.randint(1, 3)):
+                        yield FamilyRelationships(
+                            worker_person_guid=guid,
+                            family_member_person_guid=rng.choice(self.person_guids),
+                            relationship_type=rng.choice(relationship_types),
+                            status=rng.choices(['Active', 'Left', 'Deceased'], weights=[8, 1, 1])[0],
+                        )
+
+        return self.insert(FamilyRelationships, rows())
 
     def create_permits(self):
-        """Create permits and approval decisions"""
-        self.stdout.write('Creating permits...')
-        
-        companies = list(CompaniesHistory.objects.filter(is_current=True))
-        approvers = list(Contacts.objects.filter(is_approver=True))
-        permit_statuses = ['Pending', 'Active', 'Rejected', 'Expired']
-        decision_statuses = ['Pending', 'Approved', 'Rejected']
-        
-        permits = []
-        
-        # Person permits
-        for person_guid in random.sample(self.people_guids, 30):
-            permit = Permits.objects.create(
-                permit_holder_type='Person',
-                person_guid=person_guid,
-                permit_status=random.choice(permit_statuses),
-                effective_date=fake.date_between(start_date='-6m', end_date='+6m'),
-                expiry_date=fake.date_between(start_date='+6m', end_date='+2y')
-            )
-            permits.append(permit)
-        
-        # Company permits
-        for company in random.sample(companies, 10):
-            permit = Permits.objects.create(
-                permit_holder_type='Company',
-                company=company,
-                permit_status=random.choice(permit_statuses),
-                effective_date=fake.date_between(start_date='-6m', end_date='+6m'),
-                expiry_date=fake.date_between(start_date='+6m', end_date='+2y')
-            )
-            permits.append(permit)
-        
-        # Create approval decisions
-        for permit in permits:
-            approver = random.choice(approvers)
-            ApprovalDecisions.objects.create(
-                permit=permit,
-                approver_contact=approver,
-                decision_status=random.choice(decision_statuses),
-                decision_date=fake.date_time_between(start_date='-1y', end_date='now', tzinfo=timezone.get_current_timezone()),
-                notes=fake.text(max_nb_chars=300) if random.choice([True, False]) else None
-            )
+        """Person and company permits, each with one or two approval decisions"""
+        rng = self.rng('permits')
+        decisions_rng = self.rng('approval-decisions')
+
+        def rows():
+            for _ in range(self.volumes['permits']):
+                effective = self.today - timedelta(days=rng.randint(0, 720))
+                expiry = effective + timedelta(days=rng.randint(30, 730))
+                status = rng.choices(['Active', 'Pending', 'Rejected', 'Revoked'], weights=[6, 2, 1, 1])[0]
+                if status == 'Active' and expiry < self.today:
+                    status = 'Expired'
+                if rng.random() < 0.8:
+                    holder = {'permit_holder_type': 'Person', 'person_guid': rng.choice(self.person_guids)}
+                else:
+                    holder = {'permit_holder_type': 'Company', 'company_id': rng.choice(self.company_ids)}
+                yield Permits(**holder, permit_status=status, effective_date=effective, expiry_date=expiry)
+
+        def children(batch):
+            decisions = []
+            for permit in batch:
+                for approver in decisions_rng.sample(self.approver_ids, decisions_rng.randint(1, 2)):
+                    decision = {'Pending': 'Pending', 'Rejected': 'Rejected'}.get(permit.permit_status, 'Approved')
+                    decisions.append(ApprovalDecisions(
+                        permit_id=permit.pk,
+                        approver_contact_id=approver,
+                        decision_status=decision,
+                        decision_date=None if decision == 'Pending' else self.moment(permit.effective_date, decisions_rng),
+                        correspondence_id=decisions_rng.choice(self.letter_ids) if decisions_rng.random() < 0.7 else None,
+                        notes=None,
+                    ))
+            return [(ApprovalDecisions, decisions)]
+
+        return self.insert(Permits, rows(), children)
 
     def create_accidents(self):
-        """Create accident records"""
-        self.stdout.write('Creating accident records...')
-        
-        for _ in range(15):
-            Accidents.objects.create(
-                description=fake.text(max_nb_chars=500),
-                person_guid=random.choice(self.people_guids),
-                address=fake.address(),
-                date=fake.date_between(start_date='-2y', end_date='today')
-            )
+        rng = self.rng('accidents')
+
+        def rows():
+            for n in range(self.volumes['accidents']):
+                yield Accidents(
+                    description=f'Accident report #{n + 1}: {rng.choice(["minor injury", "vehicle collision", "equipment damage", "fall"])}',
+                    person_guid=rng.choice(self.person_guids),
+                    address=f'Site {rng.choice(ACCESS_AREAS)}, {rng.choice(CITIES)}',
+                    date=self.today - timedelta(days=rng.randint(0, 730)),
+                )
+
+        return self.insert(Accidents, rows())
 
     def create_relocations(self):
-        """Create relocation records"""
-        self.stdout.write('Creating relocation records...')
-        
-        correspondences = list(Correspondence.objects.all())
-        approval_statuses = ['انتظار', 'حاصل']
-        building_letters = ['A', 'B', 'C', 'D']
-        
-        relocations = []
-        
-        for _ in range(20):
-            relocation = Relocation.objects.create(
-                relocation_letter=random.choice(correspondences) if correspondences else None,
-                person_guid=random.choice(self.people_guids),
-                approval_status=random.choice(approval_statuses),
-                building_number=random.randint(1, 20),
-                building_letter=random.choice(building_letters),
-                flat_number=random.randint(1, 50)
-            )
-            relocations.append(relocation)
-            
-            # Add relocation periods
-            RelocationPeriod.objects.create(
-                relocation=relocation,
-                start_date=fake.date_between(start_date='-1y', end_date='today'),
-                end_date=fake.date_between(start_date='today', end_date='+1y')
-            )
+        rng = self.rng('relocations')
+        periods_rng = self.rng('relocation-periods')
+
+        def rows():
+            for _ in range(self.volumes['relocations']):
+                yield Relocation(
+                    relocation_letter_id=rng.choice(self.letter_ids),
+                    person_guid=rng.choice(self.person_guids),
+                    approval_status=rng.choice(['انتظار', 'حاصل', None]),
+                    building_number=rng.randint(1, 20),
+                    building_letter=rng.choice('ABCD'),
+                    flat_number=rng.randint(1, 50),
+                )
+
+        def children(batch):
+            periods = []
+            for relocation in batch:
+                start = self.today - timedelta(days=periods_rng.randint(0, 365))
+                periods.append(RelocationPeriod(
+                    relocation_id=relocation.pk, start_date=start,
+                    end_date=start + timedelta(days=periods_rng.randint(30, 365)),
+                ))
+            return [(RelocationPeriod, periods)]
+
+        return self.insert(Relocation, rows(), children)
 
     def create_vehicles(self):
-        """Create vehicle records"""
-        self.stdout.write('Creating vehicle records...')
-        
-        companies = list(CompaniesHistory.objects.filter(is_current=True))
-        correspondences = list(Correspondence.objects.all())
-        organizations = ['Owner', 'Contractor']
-        
-        vehicles = []
-        
-        for i in range(25):
-            vehicle = Vehicle.objects.create(
-                vehicle_id=i + 1,
-                organization=random.choice(organizations),
-                correspondence=random.choice(correspondences) if correspondences else None,
-                plate_number=fake.license_plate(),
-                start_date=fake.date_between(start_date='-1y', end_date='today'),
-                end_date=fake.date_between(start_date='today', end_date='+1y') if random.choice([True, False]) else None,
-                company=random.choice(companies) if companies else None
-            )
-            vehicles.append(vehicle)
-            
-            # Add car permits
-            CarPermit.objects.create(
-                vehicle=vehicle,
-                start_date=vehicle.start_date,
-                end_date=vehicle.end_date
-            )
+        rng = self.rng('vehicles')
+
+        def rows():
+            for n in range(self.volumes['vehicles']):
+                start = self.today - timedelta(days=rng.randint(0, 730))
+                yield Vehicle(
+                    vehicle_id=n + 1,
+                    organization=rng.choice(['Owner', 'Contractor']),
+                    correspondence_id=rng.choice(self.letter_ids),
+                    plate_number=f'{rng.randint(100, 9999)} {"".join(rng.choices("ABCDEFGHKLMNRS", k=3))}',
+                    start_date=start,
+                    end_date=start + timedelta(days=rng.randint(30, 730)) if rng.random() < 0.5 else None,
+                    company_id=rng.choice(self.company_ids),
+                )
+
+        def children(batch):
+            return [(CarPermit, [
+                CarPermit(vehicle_id=vehicle.pk, start_date=vehicle.start_date, end_date=vehicle.end_date)
+                for vehicle in batch
+            ])]
+
+        return self.insert(Vehicle, rows(), children)
 
     def create_card_permits(self):
-        """Create card permits and photos"""
-        self.stdout.write('Creating card permits...')
-        
-        permit_types = ['Temporary', 'Permanent']
-        statuses = ['Active', 'Expired', 'Revoked', 'Lost']
-        
-        for i, person_guid in enumerate(random.sample(self.people_guids, 35)):
-            card_permit = CardPermits.objects.create(
-                permit_number=f"CARD-{i+1:05d}",
-                permit_type=random.choice(permit_types),
-                person_guid=person_guid,
-                issue_date=fake.date_between(start_date='-2y', end_date='today'),
-                expiration_date=fake.date_between(start_date='today', end_date='+2y'),
-                status=random.choice(statuses),
-                notes=fake.text(max_nb_chars=200) if random.choice([True, False]) else None
-            )
-            
-            # Add photo for some cards
-            if random.choice([True, False, False]):  # 1/3 chance
-                CardPhotos.objects.create(
-                    permit=card_permit,
-                    file_name=f"photo_{card_permit.permit_number}.jpg",
-                    file_path=f"/media/card_photos/photo_{card_permit.permit_number}.jpg",
-                    file_size_bytes=random.randint(50000, 500000),  # 50KB to 500KB
-                    mime_type='image/jpeg'
+        rng = self.rng('card-permits')
+        photos_rng = self.rng('card-photos')
+
+        def rows():
+            for n in range(self.volumes['card_permits']):
+                issued = self.today - timedelta(days=rng.randint(0, 730))
+                yield CardPermits(
+                    permit_number=f'CARD-{n + 1:07d}',
+                    permit_type=rng.choice(['Temporary', 'Permanent']),
+                    person_guid=rng.choice(self.person_guids),
+                    issue_date=issued,
+                    expiration_date=issued + timedelta(days=rng.randint(30, 1095)),
+                    status=rng.choices(['Active', 'Expired', 'Revoked', 'Lost'], weights=[7, 2, 1, 1])[0],
                 )
 
+        def children(batch):
+            return [(CardPhotos, [
+                CardPhotos(
+                    permit_id=card.pk,
+                    file_name=f'photo_{card.permit_number}.jpg',
+                    file_path=f'card_photos/photo_{card.permit_number}.jpg',
+                    file_size_bytes=photos_rng.randint(50_000, 500_000),
+                    mime_type='image/jpeg',
+                )
+                for card in batch if photos_rng.random() < 1 / 3
+            ])]
+
+        return self.insert(CardPermits, rows(), children)
+
     def print_summary(self):
         """Print summary of created data"""
         self.stdout.write(self.style.SUCCESS('\n=== DATA CREATION SUMMARY ==='))
-        self.stdout.write(f"Users: {User.objects.count()}")
-        self.stdout.write(f"People History: {PeopleHistory.objects.count()}")
-        self.stdout.write(f"Companies History: {CompaniesHistory.objects.count()}")
-        self.stdout.write(f"Employment History: {EmploymentHistory.objects.count()}")
-        self.stdout.write(f"Family Relationships: {FamilyRelationships.objects.count()}")
-        self.stdout.write(f"Correspondence Types: {CorrespondenceTypes.objects.count()}")
-        self.stdout.write(f"Contacts: {Contacts.objects.count()}")
-        self.stdout.write(f"Correspondence: {Correspondence.objects.count()}")
-        self.stdout.write(f"Attachments: {Attachments.objects.count()}")
-        self.stdout.write(f"Permits: {Permits.objects.count()}")
-        self.stdout.write(f"Accidents: {Accidents.objects.count()}")
-        self.stdout.write(f"Relocations: {Relocation.objects.count()}")
-        self.stdout.write(f"Vehicles: {Vehicle.objects.count()}")
-        self.stdout.write(f"Card Permits: {CardPermits.objects.count()}")
+        for model in (
+            User, PeopleHistory, CompaniesHistory, EmploymentHistory, FamilyRelationships, CorrespondenceTypes,
+            Contacts, Correspondence, CorrespondenceStatusLog, Attachments, Permits, ApprovalDecisions,
+            Accidents, Relocation, Vehicle, CardPermits,
+        ):
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {model.objects.count()}')
         self.stdout.write(self.style.SUCCESS('=== END SUMMARY ===\n'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.search import install_search_index, rebuild_search_index, is_supported
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the correspondence full-text search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Database alias to rebuild the index on'
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if not is_supported(connection):
+            self.stdout.write(self.style.WARNING(
+                f'Full-text search is not supported on {connection.vendor}; nothing to do.'
+            ))
+            return
+
+        self.stdout.write('Rebuilding correspondence search index...')
+        install_search_index(connection)
+        rebuild_search_index(connection)
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt successfully!'))
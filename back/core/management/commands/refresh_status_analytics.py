@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core.analytics import refresh_dwell_rollup, rebuild_dwell_rollup, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Fold new correspondence status logs into the time-in-status rollup'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Drop the rollup and recompute it from the whole log'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Status log rows processed per transaction'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.stdout.write('Rebuilding time-in-status rollup...')
+            merged = rebuild_dwell_rollup(options['batch_size'])
+        else:
+            merged = refresh_dwell_rollup(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Merged {merged} dwell times into the rollup.'))
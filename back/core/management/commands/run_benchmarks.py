@@ -0,0 +1,136 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from core.benchmarks import SCENARIOS, build_context, compare, run_suite
+
+
+DEFAULT_BASELINES = Path(settings.BASE_DIR) / 'benchmarks' / 'baselines.json'
+BENCHMARK_PASSWORD = 'password123'
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the hot API endpoints on a generated dataset in a throwaway test database, '
+        'and fail when p95 latency, query count or peak memory regress against the stored baselines'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            default='small',
+            help='populate_fake_data preset to benchmark against (default: small)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='populate_fake_data seed (default: 42)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=100,
+            help='Measured requests per scenario (default: 100)'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=10,
+            help='Unmeasured requests per scenario before measuring (default: 10)'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.5,
+            help='Allowed relative growth of p95 latency and peak memory (default: 0.5)'
+        )
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            metavar='SCENARIO',
+            help='Run only these scenarios'
+        )
+        parser.add_argument(
+            '--baselines',
+            default=str(DEFAULT_BASELINES),
+            help='Baselines JSON file (keyed by scale, then scenario)'
+        )
+        parser.add_argument(
+            '--update-baselines',
+            action='store_true',
+            help='Store this run as the new baselines instead of comparing'
+        )
+
+    def handle(self, *args, **options):
+        scenarios = SCENARIOS
+        if options['only']:
+            known = {scenario.name for scenario in SCENARIOS}
+            unknown = set(options['only']) - known
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+            scenarios = [scenario for scenario in SCENARIOS if scenario.name in options['only']]
+
+        path = Path(options['baselines'])
+        stored = json.loads(path.read_text()) if path.exists() else {}
+        baselines = stored.get(options['scale'], {})
+
+        results = self.run(scenarios, options)
+        self.print_results(results, baselines)
+
+        if options['update_baselines']:
+            stored.setdefault(options['scale'], {}).update(
+                {
+                    name: {key: value for key, value in result.items() if key != 'status'}
+                    for name, result in results.items() if result['status'] == 'ok'
+                }
+            )
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(stored, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baselines written to {path}'))
+            return
+
+        regressions = compare(results, baselines, options['tolerance'])
+        if regressions:
+            for regression in regressions:
+                self.stderr.write(self.style.ERROR(f'  {regression}'))
+            raise CommandError(f'{len(regressions)} benchmark budget(s) regressed.')
+        self.stdout.write(self.style.SUCCESS('All benchmarks within budget.'))
+
+    def run(self, scenarios, options):
+        """Build a test database, populate it and run the scenarios; the database is dropped afterwards"""
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f"Populating '{options['scale']}' dataset (seed {options['seed']})...")
+            call_command('populate_fake_data', scale=options['scale'], seed=options['seed'], stdout=StringIO())
+
+            user = get_user_model().objects.get(username='staff01')
+            client, anonymous = APIClient(), APIClient()
+            client.force_authenticate(user)
+            with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+                context = build_context(client, user.username, BENCHMARK_PASSWORD)
+                return run_suite(client, anonymous, context, scenarios, options['iterations'], options['warmup'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def print_results(self, results, baselines):
+        self.stdout.write(f"{'scenario':<24}{'p50 ms':>9}{'p95 ms':>9}{'base p95':>10}{'queries':>9}{'peak KB':>9}")
+        for name, result in results.items():
+            if result['status'] != 'ok':
+                self.stdout.write(f"{name:<24}  {result['status']}: {result['detail']}")
+                continue
+            base = baselines.get(name, {}).get('p95_ms', '-')
+            self.stdout.write(
+                f"{name:<24}{result['p50_ms']:>9}{result['p95_ms']:>9}{base:>10}{result['queries']:>9}{result['peak_kb']:>9}"
+            )
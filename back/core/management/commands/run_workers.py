@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.jobs import default_worker_id, work
+
+
+def _worker_main(index, stop, burst, poll_interval):
+    """Entry point of a worker process"""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        # Started with the "spawn" method: this is a fresh interpreter
+        django.setup()
+    # Ctrl+C reaches the whole process group; let the parent decide when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    work(f'{default_worker_id()}/{index}', stop=stop, burst=burst, poll_interval=poll_interval)
+
+
+class Command(BaseCommand):
+    help = (
+        'Process background jobs (core/jobs.py) with N worker processes until interrupted. '
+        'SIGINT/SIGTERM let the workers finish their current job before exiting'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'JOB_WORKERS', None) or os.cpu_count() or 1,
+            help='Worker processes (default: JOB_WORKERS, or one per core)'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once no job is due instead of waiting for new ones'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=getattr(settings, 'JOB_POLL_INTERVAL', 1),
+            help='Seconds an idle worker waits before looking for jobs again'
+        )
+
+    def handle(self, *args, **options):
+        count = options['workers']
+        if count < 1:
+            raise CommandError('--workers must be at least 1')
+
+        stop = multiprocessing.Event()
+
+        def request_stop(signum, frame):
+            self.stdout.write('Stopping after the current jobs...')
+            stop.set()
+
+        previous = {signum: signal.signal(signum, request_stop) for signum in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            self.run(count, stop, options)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    def run(self, count, stop, options):
+        if count == 1:
+            processed = work(stop=stop, burst=options['burst'], poll_interval=options['poll_interval'])
+            self.stdout.write(self.style.SUCCESS(f'Worker stopped after {processed} jobs.'))
+            return
+
+        # Children must not share the parent's database connections
+        connections.close_all()
+        args = (stop, options['burst'], options['poll_interval'])
+        processes = {index: self.start(index, args) for index in range(count)}
+        self.stdout.write(f'Started {count} workers.')
+
+        while processes:
+            for index, process in list(processes.items()):
+                process.join(timeout=0.5)
+                if process.is_alive():
+                    continue
+                del processes[index]
+                if process.exitcode != 0 and not stop.is_set():
+                    # Crashed: its job is picked up again when the lease runs out
+                    self.stderr.write(self.style.WARNING(f'Worker {index} exited with {process.exitcode}; restarting'))
+                    processes[index] = self.start(index, args)
+        self.stdout.write(self.style.SUCCESS('All workers stopped.'))
+
+    def start(self, index, args):
+        process = multiprocessing.Process(target=_worker_main, args=(index, *args), name=f'job-worker-{index}')
+        process.start()
+        return process
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.staging import sweep
+
+
+class Command(BaseCommand):
+    help = 'Delete staged files (e.g. .msg attachments) whose STAGING_TTL has passed; run it periodically'
+
+    def handle(self, *args, **options):
+        deleted = sweep()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired staged files.'))
@@ -0,0 +1,195 @@
+"""
+Per-route request metrics in Prometheus text format.
+
+``MetricsMiddleware`` records, for every request, the resolved route (URL
+name + method): a latency histogram, the number and total time of database
+queries, response bytes and a counter per status code. Queries are counted
+with a connection ``execute_wrapper`` installed for the request only.
+
+Everything lives in a fixed-size, per-worker structure. Bucket bounds are
+fixed, each route holds a few preallocated lists, and at most
+``METRICS_MAX_ROUTES`` routes are tracked (the rest are folded into
+``route="other"``); methods outside the standard HTTP set are recorded as
+``method="OTHER"``, so clients cannot add series. The recording path is a couple of ``bisect`` calls and
+list increments under one lock, a few microseconds per request.
+
+Metrics are per worker process. A scrape of ``/api/metrics`` sees only the
+worker that served it, and each series carries a ``pid`` label so several
+workers can be told apart.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+UNMATCHED_ROUTE = 'unmatched'
+OVERFLOW_ROUTE = 'other'
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+OTHER_METHOD = 'OTHER'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RouteStats:
+    __slots__ = ('latency', 'latency_sum', 'queries', 'query_count', 'query_seconds', 'response_bytes', 'statuses')
+
+    def __init__(self):
+        # One slot per bucket plus +Inf; cumulated only when rendering
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.queries = [0] * (len(QUERY_BUCKETS) + 1)
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.response_bytes = 0
+        self.statuses = {}
+
+    def copy(self):
+        clone = RouteStats()
+        clone.latency = list(self.latency)
+        clone.latency_sum = self.latency_sum
+        clone.queries = list(self.queries)
+        clone.query_count = self.query_count
+        clone.query_seconds = self.query_seconds
+        clone.response_bytes = self.response_bytes
+        clone.statuses = dict(self.statuses)
+        return clone
+
+
+class MetricsRegistry:
+    def __init__(self, max_routes=None):
+        self.max_routes = max_routes
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def _stats(self, key):
+        stats = self.routes.get(key)
+        if stats is None:
+            limit = self.max_routes or getattr(settings, 'METRICS_MAX_ROUTES', 256)
+            if len(self.routes) >= limit:
+                key = (OVERFLOW_ROUTE, key[1])
+                stats = self.routes.get(key)
+            if stats is None:
+                stats = self.routes[key] = RouteStats()
+        return stats
+
+    def record(self, route, method, status_code, seconds, query_count, query_seconds, response_bytes):
+        if method not in METHODS:
+            method = OTHER_METHOD
+        with self.lock:
+            stats = self._stats((route, method))
+            stats.latency[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            stats.latency_sum += seconds
+            stats.queries[bisect_left(QUERY_BUCKETS, query_count)] += 1
+            stats.query_count += query_count
+            stats.query_seconds += query_seconds
+            stats.response_bytes += response_bytes
+            stats.statuses[status_code] = stats.statuses.get(status_code, 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.routes = {}
+
+    def render(self):
+        """The registry as Prometheus text exposition format"""
+        with self.lock:
+            snapshot = [(key, stats.copy()) for key, stats in sorted(self.routes.items())]
+
+        pid = os.getpid()
+        labelled = [(f'route="{_escape(route)}",method="{method}",pid="{pid}"', stats) for (route, method), stats in snapshot]
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        def histogram(name, labels, bounds, counts, total):
+            running = 0
+            for bound, count in zip(bounds, counts):
+                running += count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {running}')
+            running += counts[-1]
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {running}')
+            lines.append(f'{name}_sum{{{labels}}} {total}')
+            lines.append(f'{name}_count{{{labels}}} {running}')
+
+        family('http_request_duration_seconds', 'histogram', 'Request latency by route.')
+        for labels, stats in labelled:
+            histogram('http_request_duration_seconds', labels, LATENCY_BUCKETS, stats.latency, stats.latency_sum)
+
+        family('http_request_db_queries', 'histogram', 'Database queries per request by route.')
+        for labels, stats in labelled:
+            histogram('http_request_db_queries', labels, QUERY_BUCKETS, stats.queries, stats.query_count)
+
+        family('http_request_db_seconds_total', 'counter', 'Time spent in database queries by route.')
+        for labels, stats in labelled:
+            lines.append(f'http_request_db_seconds_total{{{labels}}} {stats.query_seconds}')
+
+        family('http_response_bytes_total', 'counter', 'Response body bytes by route (streamed bodies excluded).')
+        for labels, stats in labelled:
+            lines.append(f'http_response_bytes_total{{{labels}}} {stats.response_bytes}')
+
+        family('http_responses_total', 'counter', 'Responses by route and status code.')
+        for labels, stats in labelled:
+            for code, count in sorted(stats.statuses.items()):
+                lines.append(f'http_responses_total{{{labels},status="{code}"}} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+class _QueryTimer:
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNMATCHED_ROUTE
+    return match.view_name or match.route or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Record per-route latency, query count/time, response size and status codes"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        timer = _QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        size = 0 if response.streaming else len(response.content)
+        registry.record(
+            route_name(request), request.method, response.status_code, elapsed, timer.count, timer.seconds, size
+        )
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-17 00:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_correspondence_full_text_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PeopleNameToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=100)),
+            ],
+            options={
+                'verbose_name': 'Person Name Token',
+                'verbose_name_plural': 'Person Name Tokens',
+                'db_table': 'people_name_tokens',
+            },
+        ),
+        migrations.AddField(
+            model_name='peoplenametoken',
+            name='person',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_tokens', to='core.peoplehistory'),
+        ),
+        migrations.AddIndex(
+            model_name='peoplenametoken',
+            index=models.Index(fields=['token', 'person'], name='idx_people_name_token'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.23 on 2026-10-17 00:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_people_name_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Rollup Checkpoint',
+                'verbose_name_plural': 'Rollup Checkpoints',
+                'db_table': 'rollup_checkpoints',
+            },
+        ),
+        migrations.CreateModel(
+            name='StatusDwellRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status_name', models.CharField(max_length=200)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+                ('min_seconds', models.FloatField(blank=True, null=True)),
+                ('max_seconds', models.FloatField(blank=True, null=True)),
+                ('histogram', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('correspondence_type', models.ForeignKey(blank=True, db_column='correspondence_type_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dwell_rollups', to='core.correspondencetypes')),
+            ],
+            options={
+                'verbose_name': 'Status Dwell Rollup',
+                'verbose_name_plural': 'Status Dwell Rollups',
+                'db_table': 'status_dwell_rollup',
+                'ordering': ['correspondence_type', 'status_name'],
+                'unique_together': {('correspondence_type', 'status_name')},
+            },
+        ),
+    ]
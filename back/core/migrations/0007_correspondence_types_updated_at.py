@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_status_dwell_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='correspondencetypes',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
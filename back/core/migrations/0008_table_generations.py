@@ -0,0 +1,26 @@
+# Generated by Django 4.2.23 on 2026-10-17 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_correspondence_types_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('generation', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Table Generation',
+                'verbose_name_plural': 'Table Generations',
+                'db_table': 'table_generations',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.23 on 2026-10-17 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_table_generations'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='correspondence',
+            index=models.Index(fields=['-correspondence_date', '-correspondence_id'], name='idx_corr_date_id'),
+        ),
+        migrations.AddIndex(
+            model_name='correspondence',
+            index=models.Index(fields=['type', '-correspondence_date', '-correspondence_id'], name='idx_corr_type_date'),
+        ),
+        migrations.AddIndex(
+            model_name='correspondence',
+            index=models.Index(fields=['direction', '-correspondence_date', '-correspondence_id'], name='idx_corr_direction_date'),
+        ),
+        migrations.AddIndex(
+            model_name='correspondence',
+            index=models.Index(fields=['assigned_to', 'current_status'], name='idx_corr_assignee_status'),
+        ),
+        migrations.AddIndex(
+            model_name='correspondencestatuslog',
+            index=models.Index(fields=['correspondence', 'created_at', 'id'], name='idx_status_log_corr_created'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-17 01:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_correspondence_hot_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParseResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, unique=True)),
+                ('kind', models.CharField(max_length=20)),
+                ('result', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Parse Result',
+                'verbose_name_plural': 'Parse Results',
+                'db_table': 'parse_results',
+                'indexes': [models.Index(fields=['created_at'], name='idx_parse_results_created')],
+            },
+        ),
+    ]
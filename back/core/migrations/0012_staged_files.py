@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-17 01:20
+
+import core.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StagedFile',
+            fields=[
+                ('staged_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file', models.FileField(max_length=500, upload_to=core.models.staged_upload_path)),
+                ('file_name', models.CharField(help_text='Original filename', max_length=255)),
+                ('file_type', models.CharField(blank=True, help_text='mime type', max_length=100, null=True)),
+                ('file_size', models.BigIntegerField(default=0, help_text='File size in bytes')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='staged_files', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Staged File',
+                'verbose_name_plural': 'Staged Files',
+                'db_table': 'staged_files',
+            },
+        ),
+    ]
@@ -0,0 +1,315 @@
+"""
+Reusable viewset mixins shared by the API viewsets in views.py and viewsets.py
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .exports import export_rows, csv_response, xlsx_response
+from .generations import get_generations
+
+
+# ====================================== EXPANSION ======================================
+def parse_field_list(value):
+    """Split a comma separated query param into a list of names"""
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def get_expansions(request):
+    """Nested relations the client asked for, via ?expand= or by naming them in ?fields="""
+    return (
+        set(parse_field_list(request.query_params.get('expand')))
+        | set(parse_field_list(request.query_params.get('fields')))
+    )
+
+
+def collapses_nested(request, view):
+    """Nested relations are left out of GET collection responses unless expanded"""
+    return request.method == 'GET' and view is not None and not getattr(view, 'detail', True)
+
+
+def normalized_params(request, ignored=()):
+    """Query params as a stable, sorted urlencoded string (for cache keys)"""
+    params = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        if key not in ignored
+        for value in values
+    )
+    return urlencode(params)
+
+
+# ====================================== QUERYSET PLANS ======================================
+class QueryPlanMixin:
+    """
+    Apply select_related / prefetch_related / only() per action.
+
+    Viewsets declare a ``query_plans`` dict keyed by action name. Each plan may
+    contain ``select_related``, ``prefetch_related``, ``only`` and
+    ``annotate`` entries, plus ``expand``: a dict of nested serializer field
+    name -> prefetch lookups, applied only when that relation is actually
+    serialized (see ``collapses_nested``).
+    Actions without their own plan fall back to the ``retrieve`` plan on
+    detail routes and to the ``list`` plan otherwise, so custom actions such
+    as ``active`` or ``expiring_soon`` get the same query budget as the main
+    list endpoint.
+    """
+    query_plans = {}
+
+    def get_query_plan(self):
+        """Return the plan for the current action (empty dict if none)"""
+        action = getattr(self, 'action', None)
+        if action in self.query_plans:
+            return self.query_plans[action]
+        if getattr(self, 'detail', False) and 'retrieve' in self.query_plans:
+            return self.query_plans['retrieve']
+        return self.query_plans.get('list', {})
+
+    def apply_query_plan(self, queryset, plan=None):
+        """Apply a query plan to the given queryset"""
+        plan = self.get_query_plan() if plan is None else plan
+        if plan.get('select_related'):
+            queryset = queryset.select_related(*plan['select_related'])
+        if plan.get('prefetch_related'):
+            queryset = queryset.prefetch_related(*plan['prefetch_related'])
+        if plan.get('expand'):
+            request = getattr(self, 'request', None)
+            if request is not None and collapses_nested(request, self):
+                wanted = get_expansions(request)
+            else:
+                wanted = set(plan['expand'])
+            lookups = [
+                lookup
+                for name, name_lookups in plan['expand'].items() if name in wanted
+                for lookup in name_lookups
+            ]
+            if lookups:
+                queryset = queryset.prefetch_related(*lookups)
+        if plan.get('only'):
+            queryset = queryset.only(*plan['only'])
+        if plan.get('annotate'):
+            queryset = queryset.annotate(**plan['annotate'])
+        return queryset
+
+    def get_queryset(self):
+        return self.apply_query_plan(super().get_queryset())
+
+
+# ====================================== CONDITIONAL GET ======================================
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for ``list`` and ``retrieve``.
+
+    The validators come from one aggregate over the filtered queryset,
+    ``MAX(<last_modified_field>)`` and ``COUNT(*)``, so a request whose
+    ``If-None-Match`` / ``If-Modified-Since`` still matches gets a 304 before
+    any row is fetched or serialized. The row count catches deletes, which do
+    not move ``MAX(updated_at)``; the query params are part of the ETag since
+    they pick the page and the fields returned. Child rows serialized inside
+    the parent touch its ``updated_at`` (see core/signals.py); related tables
+    the serializer reads names from are listed in ``conditional_tables`` and
+    their generations (core/generations.py) are part of the ETag.
+    """
+    last_modified_field = 'updated_at'
+
+    # Related tables the serialized rows read from (their writes bump a generation)
+    conditional_tables = ()
+
+    def get_conditional_state(self):
+        """Return ``(last_modified, count)`` of the rows the response is built from"""
+        # Same rows as the response (get_queryset may restrict them), without its joins and prefetches
+        queryset = self.filter_queryset(self.get_queryset()).select_related(None).prefetch_related(None)
+        try:
+            if getattr(self, 'detail', False):
+                lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+                queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            state = queryset.order_by().aggregate(last_modified=Max(self.last_modified_field), count=Count('pk'))
+        except (TypeError, ValueError, ValidationError):
+            # Malformed lookup value: let get_object answer with its 404
+            return None, 0
+        return state['last_modified'], state['count']
+
+    def get_etag(self, request, last_modified, count):
+        generations = get_generations(self.conditional_tables) if self.conditional_tables else []
+        raw = '|'.join([
+            self.basename, self.action, str(self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, '')),
+            normalized_params(request), getattr(request.accepted_renderer, 'format', ''),
+            last_modified.isoformat() if last_modified else '', str(count),
+            '-'.join(map(str, generations)),
+        ])
+        return quote_etag(hashlib.md5(raw.encode('utf-8')).hexdigest())
+
+    def conditional(self, handler, request, *args, **kwargs):
+        last_modified, count = self.get_conditional_state()
+        if getattr(self, 'detail', False) and not count:
+            return handler(request, *args, **kwargs)
+
+        etag = self.get_etag(request, last_modified, count)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        # MAX(updated_at) does not move when a conditional table changes, so only the ETag can validate then
+        validator = None if self.conditional_tables else timestamp
+        response = get_conditional_response(request, etag=etag, last_modified=validator)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+
+# ====================================== CACHED LISTS ======================================
+class CachedListMixin:
+    """
+    Cache ``list`` responses of slow-changing lookup tables.
+
+    Entries live in the ``LOOKUP_CACHE_ALIAS`` cache (local memory by default;
+    point it at Redis/Memcached to share entries between workers) under a key
+    made of the resource, the normalized query params, the host and scheme
+    (the pagination links are absolute URLs) and the generation of every
+    table in ``cache_tables``. Saving or deleting a row of one of those
+    tables bumps its generation (core/signals.py), so the next request builds
+    a fresh entry under a new key and the stale one just expires.
+    """
+    # Tables the response is built from; defaults to the viewset model's table
+    cache_tables = ()
+
+    def get_cache_tables(self):
+        return tuple(self.cache_tables) or (self.queryset.model._meta.db_table,)
+
+    def get_list_cache_key(self, request):
+        generations = get_generations(self.get_cache_tables())
+        raw = '|'.join([request.scheme, request.get_host(), normalized_params(request)])
+        digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+        return f'list:{self.basename}:{"-".join(map(str, generations))}:{digest}'
+
+    def list(self, request, *args, **kwargs):
+        backend = caches[getattr(settings, 'LOOKUP_CACHE_ALIAS', 'default')]
+        cache_key = self.get_list_cache_key(request)
+        data = backend.get(cache_key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            backend.set(cache_key, response.data, getattr(settings, 'LOOKUP_CACHE_TIMEOUT', 300))
+        return response
+
+
+# ====================================== FACETS ======================================
+class FacetMixin:
+    """
+    Adds a ``facets`` list action returning distinct values and their counts.
+
+    ``GET /api/<resource>/facets/?field=<name>`` runs a single
+    ``SELECT <column>, COUNT(*) ... GROUP BY <column>`` over the filtered
+    queryset, so the same search/filter params as the list view apply.
+    Only fields whitelisted in ``facet_fields`` (public name -> ORM path) can
+    be requested. Results are cached for ``FACET_CACHE_TIMEOUT`` seconds.
+    """
+    facet_fields = {}
+
+    # Params that never change the facet result
+    facet_ignored_params = ('page', 'page_size', 'ordering', 'cursor', 'fields', 'expand')
+
+    def get_query_plan(self):
+        # The aggregate needs neither joins for serialization nor prefetches
+        if getattr(self, 'action', None) == 'facets':
+            return {}
+        return super().get_query_plan()
+
+    def get_facet_cache_key(self, request, field):
+        """Build a cache key from the resource, field and normalized query params"""
+        params = normalized_params(request, self.facet_ignored_params)
+        digest = hashlib.md5(params.encode('utf-8')).hexdigest()
+        return f'facets:{self.basename}:{field}:{digest}'
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Get distinct values (with counts) of one whitelisted field"""
+        field = request.query_params.get('field')
+        if field not in self.facet_fields:
+            return Response(
+                {'error': f'field must be one of: {", ".join(sorted(self.facet_fields))}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        cache_key = self.get_facet_cache_key(request, field)
+        data = cache.get(cache_key)
+        if data is None:
+            path = self.facet_fields[field]
+            limit = getattr(settings, 'FACET_MAX_VALUES', 500)
+            rows = (
+                self.filter_queryset(self.get_queryset())
+                .exclude(**{f'{path}__isnull': True})
+                .order_by()
+                .values_list(path)
+                .annotate(count=Count('pk'))
+                .order_by(path)[:limit]
+            )
+            data = {
+                'field': field,
+                'values': [{'value': value, 'count': count} for value, count in rows],
+            }
+            cache.set(cache_key, data, getattr(settings, 'FACET_CACHE_TIMEOUT', 60))
+        return Response(data)
+
+
+# ====================================== EXPORTS ======================================
+class ExportMixin:
+    """
+    Adds an ``export`` list action streaming the filtered rows as CSV or XLSX.
+
+    ``GET /api/<resource>/export/?file_format=csv|xlsx`` accepts the same
+    filter, search and ordering params as the list view (``format`` is taken
+    by DRF's renderer selection). Columns come from ``export_columns``, a
+    list of (header, ORM path) read with ``values_list``, so no model
+    instance or serializer is involved (see core/exports.py).
+    """
+    export_columns = ()
+    export_formats = ('csv', 'xlsx')
+
+    def get_query_plan(self):
+        # values_list does its own joins; nothing to select/prefetch/annotate
+        if getattr(self, 'action', None) == 'export':
+            return {}
+        return super().get_query_plan()
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Download the filtered rows as CSV (streamed) or XLSX"""
+        file_format = request.query_params.get('file_format', 'csv').lower()
+        if file_format not in self.export_formats:
+            return Response(
+                {'error': f'file_format must be one of: {", ".join(self.export_formats)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        headers = [header for header, _ in self.export_columns]
+        rows = export_rows(queryset, self.export_columns)
+        filename = f'{self.basename}-{timezone.localtime():%Y%m%d-%H%M}'
+        if file_format == 'xlsx':
+            try:
+                return xlsx_response(rows, headers, filename, sheet_title=self.basename)
+            except ImportError:
+                return Response(
+                    {'error': 'openpyxl library is not installed. Please install it to export XLSX files.'},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
+        return csv_response(rows, headers, filename)
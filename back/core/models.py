@@ -1,10 +1,12 @@
 from unicodedata import category
+import json
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from django.utils import timezone
 import uuid
 from django.core.validators import FileExtensionValidator
+from .arabic import name_tokens
 
 
 # ====================================== USERS ======================================
@@ -139,6 +141,46 @@ class PeopleHistory(models.Model):
     
     def __str__(self):
         return f"{self.full_name_arabic} (v{self.version})"
+    
+    def save(self, *args, **kwargs):
+        """Keep the name token index in sync with the names"""
+        update_fields = kwargs.get('update_fields')
+        super().save(*args, **kwargs)
+        if update_fields is None or {'full_name_arabic', 'full_name_english'} & set(update_fields):
+            self.refresh_name_tokens()
+    
+    def build_name_tokens(self):
+        """Unsaved PeopleNameToken rows for this record's names"""
+        return [
+            PeopleNameToken(person=self, token=token[:100])
+            for token in name_tokens(self.full_name_arabic, self.full_name_english)
+        ]
+    
+    def refresh_name_tokens(self):
+        """Rebuild this record's rows in the name token index"""
+        self.name_tokens.all().delete()
+        PeopleNameToken.objects.bulk_create(self.build_name_tokens())
+
+
+class PeopleNameToken(models.Model):
+    """
+    Token index over people names: one row per normalized word of
+    full_name_arabic / full_name_english, so a name can be found by any of
+    its parts in any order with an index range scan.
+    """
+    person = models.ForeignKey(PeopleHistory, on_delete=models.CASCADE, related_name='name_tokens')
+    token = models.CharField(max_length=100)
+    
+    class Meta:
+        db_table = 'people_name_tokens'
+        verbose_name = 'Person Name Token'
+        verbose_name_plural = 'Person Name Tokens'
+        indexes = [
+            models.Index(fields=['token', 'person'], name='idx_people_name_token'),
+        ]
+    
+    def __str__(self):
+        return f"{self.token} -> {self.person_id}"
 
 
 class CompaniesHistory(models.Model):
@@ -234,6 +276,7 @@ class CorrespondenceTypes(models.Model):
     correspondence_type_id = models.AutoField(primary_key=True)
     type_name = models.CharField(max_length=255)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, help_text='General, Russian')
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'correspondence_types'
@@ -327,6 +370,13 @@ class Correspondence(models.Model):
         unique_together = ['reference_number', 'correspondence_date']
         indexes = [
             models.Index(fields=['reference_number', 'correspondence_date'], name='idx_ref_num_date_unique'),
+            # Default list order / keyset pagination
+            models.Index(fields=['-correspondence_date', '-correspondence_id'], name='idx_corr_date_id'),
+            # Filtered lists, newest first (type also serves type__category through the tiny types table)
+            models.Index(fields=['type', '-correspondence_date', '-correspondence_id'], name='idx_corr_type_date'),
+            models.Index(fields=['direction', '-correspondence_date', '-correspondence_id'], name='idx_corr_direction_date'),
+            # "Assigned to me, in status X" work queues
+            models.Index(fields=['assigned_to', 'current_status'], name='idx_corr_assignee_status'),
         ]
     
     def __str__(self):
@@ -352,6 +402,10 @@ class CorrespondenceStatusLog(models.Model):
         verbose_name = 'Correspondence Status Log'
         verbose_name_plural = 'Correspondence Status Logs'
         ordering = ['-created_at']
+        indexes = [
+            # A letter's history in order (status_logs prefetch, dwell-time window)
+            models.Index(fields=['correspondence', 'created_at', 'id'], name='idx_status_log_corr_created'),
+        ]
     
     def __str__(self):
         from_status_name = self.form_status_name or 'Initial'
@@ -360,6 +414,136 @@ class CorrespondenceStatusLog(models.Model):
         return f"Correspondence {self.correspondence.correspondence_id}: {from_status_name} → {to_status_name} by {changed_by_name}"
 
 
+class StatusDwellRollup(models.Model):
+    """
+    Materialized time-in-status statistics per correspondence type and status.
+
+    Maintained incrementally by core/analytics.py: each refresh only reads the
+    status logs added since ``RollupCheckpoint`` and merges the new dwell
+    times into these rows. ``histogram`` holds log-scale bucket counts
+    (bucket index -> count) from which percentiles are estimated.
+    """
+    correspondence_type = models.ForeignKey(CorrespondenceTypes, on_delete=models.CASCADE, null=True, blank=True, related_name='dwell_rollups', db_column='correspondence_type_id')
+    status_name = models.CharField(max_length=200)
+    count = models.PositiveIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    min_seconds = models.FloatField(null=True, blank=True)
+    max_seconds = models.FloatField(null=True, blank=True)
+    histogram = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'status_dwell_rollup'
+        verbose_name = 'Status Dwell Rollup'
+        verbose_name_plural = 'Status Dwell Rollups'
+        unique_together = ['correspondence_type', 'status_name']
+        ordering = ['correspondence_type', 'status_name']
+    
+    def __str__(self):
+        return f"{self.correspondence_type_id} / {self.status_name}: {self.count}"
+
+
+class TableGeneration(models.Model):
+    """
+    Per-table change counter used to invalidate cached responses.
+
+    Bumped by signal handlers whenever a row of ``name`` is saved or deleted
+    (see core/signals.py). Being stored in the database, the counter is seen
+    by every worker and changes atomically with the write that caused it.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    generation = models.BigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'table_generations'
+        verbose_name = 'Table Generation'
+        verbose_name_plural = 'Table Generations'
+    
+    def __str__(self):
+        return f"{self.name}: {self.generation}"
+
+
+class RollupCheckpoint(models.Model):
+    """Highest source row id already folded into a rollup table"""
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'rollup_checkpoints'
+        verbose_name = 'Rollup Checkpoint'
+        verbose_name_plural = 'Rollup Checkpoints'
+    
+    def __str__(self):
+        return f"{self.name}: {self.last_id}"
+
+
+class ParseResult(models.Model):
+    """
+    Persisted parse result of an uploaded file, keyed by the kind of parse,
+    the extractor version and the SHA-256 of the file (see core/parse_cache.py).
+    """
+    key = models.CharField(max_length=255, unique=True)
+    kind = models.CharField(max_length=20)
+    result = models.TextField()  # JSON
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'parse_results'
+        verbose_name = 'Parse Result'
+        verbose_name_plural = 'Parse Results'
+        indexes = [
+            models.Index(fields=['created_at'], name='idx_parse_results_created'),
+        ]
+    
+    def __str__(self):
+        return self.key
+
+
+class Job(models.Model):
+    """
+    Background job processed off the request path by ``manage.py run_workers``
+    (see core/jobs.py). A running job is leased to one worker until
+    ``locked_until``; a lease that runs out (crashed worker) makes the job
+    claimable again. ``files`` are storage names deleted once the job finishes.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    job_id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    files = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'jobs'
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='idx_jobs_status_available'),
+            models.Index(fields=['status', 'locked_until'], name='idx_jobs_status_locked'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} #{self.job_id} ({self.status})"
+
+
 
 
 
@@ -386,6 +570,34 @@ class Attachments(models.Model):
         return self.file_name
 
 
+def staged_upload_path(instance, filename):
+    """Staged files live in their own directory so names never clash"""
+    return f'staging/{instance.staged_id.hex}/{filename}'
+
+class StagedFile(models.Model):
+    """
+    File extracted on the server (e.g. from a .msg) and kept until it is
+    attached to a letter or ``expires_at`` passes (see core/staging.py).
+    Clients refer to it by the opaque ``staged_id`` only.
+    """
+    staged_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file = models.FileField(upload_to=staged_upload_path, max_length=500)
+    file_name = models.CharField(max_length=255, help_text='Original filename')
+    file_type = models.CharField(max_length=100, blank=True, null=True, help_text='mime type')
+    file_size = models.BigIntegerField(default=0, help_text='File size in bytes')
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='staged_files')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'staged_files'
+        verbose_name = 'Staged File'
+        verbose_name_plural = 'Staged Files'
+    
+    def __str__(self):
+        return self.file_name
+
+
 # ====================================== APPROVAL ======================================
 class Permits(models.Model):
     """Permits for people or companies"""
@@ -648,7 +860,6 @@ class Settings(models.Model):
                 return 0
         elif self.setting_type == 'json':
             try:
-                import json
                 return json.loads(self.value)
             except json.JSONDecodeError:
                 return {}
@@ -0,0 +1,107 @@
+"""
+Attachment and metadata extraction from Outlook .msg files.
+
+``parse_msg`` is shared by the ``process-msg`` endpoint and the
+``process_msg`` background job (core/tasks.py). Attachments are written to
+the staging area (core/staging.py) one at a time as they are read, and only
+their metadata and staged ids are returned. ``open_msg`` and
+``iter_attachments`` are also used by the one-shot import (core/msg_import.py).
+"""
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+
+import extract_msg
+
+from .parse_cache import parse_cache, MISSING
+from .staging import stage, describe, lookup
+
+
+# Bump when a change to parse_msg alters its results; part of the parse cache key with the library version
+MSG_CACHE_VERSION = f'2-{extract_msg.__version__}'
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def open_msg(chunks):
+    """Open a .msg file given as byte ``chunks`` (e.g. ``upload.chunks()``) as an ``extract_msg.Message``"""
+    # extract-msg reads from a path: spool the message to a temporary file
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.msg') as temp_file:
+        for chunk in chunks:
+            temp_file.write(chunk)
+        temp_file_path = temp_file.name
+
+    try:
+        msg = extract_msg.Message(temp_file_path)
+        try:
+            yield msg
+        finally:
+            msg.close()
+    finally:
+        os.unlink(temp_file_path)
+
+
+def iter_attachments(msg):
+    """``(name, data, mime type)`` of each non-empty attachment of an open message, skipping unreadable ones"""
+    for i, attachment in enumerate(getattr(msg, 'attachments', None) or []):
+        try:
+            attachment_data = attachment.data
+            attachment_name = attachment.longFilename or attachment.shortFilename or f'attachment_{i}'
+        except Exception as e:
+            logger.warning('Error processing attachment %d: %s', i, e)
+            continue
+        if attachment_data:
+            yield attachment_name, attachment_data, getattr(attachment, 'mimeType', None)
+
+
+def email_info(msg):
+    """Email metadata of an open message, for reference"""
+    body = getattr(msg, 'body', '') or ''
+    return {
+        'subject': getattr(msg, 'subject', ''),
+        'sender': getattr(msg, 'sender', ''),
+        'date': str(getattr(msg, 'date', '')),
+        'body': body[:500]  # First 500 chars
+    }
+
+
+def parse_msg(chunks, user=None):
+    """
+    Attachments and email metadata of a .msg file given as byte ``chunks``,
+    as ``{'attachments': [...], 'email_info': {...}}``. Attachments are
+    staged for ``user``.
+    """
+    with open_msg(chunks) as msg:
+        attachments_data = []
+        for attachment_name, attachment_data, mime_type in iter_attachments(msg):
+            try:
+                attachments_data.append(describe(stage(attachment_name, attachment_data, mime_type, user)))
+            except Exception as e:
+                logger.warning('Error staging attachment %s: %s', attachment_name, e)
+        info = email_info(msg)
+
+    return {'attachments': attachments_data, 'email_info': info}
+
+
+def cached_msg(digest, user):
+    """
+    Cached ``parse_msg`` result of the file with ``digest``, or ``MISSING``.
+    A result is only reused while all its staged attachments are still
+    available to ``user``; otherwise the message has to be parsed again.
+    """
+    parsed = parse_cache.get('msg', MSG_CACHE_VERSION, digest)
+    if parsed is MISSING:
+        return MISSING
+    _, missing = lookup([attachment['staged_id'] for attachment in parsed['attachments']], user)
+    return MISSING if missing else parsed
+
+
+def msg_payload(parsed, file_name):
+    """Response body of ``process-msg`` for a ``parse_msg`` result"""
+    return {
+        'success': True,
+        **parsed,
+        'message': f"Successfully extracted {len(parsed['attachments'])} attachments from {file_name}"
+    }
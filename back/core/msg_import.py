@@ -0,0 +1,164 @@
+"""
+One-shot import of an emailed letter (``/api/correspondence/import-msg/``).
+
+The .msg file is parsed once. Its PDF attachments go through the template
+extractor (core/pdf_extraction.py, sharing the parse cache with
+``parse-pdf-content``) to prefill the reference number, date and subject;
+the email's own subject and date are the fallback, and fields sent with the
+request win over both. The letter, its attachments and its initial status
+log are then created in one transaction. Attachments are written to storage
+from the bytes read out of the message: no staging, no second copy. Files
+already written are deleted again if the transaction rolls back.
+"""
+import logging
+import mimetypes
+from datetime import date, datetime
+from email.utils import parsedate_to_datetime
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from rest_framework import serializers
+
+from .bulk import INITIAL_LOG_REASON
+from .models import Attachments, CorrespondenceStatusLog
+from .msg_extraction import open_msg, iter_attachments, email_info
+from .parse_cache import parse_cache, content_hash, MISSING
+from .pdf_extraction import extract, cache_version
+from .serializers import CorrespondenceSerializer
+from .settings_registry import settings_registry
+
+
+PREFILL_FIELDS = ('reference_number', 'correspondence_date', 'subject')
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedMessage:
+    """Attachments ``(name, data, mime type)`` and email metadata of a .msg file"""
+
+    def __init__(self, attachments, info, sent):
+        self.attachments = attachments
+        self.info = info
+        self.sent = sent
+
+
+def read_message(chunks):
+    """Parse a .msg file given as byte ``chunks`` (e.g. ``upload.chunks()``)"""
+    with open_msg(chunks) as msg:
+        return ParsedMessage(list(iter_attachments(msg)), email_info(msg), getattr(msg, 'date', None))
+
+
+def _is_pdf(name, mime_type):
+    return (mime_type or '').lower() == 'application/pdf' or name.lower().endswith('.pdf')
+
+
+def _sent_date(value):
+    """Date part of the message's send time, which extract-msg gives as a datetime or a header string"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value:
+        try:
+            return parsedate_to_datetime(str(value)).date()
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def prefill(message, template):
+    """
+    ``(fields, sources)``: the first value found for each of PREFILL_FIELDS
+    in the PDF attachments, in attachment order, and the names of the PDFs
+    that contributed. Unreadable PDFs are skipped; without PyMuPDF nothing
+    is extracted.
+    """
+    fields, sources = {}, []
+    version = cache_version(template)
+    for name, data, mime_type in message.attachments:
+        if len(fields) == len(PREFILL_FIELDS):
+            break
+        if not _is_pdf(name, mime_type):
+            continue
+
+        digest = content_hash(data)
+        result = parse_cache.get('pdf', version, digest)
+        if result is MISSING:
+            try:
+                result = extract(data, template)
+            except ImportError:
+                break
+            except Exception as e:
+                logger.warning('Error extracting fields from %s: %s', name, e)
+                continue
+            parse_cache.set('pdf', version, digest, result)
+        if result is None:
+            continue
+
+        found = {
+            field: value for field, value in result['fields'].items()
+            if field in PREFILL_FIELDS and field not in fields and value
+        }
+        if found:
+            fields.update(found)
+            sources.append(name)
+    return fields, sources
+
+
+def import_message(message, data, user, template):
+    """
+    Create a letter from a ``read_message`` result. ``data`` holds
+    correspondence fields that override the prefilled ones; ``direction``
+    defaults to Incoming. Raises ``ValidationError`` when the resulting
+    letter is invalid or an attachment is too large.
+    Returns ``(correspondence, prefill report)``.
+    """
+    extracted, sources = prefill(message, template)
+    values = {
+        'reference_number': extracted.get('reference_number'),
+        'correspondence_date': extracted.get('correspondence_date') or _sent_date(message.sent),
+        'subject': (extracted.get('subject') or message.info['subject'] or '')[:255],
+        'direction': 'Incoming',
+    }
+    values = {field: value for field, value in values.items() if value}
+    values.update(data)
+    serializer = CorrespondenceSerializer(data=values)
+    serializer.is_valid(raise_exception=True)
+
+    max_file_size_mb = settings_registry.get('max_file_size_mb')
+    if max_file_size_mb:
+        too_large = [name for name, content, _ in message.attachments if len(content) > max_file_size_mb * 1024 * 1024]
+        if too_large:
+            raise serializers.ValidationError(
+                {'attachments': [f'Files larger than {max_file_size_mb} MB are not allowed: {", ".join(too_large)}']}
+            )
+
+    written = []
+    try:
+        with transaction.atomic():
+            correspondence = serializer.save()
+            for name, content, mime_type in message.attachments:
+                attachment = Attachments(
+                    correspondence=correspondence,
+                    file_name=name,
+                    file_type=mime_type or mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                    file_size=len(content),
+                )
+                attachment.file.save(name, ContentFile(content), save=False)
+                written.append(attachment.file)
+                attachment.save()
+            if correspondence.current_status_id:
+                CorrespondenceStatusLog.objects.create(
+                    correspondence=correspondence,
+                    form_status_name=None,
+                    to_status_name=correspondence.current_status.procedure_name,
+                    changed_by=user,
+                    change_reason=INITIAL_LOG_REASON
+                )
+    except Exception:
+        for stored in written:
+            stored.storage.delete(stored.name)
+        raise
+
+    report = {'fields': extracted, 'extracted_from': sources, 'email_info': message.info}
+    return correspondence, report
@@ -0,0 +1,183 @@
+"""
+Pagination classes for the API.
+
+StandardPageNumberPagination is the project default and honours the
+``page_size`` query param sent by the frontend (capped at MAX_PAGE_SIZE).
+
+KeysetPagination adds a cursor mode for large tables: instead of
+``COUNT(*)`` + ``OFFSET``, each page is fetched with a ``WHERE`` on the
+ordering key of the last row seen, so deep pages cost the same as page 1.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class StandardPageNumberPagination(PageNumberPagination):
+    """Page number pagination with a capped, client-selectable page size"""
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'MAX_PAGE_SIZE', 200)
+
+
+class KeysetPagination(StandardPageNumberPagination):
+    """
+    Page number pagination with an opt-in keyset (cursor) mode.
+
+    Cursor mode is used when the request carries ``cursor`` or
+    ``pagination=cursor``; otherwise the classic page number behaviour
+    applies so existing clients keep working.
+
+    In cursor mode the rows are ordered by the requested ordering (or the
+    view's ``keyset_ordering``) with the primary key appended as a
+    tie-breaker, and the response contains ``next`` and ``results``. The
+    total ``count`` is included unless the client sends ``count=false``.
+    Only forward navigation is supported, which is what infinite scroll
+    needs.
+
+    Querysets ordered by an annotation (e.g. ``search_rank`` from the
+    full-text search) are paginated by page number even in cursor mode: a
+    computed float is no reliable cursor key, and dropping it would lose the
+    relevance order. Such responses carry no ``cursor`` in ``next``, so
+    clients continue with ``page``.
+    """
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def use_keyset(self, request):
+        return (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = self.use_keyset(request) and not self.ordered_by_annotation(queryset)
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_keyset_ordering(queryset, view)
+        self.count = queryset.count() if self.include_count(request) else None
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor is not None:
+            queryset = queryset.filter(self.build_keyset_filter(cursor))
+
+        # Fetch one extra row to know whether there is a next page
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_cursor_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def ordered_by_annotation(self, queryset):
+        return any(
+            isinstance(field, str) and field.lstrip('-') in queryset.query.annotations
+            for field in queryset.query.order_by
+        )
+
+    def include_count(self, request):
+        return request.query_params.get(self.count_query_param, 'true').lower() not in ('false', '0', 'no')
+
+    # ------------------------------------------------------------------ ordering
+    def get_keyset_ordering(self, queryset, view):
+        """
+        Resolve the ordering used for the keyset.
+
+        The queryset ordering (from OrderingFilter or the view default) is
+        used when every field is a non-null column on the model itself;
+        otherwise the view's ``keyset_ordering`` is used. The primary key is
+        appended so the ordering is always total.
+        """
+        model = queryset.model
+        ordering = [
+            field for field in queryset.query.order_by
+            if isinstance(field, str)
+        ] or list(getattr(view, 'keyset_ordering', None) or model._meta.ordering or [])
+        if not all(self._is_keyset_field(model, field) for field in ordering):
+            ordering = list(getattr(view, 'keyset_ordering', None) or [])
+
+        pk_name = model._meta.pk.name
+        names = [field.lstrip('-') for field in ordering]
+        if pk_name not in names and 'pk' not in names:
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append(f'-{pk_name}' if descending else pk_name)
+        return [f'-{pk_name}' if field == '-pk' else pk_name if field == 'pk' else field for field in ordering]
+
+    def _is_keyset_field(self, model, field):
+        name = field.lstrip('-')
+        if name == 'pk':
+            return True
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return model_field.concrete and not model_field.null and not model_field.is_relation
+
+    def build_keyset_filter(self, values):
+        """
+        Build ``(a < x) OR (a = x AND b < y) ...`` for the current ordering,
+        which the database can answer with an index range scan.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    # ------------------------------------------------------------------ cursors
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        values = []
+        for field in self.ordering:
+            model_field = last._meta.get_field(field.lstrip('-'))
+            values.append(model_field.value_to_string(last))
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.mode_query_param)
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(values))
+
+    def encode_cursor(self, values):
+        raw = json.dumps({'o': self.ordering, 'v': values}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request, model):
+        """Return the typed key values of the cursor, or None on the first page"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if raw['o'] != self.ordering or len(raw['v']) != len(self.ordering):
+                raise ValueError('cursor does not match the ordering')
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, raw['v'])
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
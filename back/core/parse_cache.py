@@ -0,0 +1,107 @@
+"""
+Content-addressed cache of file parse results.
+
+Users often drop the same PDF or .msg file again (e.g. after a validation
+error). Results are stored under ``<kind>:<version>:<sha256 of the bytes>``,
+so a repeated upload is answered without parsing, while a new extractor
+version (code, template or library) produces new keys and the old entries
+simply age out.
+
+Entries live in a per-process LRU bounded by ``PARSE_CACHE_MAX_ENTRIES`` and
+``PARSE_CACHE_MAX_BYTES`` (measured on the stored JSON). With
+``PARSE_CACHE_PERSIST`` they are also written to ``ParseResult`` rows, which
+survive restarts and are shared by workers; the table is trimmed to the
+newest ``PARSE_CACHE_DB_MAX_ENTRIES`` rows. Only JSON-serializable results
+can be cached, and callers get a fresh copy on every hit.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import ParseResult
+
+
+MISSING = object()
+
+
+def content_hash(data):
+    """SHA-256 hex digest of ``data`` (bytes or an iterable of byte chunks, e.g. ``upload.chunks()``)"""
+    digest = hashlib.sha256()
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        digest.update(data)
+    else:
+        for chunk in data:
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kind, version, digest):
+        return f'{kind}:{version}:{digest}'
+
+    def get(self, kind, version, digest):
+        """Cached result, or ``MISSING``"""
+        key = self.key(kind, version, digest)
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+        if text is None and getattr(settings, 'PARSE_CACHE_PERSIST', False):
+            text = ParseResult.objects.filter(key=key).values_list('result', flat=True).first()
+            if text is not None:
+                self._remember(key, text)
+        return MISSING if text is None else json.loads(text)
+
+    def set(self, kind, version, digest, result):
+        key = self.key(kind, version, digest)
+        text = json.dumps(result)
+        self._remember(key, text)
+        if getattr(settings, 'PARSE_CACHE_PERSIST', False):
+            try:
+                with transaction.atomic():
+                    ParseResult.objects.create(key=key, kind=kind, result=text)
+            except IntegrityError:
+                # Another worker stored the same file first
+                return
+            self._trim_table()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remember(self, key, text):
+        max_entries = getattr(settings, 'PARSE_CACHE_MAX_ENTRIES', 256)
+        max_bytes = getattr(settings, 'PARSE_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+        if len(text) > max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = text
+            self._bytes += len(text)
+            while len(self._entries) > max_entries or self._bytes > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _trim_table(self):
+        max_rows = getattr(settings, 'PARSE_CACHE_DB_MAX_ENTRIES', 10000)
+        stale = list(
+            ParseResult.objects.order_by('-created_at', '-id').values_list('id', flat=True)[max_rows:max_rows + 1000]
+        )
+        if stale:
+            ParseResult.objects.filter(id__in=stale).delete()
+
+
+parse_cache = ParseCache()
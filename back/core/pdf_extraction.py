@@ -0,0 +1,394 @@
+"""
+Template-driven field extraction from PDF letters.
+
+A PDF is opened once and the words of its first page are read, with their
+positions, in a single ``get_text('words')`` pass. Everything else works on
+that word list: a template names regions of the page (as fractions of the
+page size) and maps fields to them, and a word belongs to a region when its
+centre lies inside it. Fields missing from the regions can be looked up
+with regexes over the first lines of the whole page (the template's
+fallback), again from the same word list.
+
+Templates are configuration, not code: a JSON file (``PDF_TEMPLATES_FILE``)
+keyed by template name, loaded and compiled once per process. ``extract``
+accepts bytes, a path or a file object, so the API and batch jobs share it.
+
+``extract_many`` runs extractions in a process pool of ``PDF_BATCH_WORKERS``
+processes (default: one per core), so PyMuPDF work leaves the web worker and
+runs in parallel. Each file has ``PDF_BATCH_TIMEOUT`` seconds; a file that
+overruns is reported as timed out. A busy pool process cannot be
+interrupted, so the pool is retired: later batches get a fresh pool, and the
+retired one is torn down once the batches still using it are done, so a
+timeout in one request never breaks another request's extractions.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from functools import lru_cache
+from importlib import metadata
+
+from django.conf import settings
+
+
+DATE_GROUPS = {'day', 'month', 'year'}
+
+# Bump when a code change alters extraction results; cached results (core/parse_cache.py) are keyed by it
+EXTRACTOR_VERSION = 1
+
+
+class TemplateError(ValueError):
+    """Unknown template name or invalid template definition"""
+
+
+class PageText:
+    """Words of one page as ``(x0, y0, x1, y1, text, block, line, word)`` tuples"""
+
+    def __init__(self, width, height, words):
+        self.width = width
+        self.height = height
+        self.words = words
+
+    def lines(self, bounds=None):
+        """Text lines in reading order, keeping only words centred inside ``bounds`` (x0, y0, x1, y1)"""
+        lines = {}
+        for x0, y0, x1, y1, text, block, line, *_ in self.words:
+            if bounds is not None:
+                cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+                if not (bounds[0] <= cx <= bounds[2] and bounds[1] <= cy <= bounds[3]):
+                    continue
+            lines.setdefault((block, line), []).append(text)
+        return [' '.join(words) for words in lines.values()]
+
+
+class Region:
+    def __init__(self, name, spec):
+        rect = spec.get('rect')
+        if not isinstance(rect, list) or len(rect) != 4:
+            raise TemplateError(f'Region {name!r} needs "rect": [x0, y0, x1, y1] as page fractions')
+        self.name = name
+        self.rect = [float(value) for value in rect]
+        self.extend_below = float(spec.get('extend_below', 0))
+
+    def bounds(self, width, height):
+        """Absolute coordinates on a ``width`` x ``height`` page"""
+        x0, y0, x1, y1 = self.rect
+        return x0 * width, y0 * height, x1 * width, y1 * height + self.extend_below
+
+
+class Field:
+    def __init__(self, name, spec, date_patterns=()):
+        self.name = name
+        self.region = spec.get('region')
+        self.line = spec.get('line')
+        self.type = spec.get('type', 'text')
+        if self.type not in ('text', 'date'):
+            raise TemplateError(f'Field {name!r} has unknown type {self.type!r}')
+        try:
+            self.patterns = [re.compile(pattern) for pattern in spec.get('patterns', [])]
+        except re.error as e:
+            raise TemplateError(f'Field {name!r} has an invalid pattern: {e}') from None
+        if self.type == 'date':
+            self.patterns = self.patterns or list(date_patterns)
+            if not self.patterns:
+                raise TemplateError(f'Date field {name!r} has no patterns')
+            for pattern in self.patterns:
+                if not DATE_GROUPS <= set(pattern.groupindex):
+                    raise TemplateError(f'Date pattern {pattern.pattern!r} needs day, month and year groups')
+
+    def parse(self, text):
+        """Value of the field found in ``text``, or None"""
+        text = ' '.join(text.split())
+        if not text:
+            return None
+        if self.type == 'date':
+            for pattern in self.patterns:
+                for match in pattern.finditer(text):
+                    try:
+                        return date(int(match['year']), int(match['month']), int(match['day'])).isoformat()
+                    except ValueError:
+                        continue
+            return None
+        if not self.patterns:
+            return text
+        for pattern in self.patterns:
+            match = pattern.search(text)
+            if match:
+                value = match.groupdict().get('value') or match.group(0)
+                return value.strip() or None
+        return None
+
+
+class Template:
+    def __init__(self, name, spec):
+        self.name = name
+        self.description = spec.get('description', '')
+        self.fingerprint = hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+        self.regions = {
+            region_name: Region(region_name, region) for region_name, region in spec.get('regions', {}).items()
+        }
+        try:
+            date_patterns = [re.compile(pattern) for pattern in spec.get('date_patterns', [])]
+        except re.error as e:
+            raise TemplateError(f'Template {name!r} has an invalid date pattern: {e}') from None
+
+        self.fields = [Field(field_name, field, date_patterns) for field_name, field in spec.get('fields', {}).items()]
+        for field in self.fields:
+            if field.region not in self.regions:
+                raise TemplateError(f'Field {field.name!r} refers to unknown region {field.region!r}')
+
+        fallback = spec.get('fallback', {})
+        self.fallback_lines = fallback.get('max_lines', 15)
+        self.fallback_fields = [
+            Field(field_name, field, date_patterns) for field_name, field in fallback.get('fields', {}).items()
+        ]
+
+    def apply(self, page):
+        """
+        Extract the template's fields from ``page``. The fallback only runs
+        when the regions yielded none of the fallback's fields, e.g. because
+        the letter does not follow the template's layout.
+        """
+        regions = {
+            name: page.lines(region.bounds(page.width, page.height)) for name, region in self.regions.items()
+        }
+        values = {}
+        for field in self.fields:
+            lines = regions[field.region]
+            if field.line is None:
+                text = ' '.join(lines)
+            else:
+                text = lines[field.line] if field.line < len(lines) else ''
+            values[field.name] = field.parse(text)
+
+        method = 'region_based'
+        if self.fallback_fields and not any(values.get(field.name) for field in self.fallback_fields):
+            for line in page.lines()[:self.fallback_lines]:
+                for field in self.fallback_fields:
+                    if not values.get(field.name):
+                        values[field.name] = field.parse(line)
+            if any(values.get(field.name) for field in self.fallback_fields):
+                method = 'pattern_matching'
+
+        return {
+            'template': self.name,
+            'method': method,
+            'fields': values,
+            'regions': regions,
+            'page_size': (page.width, page.height),
+        }
+
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def load_templates(path=None):
+    """``{name: Template}`` from a templates file (default ``PDF_TEMPLATES_FILE``), compiled once per path"""
+    path = str(path or settings.PDF_TEMPLATES_FILE)
+    with _templates_lock:
+        templates = _templates.get(path)
+        if templates is None:
+            with open(path, encoding='utf-8') as f:
+                specs = json.load(f)
+            templates = _templates[path] = {name: Template(name, spec) for name, spec in specs.items()}
+    return templates
+
+
+def reload_templates():
+    """Forget the compiled templates so the next use re-reads the files"""
+    with _templates_lock:
+        _templates.clear()
+
+
+def get_template(name=None):
+    name = name or settings.PDF_DEFAULT_TEMPLATE
+    try:
+        return load_templates()[name]
+    except KeyError:
+        raise TemplateError(f'Unknown PDF template: {name!r}') from None
+
+
+@lru_cache(maxsize=None)
+def _pymupdf_version():
+    try:
+        return metadata.version('PyMuPDF')
+    except metadata.PackageNotFoundError:
+        return 'none'
+
+
+def cache_version(template):
+    """Version tag of results produced with ``template``: engine, template definition and PyMuPDF release"""
+    return f'{EXTRACTOR_VERSION}-{template.name}-{template.fingerprint}-{_pymupdf_version()}'
+
+
+def read_page(source, page_number=0):
+    """
+    Words of one page of a PDF, or None if the document has no such page.
+    ``source`` is bytes, a path or a file object (read once). Needs PyMuPDF.
+    """
+    import fitz  # PyMuPDF
+
+    if hasattr(source, 'read'):
+        source = source.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        doc = fitz.open(stream=bytes(source), filetype='pdf')
+    else:
+        doc = fitz.open(str(source), filetype='pdf')
+    try:
+        if page_number >= len(doc):
+            return None
+        page = doc[page_number]
+        return PageText(page.rect.width, page.rect.height, page.get_text('words'))
+    finally:
+        doc.close()
+
+
+def extract(source, template=None):
+    """Apply a template (name or ``Template``, default ``PDF_DEFAULT_TEMPLATE``) to the first page of a PDF"""
+    if not isinstance(template, Template):
+        template = get_template(template)
+    page = read_page(source)
+    if page is None:
+        return None
+    return template.apply(page)
+
+
+def parse_payload(result):
+    """Response body of ``parse-pdf-content`` for an ``extract`` result"""
+    if result is None:
+        return {
+            'success': True,
+            'parsed': False,
+            'message': 'PDF file appears to be empty'
+        }
+
+    fields = result['fields']
+    width, height = result['page_size']
+    debug_info = {
+        'template': result['template'],
+        'regions': result['regions'],
+        'pdf_dimensions': f'{width}x{height}',
+    }
+    if not any(fields.values()):
+        return {
+            'success': True,
+            'parsed': False,
+            'message': 'No reference number, date, or subject found in PDF content',
+            'debug_info': debug_info
+        }
+
+    return {
+        'success': True,
+        'parsed': True,
+        'method': f"pdf_content_extraction_{result['method']}",
+        'data': {
+            **fields,
+            'confidence': 'high' if all(fields.values()) else 'medium',
+            'extracted_from': 'pdf_content',
+            'extraction_method': result['method']
+        },
+        'debug_info': debug_info
+    }
+
+
+def _extract_bytes(data, template):
+    """Pool task: ``template.apply`` on the first page of ``data``"""
+    page = read_page(data)
+    return None if page is None else template.apply(page)
+
+
+_pool = None
+# Pool -> number of run_in_pool calls using it
+_pool_users = {}
+_pool_lock = threading.Lock()
+
+
+def pool_size():
+    return getattr(settings, 'PDF_BATCH_WORKERS', None) or os.cpu_count() or 1
+
+
+def _acquire_pool():
+    """The current pool, registered as used by the caller until ``_release_pool``"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=pool_size())
+        _pool_users[_pool] = _pool_users.get(_pool, 0) + 1
+        return _pool
+
+
+def _release_pool(pool, retire=False):
+    """
+    Stop using ``pool``. With ``retire`` (a process is stuck or dead) no
+    later call gets it. A retired pool is killed when its last user leaves.
+    """
+    global _pool
+    with _pool_lock:
+        if retire and _pool is pool:
+            _pool = None
+        _pool_users[pool] -= 1
+        if _pool_users[pool] or _pool is pool:
+            return
+        del _pool_users[pool]
+    for process in list((getattr(pool, '_processes', None) or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def retire_pool():
+    """Make the next call start a fresh pool (e.g. after changing ``PDF_BATCH_WORKERS``)"""
+    _release_pool(_acquire_pool(), retire=True)
+
+
+def run_in_pool(func, args_list, timeout=None):
+    """
+    ``func(*args)`` for each entry of ``args_list`` in the process pool, as
+    ``(result, error)`` pairs in input order. ``error`` is the raised
+    exception, or ``TimeoutError`` for a call that overran ``timeout``.
+
+    Calls queue behind each other when there are more than the pool has
+    processes, so the n-th call is given ``timeout`` per wave of pool-size
+    calls up to and including its own, counted from submission.
+    """
+    if not args_list:
+        return []
+    timeout = timeout or getattr(settings, 'PDF_BATCH_TIMEOUT', 20)
+    pool = _acquire_pool()
+    started = time.monotonic()
+    results, retire = [], False
+    try:
+        futures = [pool.submit(func, *args) for args in args_list]
+    except BrokenProcessPool as e:
+        _release_pool(pool, retire=True)
+        return [(None, e) for _ in args_list]
+    size = pool_size()
+    for index, future in enumerate(futures):
+        deadline = started + timeout * math.ceil((index + 1) / size)
+        try:
+            results.append((future.result(timeout=max(0, deadline - time.monotonic())), None))
+        except FutureTimeout:
+            future.cancel()
+            retire = True
+            results.append((None, TimeoutError(f'Timed out after {timeout} seconds')))
+        except BrokenProcessPool as e:
+            # A pool process died (e.g. crashed on a malformed file); every pending call fails with it
+            retire = True
+            results.append((None, e))
+        except Exception as e:
+            results.append((None, e))
+    _release_pool(pool, retire)
+    return results
+
+
+def extract_many(sources, template=None, timeout=None):
+    """``extract`` for many PDFs (bytes) in the process pool; ``(result, error)`` pairs in input order"""
+    if not isinstance(template, Template):
+        template = get_template(template)
+    return run_in_pool(_extract_bytes, [(bytes(source), template) for source in sources], timeout)
@@ -0,0 +1,248 @@
+"""
+Index-backed search backends.
+
+Correspondence: full-text search over reference number, subject and summary.
+
+SQLite: an external-content FTS5 table (``correspondence_fts``) kept in sync
+with the ``correspondence`` table by triggers, so inserts, updates, deletes,
+``bulk_create`` and ``QuerySet.update`` are all reflected. Schema changes on
+SQLite rebuild the table and lose its triggers, so ``ensure_search_index``
+reinstalls them (and refills the index) after every ``migrate``.
+
+PostgreSQL: a GIN index on a ``to_tsvector`` expression over the same
+columns. The index is maintained by PostgreSQL itself.
+
+Other backends fall back to DRF's ``icontains`` search.
+
+People: Arabic-aware name search over the normalized ``PeopleNameToken``
+index (see core/arabic.py).
+"""
+import re
+import uuid
+
+from django.db import connection as default_connection, connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from .arabic import normalize_arabic, prefix_range
+
+
+FTS_TABLE = 'correspondence_fts'
+PG_INDEX = 'correspondence_search_idx'
+PG_DOCUMENT = (
+    "to_tsvector('simple', coalesce(reference_number, '') || ' ' || "
+    "coalesce(subject, '') || ' ' || coalesce(summary, ''))"
+)
+
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        reference_number, subject, summary,
+        content='correspondence', content_rowid='correspondence_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS correspondence_fts_ai AFTER INSERT ON correspondence BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, reference_number, subject, summary)
+        VALUES (new.correspondence_id, new.reference_number, new.subject, new.summary);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS correspondence_fts_ad AFTER DELETE ON correspondence BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, reference_number, subject, summary)
+        VALUES ('delete', old.correspondence_id, old.reference_number, old.subject, old.summary);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS correspondence_fts_au
+        AFTER UPDATE OF reference_number, subject, summary ON correspondence BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, reference_number, subject, summary)
+        VALUES ('delete', old.correspondence_id, old.reference_number, old.subject, old.summary);
+        INSERT INTO {FTS_TABLE}(rowid, reference_number, subject, summary)
+        VALUES (new.correspondence_id, new.reference_number, new.subject, new.summary);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_TRIGGERS = ('correspondence_fts_ai', 'correspondence_fts_ad', 'correspondence_fts_au')
+
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS correspondence_fts_ai',
+    'DROP TRIGGER IF EXISTS correspondence_fts_ad',
+    'DROP TRIGGER IF EXISTS correspondence_fts_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRES_INSTALL = [
+    f'CREATE INDEX IF NOT EXISTS {PG_INDEX} ON correspondence USING GIN ({PG_DOCUMENT})',
+]
+
+POSTGRES_UNINSTALL = [
+    f'DROP INDEX IF EXISTS {PG_INDEX}',
+]
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _run(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install_search_index(connection=default_connection):
+    """Create the full-text index for the connection's database vendor"""
+    if connection.vendor == 'sqlite':
+        _run(connection, SQLITE_INSTALL)
+    elif connection.vendor == 'postgresql':
+        _run(connection, POSTGRES_INSTALL)
+
+
+def ensure_search_index(connection=default_connection):
+    """
+    Reinstall the SQLite sync triggers when a table rebuild dropped them.
+    Only an installed index (the FTS table exists) is repaired; rows written
+    without the triggers are picked up by the rebuild in SQLITE_INSTALL.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name IN (%s, %s, %s, %s)",
+            [FTS_TABLE, *SQLITE_TRIGGERS]
+        )
+        present = {name for (name,) in cursor.fetchall()}
+    if FTS_TABLE not in present or present.issuperset(SQLITE_TRIGGERS):
+        return False
+    install_search_index(connection)
+    return True
+
+
+def drop_search_index(connection=default_connection):
+    """Drop the full-text index"""
+    if connection.vendor == 'sqlite':
+        _run(connection, SQLITE_UNINSTALL)
+    elif connection.vendor == 'postgresql':
+        _run(connection, POSTGRES_UNINSTALL)
+
+
+def rebuild_search_index(connection=default_connection):
+    """Recreate the index contents from the correspondence table"""
+    if connection.vendor == 'sqlite':
+        _run(connection, [
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')",
+        ])
+    elif connection.vendor == 'postgresql':
+        _run(connection, [f'REINDEX INDEX {PG_INDEX}'])
+
+
+def is_supported(connection=default_connection):
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def build_match_query(terms, vendor):
+    """
+    Turn user search terms into a prefix query where every term must match.
+
+    Terms are reduced to word tokens so user input can never inject query
+    syntax; ``123/ABC/2025`` becomes the phrase ``123 ABC 2025``.
+    """
+    phrases = []
+    for term in terms:
+        tokens = TOKEN_RE.findall(term)
+        if not tokens:
+            continue
+        if vendor == 'sqlite':
+            phrases.append('"%s"*' % ' '.join(tokens))
+        else:
+            phrases.append('(%s)' % ' <-> '.join(f'{token}:*' for token in tokens))
+    joiner = ' ' if vendor == 'sqlite' else ' & '
+    return joiner.join(phrases)
+
+
+def full_text_match(queryset, terms):
+    """
+    Filter ``queryset`` (of Correspondence) to rows matching ``terms`` and
+    annotate ``search_rank`` (higher is better).
+    """
+    vendor = connections[queryset.db].vendor
+    query = build_match_query(terms, vendor)
+    if not query:
+        return queryset
+    table = queryset.model._meta.db_table
+    pk_column = queryset.model._meta.pk.column
+
+    if vendor == 'sqlite':
+        matches = RawSQL(
+            f'"{table}"."{pk_column}" IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+            [query], output_field=BooleanField()
+        )
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."{pk_column}"',
+            [query], output_field=FloatField()
+        )
+    else:
+        matches = RawSQL(
+            f"{PG_DOCUMENT} @@ to_tsquery('simple', %s)",
+            [query], output_field=BooleanField()
+        )
+        rank = RawSQL(
+            f"ts_rank({PG_DOCUMENT}, to_tsquery('simple', %s))",
+            [query], output_field=FloatField()
+        )
+    return queryset.filter(matches).annotate(search_rank=rank)
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by the correspondence full-text index.
+
+    Place it after OrderingFilter: when the client did not ask for an
+    explicit ``ordering`` the results are ordered by relevance, with the
+    view's default ordering as a tie-breaker. Falls back to the regular
+    ``icontains`` search on databases without full-text support.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not is_supported(connections[queryset.db]):
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = full_text_match(queryset, terms)
+        if 'search_rank' in queryset.query.annotations and api_settings.ORDERING_PARAM not in request.query_params:
+            queryset = queryset.order_by('-search_rank', *queryset.query.order_by)
+        return queryset
+
+
+class ArabicNameSearchFilter(filters.SearchFilter):
+    """
+    People search that normalizes the query the same way names are stored.
+
+    Every word of the query must prefix-match a word of the person's Arabic
+    or English name (in any order), looked up through the token index with
+    range scans. ``national_id`` (prefix) and ``person_guid`` (exact) still
+    match so IDs typed into the same box keep working.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        from .models import PeopleNameToken
+
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        for term in terms:
+            condition = Q(national_id__startswith=term)
+            try:
+                condition |= Q(person_guid=uuid.UUID(term))
+            except ValueError:
+                pass
+            tokens = normalize_arabic(term).split()
+            if tokens:
+                name_match = Q()
+                for token in tokens:
+                    lower, upper = prefix_range(token)
+                    name_match &= Q(person_record_id__in=PeopleNameToken.objects.filter(
+                        token__gte=lower, token__lt=upper
+                    ).values('person_id'))
+                condition |= name_match
+            queryset = queryset.filter(condition)
+        return queryset
@@ -5,14 +5,44 @@ from .models import (
     CorrespondenceTypes, Contacts, Correspondence,
     Attachments, Permits, ApprovalDecisions,
     Accidents, Relocation, RelocationPeriod, Vehicle, CarPermit,
-    CardPermits, CardPhotos, Settings, CorrespondenceTypeProcedure, CorrespondenceStatusLog
+    CardPermits, CardPhotos, Settings, CorrespondenceTypeProcedure, CorrespondenceStatusLog, Job
 )
 
 from django.contrib.auth import authenticate
+from .mixins import parse_field_list, get_expansions, collapses_nested
 
 User = get_user_model()
 
 
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets (?fields=a,b) and expandable nested relations (?expand=).
+
+    Nested relations listed in ``Meta.expandable_fields`` are left out of GET
+    collection responses unless requested with ``?expand=<name>`` (or named in
+    ``?fields=``); detail responses include them as before. Only the top-level
+    serializer of a response is affected, and ``?fields=`` only applies to
+    GET requests so writes always see every field.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or not hasattr(request, 'query_params'):
+            return
+
+        expansions = get_expansions(request)
+        if collapses_nested(request, self.context.get('view')):
+            for name in getattr(self.Meta, 'expandable_fields', ()):
+                if name not in expansions:
+                    self.fields.pop(name, None)
+
+        requested = parse_field_list(request.query_params.get('fields'))
+        if requested and request.method == 'GET':
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+
 # ====================================== USER SERIALIZERS ======================================
 class UserSerializer(serializers.ModelSerializer):
     """Complete user serializer with role information"""
@@ -116,21 +146,21 @@ class UserPermissionsSerializer(serializers.Serializer):
 
 
 # ====================================== PEOPLE SERIALIZERS ======================================
-class PeopleHistorySerializer(serializers.ModelSerializer):
+class PeopleHistorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = PeopleHistory
         fields = '__all__'
         read_only_fields = ['person_record_id', 'person_guid']
 
 
-class CompaniesHistorySerializer(serializers.ModelSerializer):
+class CompaniesHistorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CompaniesHistory
         fields = '__all__'
         read_only_fields = ['company_id']
 
 
-class EmploymentHistorySerializer(serializers.ModelSerializer):
+class EmploymentHistorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     company_name = serializers.CharField(source='company.company_name', read_only=True)
     
     class Meta:
@@ -139,7 +169,7 @@ class EmploymentHistorySerializer(serializers.ModelSerializer):
         read_only_fields = ['employment_record_id']
 
 
-class FamilyRelationshipsSerializer(serializers.ModelSerializer):
+class FamilyRelationshipsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = FamilyRelationships
         fields = '__all__'
@@ -147,21 +177,21 @@ class FamilyRelationshipsSerializer(serializers.ModelSerializer):
 
 
 # ====================================== CORRESPONDENCE SERIALIZERS ======================================
-class CorrespondenceTypesSerializer(serializers.ModelSerializer):
+class CorrespondenceTypesSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CorrespondenceTypes
         fields = '__all__'
         read_only_fields = ['correspondence_type_id']
 
 
-class ContactsSerializer(serializers.ModelSerializer):
+class ContactsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Contacts
         fields = '__all__'
         read_only_fields = ['contact_id']
 
 
-class AttachmentsSerializer(serializers.ModelSerializer):
+class AttachmentsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Attachments
         fields = '__all__'
@@ -171,7 +201,7 @@ class AttachmentsSerializer(serializers.ModelSerializer):
 
 
 
-class CorrespondenceTypeProcedureSerializer(serializers.ModelSerializer):
+class CorrespondenceTypeProcedureSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for correspondence type procedures"""
     correspondence_type_name = serializers.CharField(source='correspondence_type.type_name', read_only=True)
     
@@ -181,7 +211,7 @@ class CorrespondenceTypeProcedureSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class CorrespondenceStatusLogSerializer(serializers.ModelSerializer):
+class CorrespondenceStatusLogSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for correspondence status change logs"""
     correspondence_reference = serializers.CharField(source='correspondence.reference_number', read_only=True)
     changed_by_username = serializers.CharField(source='changed_by.username', read_only=True)
@@ -193,7 +223,7 @@ class CorrespondenceStatusLogSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class CorrespondenceSerializer(serializers.ModelSerializer):
+class CorrespondenceSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     type_name = serializers.CharField(source='type.type_name', read_only=True)
     current_status_name = serializers.CharField(source='current_status.procedure_name', read_only=True)
     assigned_to_username = serializers.CharField(source='assigned_to.username', read_only=True)
@@ -201,15 +231,52 @@ class CorrespondenceSerializer(serializers.ModelSerializer):
     contact_name = serializers.CharField(source='contact.name', read_only=True)
     attachments = AttachmentsSerializer(many=True, read_only=True)
     status_logs = CorrespondenceStatusLogSerializer(many=True, read_only=True)
+    attachments_count = serializers.SerializerMethodField()
+    status_logs_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Correspondence
         fields = '__all__'
         read_only_fields = ['correspondence_id', 'created_at', 'updated_at']
+        expandable_fields = ['attachments', 'status_logs']
+    
+    def get_attachments_count(self, obj):
+        """Use the list annotation when present, otherwise count the relation"""
+        if hasattr(obj, 'attachments_total'):
+            return obj.attachments_total
+        return obj.attachments.count()
+    
+    def get_status_logs_count(self, obj):
+        if hasattr(obj, 'status_logs_total'):
+            return obj.status_logs_total
+        return obj.status_logs.count()
+
+
+class CorrespondenceBulkItemSerializer(serializers.ModelSerializer):
+    """
+    One row of a bulk import.
+
+    Only field-level validation happens here so a row costs no queries;
+    related ids and reference_number + correspondence_date uniqueness are
+    checked for the whole batch at once in core/bulk.py.
+    """
+    parent_correspondence = serializers.IntegerField(source='parent_correspondence_id', required=False, allow_null=True)
+    type = serializers.IntegerField(source='type_id', required=False, allow_null=True)
+    contact = serializers.IntegerField(source='contact_id', required=False, allow_null=True)
+    current_status = serializers.IntegerField(source='current_status_id', required=False, allow_null=True)
+    assigned_to = serializers.IntegerField(source='assigned_to_id', required=False, allow_null=True)
+    
+    class Meta:
+        model = Correspondence
+        fields = [
+            'reference_number', 'correspondence_date', 'subject', 'direction', 'priority', 'summary',
+            'parent_correspondence', 'type', 'contact', 'current_status', 'assigned_to'
+        ]
+        validators = []
 
 
 # ====================================== APPROVAL SERIALIZERS ======================================
-class ApprovalDecisionsSerializer(serializers.ModelSerializer):
+class ApprovalDecisionsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     approver_name = serializers.CharField(source='approver_contact.name', read_only=True)
     
     class Meta:
@@ -218,7 +285,7 @@ class ApprovalDecisionsSerializer(serializers.ModelSerializer):
         read_only_fields = ['approval_decision_id']
 
 
-class PermitsSerializer(serializers.ModelSerializer):
+class PermitsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     company_name = serializers.CharField(source='company.company_name', read_only=True)
     approval_decisions = ApprovalDecisionsSerializer(
         source='approvaldecisions_set',
@@ -230,10 +297,11 @@ class PermitsSerializer(serializers.ModelSerializer):
         model = Permits
         fields = '__all__'
         read_only_fields = ['permit_id']
+        expandable_fields = ['approval_decisions']
 
 
 # ====================================== ACCIDENTS SERIALIZERS ======================================
-class AccidentsSerializer(serializers.ModelSerializer):
+class AccidentsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Accidents
         fields = '__all__'
@@ -241,14 +309,14 @@ class AccidentsSerializer(serializers.ModelSerializer):
 
 
 # ====================================== RELOCATION SERIALIZERS ======================================
-class RelocationPeriodSerializer(serializers.ModelSerializer):
+class RelocationPeriodSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = RelocationPeriod
         fields = '__all__'
         read_only_fields = ['relocation_period_id']
 
 
-class RelocationSerializer(serializers.ModelSerializer):
+class RelocationSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     periods = RelocationPeriodSerializer(many=True, read_only=True)
     relocation_letter_reference = serializers.CharField(
         source='relocation_letter.reference_number', 
@@ -259,17 +327,18 @@ class RelocationSerializer(serializers.ModelSerializer):
         model = Relocation
         fields = '__all__'
         read_only_fields = ['relocation_id']
+        expandable_fields = ['periods']
 
 
 # ====================================== VEHICLES SERIALIZERS ======================================
-class CarPermitSerializer(serializers.ModelSerializer):
+class CarPermitSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CarPermit
         fields = '__all__'
         read_only_fields = ['car_permit_id']
 
 
-class VehicleSerializer(serializers.ModelSerializer):
+class VehicleSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     company_name = serializers.CharField(source='company.company_name', read_only=True)
     correspondence_reference = serializers.CharField(
         source='correspondence.reference_number', 
@@ -280,17 +349,18 @@ class VehicleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Vehicle
         fields = '__all__'
+        expandable_fields = ['permits']
 
 
 # ====================================== CARD PERMITS SERIALIZERS ======================================
-class CardPhotosSerializer(serializers.ModelSerializer):
+class CardPhotosSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CardPhotos
         fields = '__all__'
         read_only_fields = ['photo_id', 'uploaded_at']
 
 
-class CardPermitsSerializer(serializers.ModelSerializer):
+class CardPermitsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     photo = CardPhotosSerializer(source='cardphotos', read_only=True)
     
     class Meta:
@@ -300,7 +370,7 @@ class CardPermitsSerializer(serializers.ModelSerializer):
 
 
 # ====================================== SUMMARY SERIALIZERS ======================================
-class PeopleHistorySummarySerializer(serializers.ModelSerializer):
+class PeopleHistorySummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Lightweight serializer for people listings"""
     class Meta:
         model = PeopleHistory
@@ -310,7 +380,7 @@ class PeopleHistorySummarySerializer(serializers.ModelSerializer):
         ]
 
 
-class CorrespondenceSummarySerializer(serializers.ModelSerializer):
+class CorrespondenceSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Lightweight serializer for correspondence listings"""
     type_name = serializers.CharField(source='type.type_name', read_only=True)
     
@@ -322,8 +392,17 @@ class CorrespondenceSummarySerializer(serializers.ModelSerializer):
         ]
 
 
+class CorrespondenceThreadSerializer(CorrespondenceSummarySerializer):
+    """Thread node: summary fields plus the parent link and depth relative to the requested letter"""
+    parent_correspondence = serializers.PrimaryKeyRelatedField(read_only=True)
+    depth = serializers.IntegerField(read_only=True)
+
+    class Meta(CorrespondenceSummarySerializer.Meta):
+        fields = CorrespondenceSummarySerializer.Meta.fields + ['parent_correspondence', 'depth']
+
+
 # ====================================== SETTINGS SERIALIZERS ======================================
-class SettingsSerializer(serializers.ModelSerializer):
+class SettingsSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for system settings"""
     typed_value = serializers.SerializerMethodField()
     
@@ -335,3 +414,16 @@ class SettingsSerializer(serializers.ModelSerializer):
     def get_typed_value(self, obj):
         """Return the typed value of the setting"""
         return obj.get_typed_value()
+
+
+# ====================================== JOB SERIALIZERS ======================================
+class JobSerializer(serializers.ModelSerializer):
+    """Background job status as reported by /api/jobs/{id}/"""
+    
+    class Meta:
+        model = Job
+        fields = [
+            'job_id', 'kind', 'status', 'result', 'error', 'attempts', 'max_attempts',
+            'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
@@ -0,0 +1,65 @@
+"""
+In-process registry of typed ``Settings`` values.
+
+All active rows are loaded once and kept as typed values, so ``get(key)`` is
+a dict lookup and request code can consult settings without a query.
+
+The registry notices changes through the ``settings`` table generation
+(core/generations.py), which is bumped on every save/delete of a Settings
+row. The stamp is checked at most every ``SETTINGS_REGISTRY_CHECK_INTERVAL``
+seconds, and only a changed stamp triggers a reload. Writes made in this
+process reload the registry on the next read (see core/signals.py).
+"""
+import threading
+import time
+
+from django.conf import settings as django_settings
+
+from .generations import get_generations
+
+
+class SettingsRegistry:
+    table = 'settings'
+
+    def __init__(self):
+        self._values = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self):
+        interval = getattr(django_settings, 'SETTINGS_REGISTRY_CHECK_INTERVAL', 2)
+        return self._version is not None and time.monotonic() - self._checked_at < interval
+
+    def _ensure_fresh(self):
+        if self._is_fresh():
+            return
+        with self._lock:
+            if self._is_fresh():
+                return
+            from .models import Settings
+
+            version = get_generations([self.table])[0]
+            if version != self._version:
+                self._values = {
+                    row.key: row.get_typed_value() for row in Settings.objects.filter(is_active=True)
+                }
+                self._version = version
+            self._checked_at = time.monotonic()
+
+    def get(self, key, default=None):
+        """Typed value of an active setting, or ``default``"""
+        self._ensure_fresh()
+        return self._values.get(key, default)
+
+    def all(self):
+        """Snapshot of every active setting as ``{key: typed value}``"""
+        self._ensure_fresh()
+        return dict(self._values)
+
+    def invalidate(self):
+        """Force a reload on the next read"""
+        self._version = None
+
+
+settings_registry = SettingsRegistry()
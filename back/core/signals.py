@@ -0,0 +1,48 @@
+"""
+Model signal handlers.
+
+- Attachments and status logs are serialized inside their correspondence, so
+  writing one touches the parent's ``updated_at``; that keeps the
+  correspondence ETag / Last-Modified validators (core/mixins.py) honest.
+- Writes to the cached lookup tables bump the table's generation, which
+  invalidates their cached list responses (``CachedListMixin``), the ETags
+  of responses that read names from them (``conditional_tables``) and, for
+  Settings, the settings registry of every worker. Users are bumped too:
+  correspondence responses show the assignee's name.
+
+``QuerySet.update()`` and ``bulk_create()`` do not send these signals; call
+``bump_generation`` after using them on a lookup table.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .generations import bump_generation
+from .settings_registry import settings_registry
+from .models import (
+    Correspondence, Attachments, CorrespondenceStatusLog,
+    CorrespondenceTypes, CorrespondenceTypeProcedure, Contacts, Settings, User
+)
+
+GENERATION_MODELS = (CorrespondenceTypes, CorrespondenceTypeProcedure, Contacts, Settings, User)
+
+
+@receiver([post_save, post_delete], sender=Attachments)
+@receiver([post_save, post_delete], sender=CorrespondenceStatusLog)
+def touch_correspondence(sender, instance, **kwargs):
+    """Bump updated_at of the correspondence a child row belongs to"""
+    if instance.correspondence_id:
+        Correspondence.objects.filter(pk=instance.correspondence_id).update(updated_at=timezone.now())
+
+
+@receiver([post_save, post_delete])
+def invalidate_lookup_cache(sender, **kwargs):
+    """Bump the generation of a cached lookup table (or users) after any write to it"""
+    if sender in GENERATION_MODELS:
+        bump_generation(sender._meta.db_table)
+
+
+@receiver([post_save, post_delete], sender=Settings)
+def reload_settings_registry(sender, **kwargs):
+    """Make this process's registry pick up the change on its next read"""
+    settings_registry.invalidate()
@@ -0,0 +1,109 @@
+"""
+Server-side staging area for files extracted from uploads.
+
+Attachments found in a .msg file are written straight to storage as
+``StagedFile`` rows instead of being sent back to the browser hex-encoded.
+The client only gets their metadata and an opaque ``staged_id``, and the
+attachments upload and PDF parsing accept staged ids, so the bytes never
+round-trip through the client.
+
+A staged file can only be used by the user whose upload produced it, and
+only for ``STAGING_TTL`` seconds. Attaching it to a letter consumes it.
+``manage.py sweep_staged_files`` deletes expired files; run it periodically.
+"""
+import mimetypes
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from .models import Attachments, StagedFile
+
+
+def stage(name, data, content_type=None, user=None):
+    """Store ``data`` as a new staged file owned by ``user``"""
+    staged = StagedFile(
+        file_name=name,
+        file_type=content_type or mimetypes.guess_type(name)[0] or 'application/octet-stream',
+        file_size=len(data),
+        created_by=user if user is not None and user.is_authenticated else None,
+        expires_at=timezone.now() + timedelta(seconds=getattr(settings, 'STAGING_TTL', 3600)),
+    )
+    staged.file.save(name, ContentFile(data), save=False)
+    staged.save()
+    return staged
+
+
+def describe(staged):
+    """Public metadata of a staged file"""
+    return {
+        'staged_id': str(staged.staged_id),
+        'name': staged.file_name,
+        'size': staged.file_size,
+        'mime_type': staged.file_type,
+        'expires_at': staged.expires_at.isoformat(),
+    }
+
+
+def lookup(staged_ids, user):
+    """
+    ``(found, missing)``: the unexpired staged files of ``user`` with the
+    given ids, in the given order, and the ids that are unknown, expired,
+    malformed or owned by someone else.
+    """
+    staged_ids = list(dict.fromkeys(str(staged_id) for staged_id in staged_ids))
+    canonical = []
+    for staged_id in staged_ids:
+        try:
+            canonical.append(str(uuid.UUID(staged_id)))
+        except ValueError:
+            canonical.append(None)
+
+    rows = {}
+    wanted = [key for key in canonical if key]
+    if wanted and user is not None and user.is_authenticated:
+        rows = {
+            str(staged.staged_id): staged
+            for staged in StagedFile.objects.filter(
+                staged_id__in=wanted, created_by=user, expires_at__gt=timezone.now()
+            )
+        }
+    found = [rows[key] for key in canonical if key in rows]
+    missing = [staged_id for staged_id, key in zip(staged_ids, canonical) if key not in rows]
+    return found, missing
+
+
+def discard(staged):
+    """Delete a staged file and its row"""
+    staged.file.delete(save=False)
+    staged.delete()
+
+
+def attach(staged, correspondence):
+    """Copy a staged file into a new attachment of ``correspondence`` (streamed in chunks) and consume it"""
+    attachment = Attachments(
+        correspondence=correspondence,
+        file_name=staged.file_name,
+        file_type=staged.file_type,
+        file_size=staged.file_size,
+    )
+    with staged.file.open('rb') as f:
+        attachment.file.save(staged.file_name, File(f), save=False)
+    attachment.save()
+    discard(staged)
+    return attachment
+
+
+def sweep(batch_size=500):
+    """Delete every expired staged file; returns how many were deleted"""
+    deleted = 0
+    while True:
+        expired = list(StagedFile.objects.filter(expires_at__lte=timezone.now()).order_by('expires_at')[:batch_size])
+        if not expired:
+            return deleted
+        for staged in expired:
+            discard(staged)
+        deleted += len(expired)
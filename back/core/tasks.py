@@ -0,0 +1,48 @@
+"""
+Background job handlers (see core/jobs.py).
+
+Each handler reads its input file from storage and returns the same body
+the synchronous endpoint would have answered with. Results go through the
+parse cache (core/parse_cache.py) just like the endpoints' results.
+"""
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+
+from .jobs import task, PermanentJobError
+from .msg_extraction import parse_msg, cached_msg, msg_payload, MSG_CACHE_VERSION
+from .parse_cache import parse_cache, content_hash, MISSING
+from .pdf_extraction import extract, get_template, cache_version, parse_payload, TemplateError
+
+
+@task('parse_pdf')
+def parse_pdf(payload):
+    """``parse-pdf-content`` for ``{'file': <storage name>, 'template': <name>}``"""
+    try:
+        template = get_template(payload.get('template'))
+    except TemplateError as e:
+        raise PermanentJobError(str(e)) from None
+
+    with default_storage.open(payload['file']) as f:
+        data = f.read()
+    digest, version = content_hash(data), cache_version(template)
+    result = parse_cache.get('pdf', version, digest)
+    if result is MISSING:
+        try:
+            result = extract(data, template)
+        except ImportError:
+            raise PermanentJobError('PyMuPDF (fitz) library is not installed') from None
+        parse_cache.set('pdf', version, digest, result)
+    return parse_payload(result)
+
+
+@task('process_msg')
+def process_msg(payload):
+    """``process-msg`` for ``{'file': <storage name>, 'file_name': <uploaded name>, 'user_id': <staging owner>}``"""
+    user = get_user_model().objects.filter(pk=payload.get('user_id')).first()
+    with default_storage.open(payload['file']) as f:
+        digest = content_hash(f.chunks())
+        parsed = cached_msg(digest, user)
+        if parsed is MISSING:
+            parsed = parse_msg(f.chunks(), user)
+            parse_cache.set('msg', MSG_CACHE_VERSION, digest, parsed)
+    return msg_payload(parsed, payload.get('file_name', ''))
@@ -1,3 +1,1576 @@
-from django.test import TestCase
+import uuid
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .models import (
+    User, PeopleHistory, CompaniesHistory, EmploymentHistory,
+    CorrespondenceTypes, CorrespondenceTypeProcedure, Contacts, Correspondence,
+    Attachments, CorrespondenceStatusLog, Permits, ApprovalDecisions,
+    Relocation, RelocationPeriod, Vehicle, CarPermit, CardPermits, CardPhotos,
+    PeopleNameToken, StatusDwellRollup, ParseResult, Job, StagedFile
+)
+
+
+class FixtureMixin:
+    """Builds a small but fully related dataset for API tests"""
+
+    def seed(self, count, offset=0):
+        """Create `count` rows for every hot model, each with nested children"""
+        # Cached lookup lists are keyed by table generations, which restart with every test
+        cache.clear()
+        now = timezone.now()
+        today = date.today()
+        user = User.objects.create_user(username=f'user{offset}', password='pass12345')
+        corr_type = CorrespondenceTypes.objects.create(type_name=f'Type {offset}', category='Russian')
+        procedure = CorrespondenceTypeProcedure.objects.create(
+            correspondence_type=corr_type, procedure_name=f'Received {offset}', is_initial=True
+        )
+        contact = Contacts.objects.create(name=f'Contact {offset}', contact_type='Organization', is_approver=True)
+        company = CompaniesHistory.objects.create(company_name=f'Company {offset}', start_date=now, version=1)
+
+        for i in range(offset, offset + count):
+            letter = Correspondence.objects.create(
+                reference_number=f'REF-{i}', correspondence_date=today - timedelta(days=i),
+                type=corr_type, subject=f'Subject {i}', direction='Incoming',
+                current_status=procedure, assigned_to=user, contact=contact
+            )
+            for n in range(2):
+                Attachments.objects.create(
+                    correspondence=letter, file=f'attachments/{letter.pk}/file{n}.pdf',
+                    file_name=f'file{n}.pdf', file_type='application/pdf', file_size=10
+                )
+                CorrespondenceStatusLog.objects.create(
+                    correspondence=letter, to_status_name=procedure.procedure_name, changed_by=user
+                )
+
+            person = PeopleHistory.objects.create(
+                full_name_arabic=f'شخص {i}', start_date=now, version=1, sc_request_letter=letter
+            )
+            EmploymentHistory.objects.create(
+                person_guid=person.person_guid, company=company, start_date=now, version=1
+            )
+
+            permit = Permits.objects.create(
+                permit_holder_type='Company', company=company, permit_status='Active',
+                effective_date=today, expiry_date=today + timedelta(days=10)
+            )
+            ApprovalDecisions.objects.create(permit=permit, approver_contact=contact, correspondence=letter)
+
+            relocation = Relocation.objects.create(relocation_letter=letter, person_guid=uuid.uuid4())
+            RelocationPeriod.objects.create(relocation=relocation, start_date=today)
+
+            vehicle = Vehicle.objects.create(
+                vehicle_id=i, organization='Owner', correspondence=letter, company=company
+            )
+            CarPermit.objects.create(vehicle=vehicle, start_date=today)
+
+            card = CardPermits.objects.create(
+                permit_number=f'CARD-{i}', permit_type='Temporary', person_guid=person.person_guid,
+                issue_date=today, expiration_date=today + timedelta(days=10)
+            )
+            CardPhotos.objects.create(permit=card, file_name='photo.jpg', file_path='photos/photo.jpg')
+
+
+class QueryBudgetTests(FixtureMixin, APITestCase):
+    """Every list route must run a fixed number of queries regardless of page size"""
+
+    # route -> maximum number of queries (conditional GET routes include the ETag aggregate and generations)
+    BUDGETS = {
+        '/api/correspondence/': 4,
+        '/api/correspondence/?expand=attachments,status_logs': 6,
+        '/api/correspondence/summary/': 2,
+        '/api/correspondence-status-logs/': 2,
+        '/api/correspondence-type-procedures/': 5,  # cache miss: ETag aggregate + generations (ETag, cache) + page
+        '/api/people-history/': 2,
+        '/api/employment-history/': 2,
+        '/api/permits/': 2,
+        '/api/permits/?expand=approval_decisions': 3,
+        '/api/approval-decisions/': 2,
+        '/api/relocations/': 2,
+        '/api/relocations/?expand=periods': 3,
+        '/api/vehicles/': 2,
+        '/api/vehicles/?expand=permits': 3,
+        '/api/card-permits/': 2,
+    }
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(ctx.captured_queries)
+
+    def test_list_routes_stay_within_budget(self):
+        self.seed(3)
+        small = {url: self.count_queries(url) for url in self.BUDGETS}
+        self.seed(12, offset=100)
+        for url, budget in self.BUDGETS.items():
+            with self.subTest(url=url):
+                large = self.count_queries(url)
+                self.assertLessEqual(large, budget)
+                self.assertEqual(large, small[url], 'query count grows with the number of rows')
+
+    def test_correspondence_detail_within_budget(self):
+        self.seed(2)
+        letter = Correspondence.objects.first()
+        self.assertLessEqual(self.count_queries(f'/api/correspondence/{letter.pk}/'), 5)
+
+
+class FacetTests(FixtureMixin, APITestCase):
+    """Distinct-value facets for column filters"""
+
+    def setUp(self):
+        cache.clear()
+        self.seed(4)
+        Correspondence.objects.filter(reference_number__in=['REF-0', 'REF-1']).update(priority='high')
+
+    def test_returns_counts_per_value_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/correspondence/facets/', {'field': 'priority'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(response.data['values'], [
+            {'value': 'high', 'count': 2},
+            {'value': 'normal', 'count': 2},
+        ])
+
+    def test_honours_list_filters_and_search(self):
+        response = self.client.get('/api/correspondence/facets/', {'field': 'type', 'priority': 'high'})
+        self.assertEqual(response.data['values'], [{'value': 'Type 0', 'count': 2}])
+        response = self.client.get('/api/correspondence/facets/', {'field': 'priority', 'search': 'Subject 3'})
+        self.assertEqual(response.data['values'], [{'value': 'normal', 'count': 1}])
+
+    def test_rejects_fields_outside_whitelist(self):
+        response = self.client.get('/api/correspondence/facets/', {'field': 'summary'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_results_are_cached(self):
+        self.client.get('/api/correspondence/facets/', {'field': 'priority'})
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/correspondence/facets/', {'field': 'priority', 'page': 3})
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+
+class PaginationTests(FixtureMixin, APITestCase):
+    """Page size selection and keyset (cursor) pagination"""
+
+    def setUp(self):
+        self.seed(15)
+        # Several letters on the same day so the primary key tie-breaker matters
+        Correspondence.objects.filter(reference_number__in=['REF-3', 'REF-4', 'REF-5', 'REF-6']).update(
+            correspondence_date=date.today()
+        )
+
+    def test_page_size_is_honoured_and_capped(self):
+        response = self.client.get('/api/correspondence/', {'page_size': 5})
+        self.assertEqual(len(response.data['results']), 5)
+        response = self.client.get('/api/correspondence/', {'page_size': 10000})
+        self.assertEqual(len(response.data['results']), 15)
+
+    def test_cursor_walks_every_row_once_in_order(self):
+        expected = list(
+            Correspondence.objects.order_by('-correspondence_date', '-correspondence_id')
+            .values_list('correspondence_id', flat=True)
+        )
+        seen = []
+        response = self.client.get('/api/correspondence/', {'pagination': 'cursor', 'page_size': 4})
+        self.assertEqual(response.data['count'], 15)
+        while True:
+            seen.extend(row['correspondence_id'] for row in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, expected)
+
+    def test_deep_pages_do_not_count_or_offset(self):
+        response = self.client.get('/api/correspondence/', {'pagination': 'cursor', 'page_size': 4})
+        next_url = response.data['next']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(next_url + '&count=false')
+        self.assertNotIn('count', response.data)
+        sql = ' '.join(query['sql'] for query in ctx.captured_queries)
+        self.assertNotIn('COUNT(*)', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/correspondence/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class FullTextSearchTests(FixtureMixin, APITestCase):
+    """Correspondence search goes through the full-text index"""
+
+    def setUp(self):
+        self.seed(3)
+        self.letter = Correspondence.objects.get(reference_number='REF-1')
+        self.letter.subject = 'On the Site Access for Contractor Vehicles'
+        self.letter.summary = 'Gate pass renewal'
+        self.letter.save()
+
+    def search(self, term, **params):
+        response = self.client.get('/api/correspondence/', {'search': term, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['reference_number'] for row in response.data['results']]
+
+    def test_matches_words_and_prefixes_across_columns(self):
+        self.assertEqual(self.search('contractor'), ['REF-1'])
+        self.assertEqual(self.search('vehic gate'), ['REF-1'])
+        self.assertEqual(self.search('REF-2'), ['REF-2'])
+
+    def test_index_follows_updates_and_deletes(self):
+        Correspondence.objects.filter(pk=self.letter.pk).update(subject='Archived letter')
+        self.assertEqual(self.search('contractor'), [])
+        self.assertEqual(self.search('archived'), ['REF-1'])
+        self.letter.delete()
+        self.assertEqual(self.search('archived'), [])
+
+    def test_cursor_mode_keeps_relevance_order(self):
+        Correspondence.objects.filter(reference_number='REF-2').update(subject='Gate', summary='Gate gate gate')
+        response = self.client.get('/api/correspondence/', {'search': 'gate', 'pagination': 'cursor', 'page_size': 1})
+        self.assertEqual([row['reference_number'] for row in response.data['results']], ['REF-2'])
+        # Next pages go by page number
+        self.assertIn('page=2', response.data['next'])
+        self.assertNotIn('cursor=', response.data['next'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['reference_number'] for row in response.data['results']], ['REF-1'])
+
+    def test_query_syntax_is_not_injected(self):
+        self.assertEqual(self.search('"contractor*'), ['REF-1'])
+
+    def test_uses_the_index_instead_of_like(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.search('contractor')
+        sql = ' '.join(query['sql'] for query in ctx.captured_queries)
+        self.assertIn('MATCH', sql)
+        self.assertNotIn('LIKE', sql)
+
+    def trigger_names(self):
+        from .search import SQLITE_TRIGGERS
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            return {name for (name,) in cursor.fetchall()} & set(SQLITE_TRIGGERS)
+
+    def test_migrate_reinstalls_dropped_triggers(self):
+        from django.core.management import call_command
+        from .search import SQLITE_TRIGGERS
+
+        self.assertEqual(self.trigger_names(), set(SQLITE_TRIGGERS))
+        # What a table rebuild for an AlterField does to them
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER correspondence_fts_ai')
+        Correspondence.objects.create(
+            reference_number='REF-9', correspondence_date=date.today(), subject='Unindexed quarry permit'
+        )
+        self.assertEqual(self.search('quarry'), [])
+
+        call_command('migrate', verbosity=0)
+        self.assertEqual(self.trigger_names(), set(SQLITE_TRIGGERS))
+        self.assertEqual(self.search('quarry'), ['REF-9'])
+
+    def test_facets_honour_full_text_search(self):
+        response = self.client.get('/api/correspondence/facets/', {'field': 'reference_number', 'search': 'gate'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/correspondence/facets/', {'field': 'priority', 'search': 'gate'})
+        self.assertEqual(response.data['values'], [{'value': 'normal', 'count': 1}])
+
+
+class PeopleNameSearchTests(APITestCase):
+    """Arabic-aware, token-indexed people search"""
+
+    def setUp(self):
+        now = timezone.now()
+        self.ahmed = PeopleHistory.objects.create(
+            full_name_arabic='أَحْمَد إبراهيم مصطفى', full_name_english='Ahmed Ibrahim',
+            national_id='29001011234567', start_date=now, version=1
+        )
+        self.fatma = PeopleHistory.objects.create(
+            full_name_arabic='فاطمة علي', start_date=now, version=1
+        )
+
+    def search(self, term):
+        response = self.client.get('/api/people-history/', {'search': term})
+        self.assertEqual(response.status_code, 200)
+        return {row['person_record_id'] for row in response.data['results']}
+
+    def test_matches_spelling_variants(self):
+        self.assertEqual(self.search('احمد ابراهيم'), {self.ahmed.pk})
+        self.assertEqual(self.search('مصطفي'), {self.ahmed.pk})
+        self.assertEqual(self.search('فاطمه'), {self.fatma.pk})
+
+    def test_matches_name_parts_in_any_order_and_prefixes(self):
+        self.assertEqual(self.search('ابراه احمد'), {self.ahmed.pk})
+        self.assertEqual(self.search('ahm'), {self.ahmed.pk})
+        self.assertEqual(self.search('احمد علي'), set())
+
+    def test_matches_national_id_and_guid(self):
+        self.assertEqual(self.search('2900101'), {self.ahmed.pk})
+        self.assertEqual(self.search(str(self.fatma.person_guid)), {self.fatma.pk})
+
+    def test_index_follows_renames(self):
+        self.fatma.full_name_arabic = 'فاطمة حسن'
+        self.fatma.save(update_fields=['full_name_arabic'])
+        self.assertEqual(self.search('حسن'), {self.fatma.pk})
+        self.assertEqual(self.search('علي'), set())
+
+    def test_backfill_command_rebuilds_index(self):
+        from django.core.management import call_command
+        from io import StringIO
+
+        PeopleNameToken.objects.all().delete()
+        call_command('backfill_people_search', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.search('إبراهيم'), {self.ahmed.pk})
+
+
+class SparseFieldsetTests(FixtureMixin, APITestCase):
+    """?fields= and ?expand= on list and detail responses"""
+
+    def setUp(self):
+        self.seed(2)
+
+    def test_list_leaves_nested_relations_out_but_keeps_counts(self):
+        row = self.client.get('/api/correspondence/').data['results'][0]
+        self.assertNotIn('attachments', row)
+        self.assertNotIn('status_logs', row)
+        self.assertEqual(row['attachments_count'], 2)
+        self.assertEqual(row['status_logs_count'], 2)
+
+    def test_expand_includes_nested_relations(self):
+        row = self.client.get('/api/correspondence/', {'expand': 'attachments'}).data['results'][0]
+        self.assertEqual(len(row['attachments']), 2)
+        self.assertNotIn('status_logs', row)
+
+    def test_fields_restricts_the_payload(self):
+        row = self.client.get('/api/correspondence/', {'fields': 'correspondence_id,subject,status_logs'}).data['results'][0]
+        self.assertEqual(set(row), {'correspondence_id', 'subject', 'status_logs'})
+        self.assertEqual(len(row['status_logs']), 2)
+
+    def test_detail_keeps_nested_relations(self):
+        letter = Correspondence.objects.first()
+        data = self.client.get(f'/api/correspondence/{letter.pk}/').data
+        self.assertEqual(len(data['attachments']), 2)
+        self.assertEqual(data['attachments_count'], 2)
+
+
+class ThreadTests(APITestCase):
+    """/api/correspondence/{id}/thread/ walks parent links in one query"""
+
+    def letter(self, ref, parent=None, days=0):
+        return Correspondence.objects.create(
+            reference_number=ref, correspondence_date=date.today() + timedelta(days=days),
+            subject=ref, direction='Incoming', parent_correspondence=parent
+        )
+
+    def setUp(self):
+        self.root = self.letter('root')
+        self.reply = self.letter('reply', self.root, 1)
+        self.answer_b = self.letter('answer-b', self.reply, 3)
+        self.answer_a = self.letter('answer-a', self.reply, 2)
+        self.nested = self.letter('nested', self.answer_a, 4)
+        self.unrelated = self.letter('unrelated')
+
+    def test_thread_returns_ancestors_and_descendant_tree(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f'/api/correspondence/{self.reply.pk}/thread/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(response.data['root_id'], self.root.pk)
+        self.assertEqual(
+            [(row['reference_number'], row['depth']) for row in response.data['results']],
+            [('root', -1), ('reply', 0), ('answer-a', 1), ('nested', 2), ('answer-b', 1)]
+        )
+
+    def test_cycles_terminate(self):
+        self.root.parent_correspondence = self.nested
+        self.root.save()
+        response = self.client.get(f'/api/correspondence/{self.reply.pk}/thread/')
+        refs = [row['reference_number'] for row in response.data['results']]
+        self.assertEqual(sorted(refs), ['answer-a', 'answer-b', 'nested', 'reply', 'root'])
+
+    def test_missing_letter_is_404(self):
+        self.assertEqual(self.client.get('/api/correspondence/999999/thread/').status_code, 404)
+
+
+class DwellTimeTests(APITestCase):
+    """Time-in-status rollup is built from the log and refreshed incrementally"""
+
+    def setUp(self):
+        self.corr_type = CorrespondenceTypes.objects.create(type_name='Permit Request', category='Russian')
+        self.start = timezone.now() - timedelta(days=30)
+
+    def log_path(self, ref, steps):
+        """Create a letter whose log enters each (status, hours after start) in turn"""
+        letter = Correspondence.objects.create(
+            reference_number=ref, correspondence_date=date.today(), subject=ref,
+            direction='Incoming', type=self.corr_type
+        )
+        for status_name, hours in steps:
+            log = CorrespondenceStatusLog.objects.create(correspondence=letter, to_status_name=status_name)
+            CorrespondenceStatusLog.objects.filter(pk=log.pk).update(created_at=self.start + timedelta(hours=hours))
+        return letter
+
+    def stats(self):
+        rows = self.client.get('/api/correspondence-status-logs/dwell-times/').data['results']
+        return {row['status_name']: row for row in rows}
+
+    def test_dwell_statistics(self):
+        for n, hours in enumerate([1, 2, 3, 4, 100]):
+            self.log_path(f'REF-{n}', [('Received', 0), ('Review', hours)])
+        received = self.stats()['Received']
+        self.assertEqual(received['count'], 5)
+        self.assertEqual(received['type_name'], 'Permit Request')
+        self.assertAlmostEqual(received['mean_seconds'], 22 * 3600)
+        self.assertAlmostEqual(received['p50_seconds'], 3 * 3600, delta=0.2 * 3 * 3600)
+        self.assertLessEqual(received['p95_seconds'], 100 * 3600)
+        self.assertGreater(received['p95_seconds'], 4 * 3600)
+        # Letters still in Review have no closed dwell there
+        self.assertNotIn('Review', self.stats())
+
+    def test_refresh_only_reads_new_rows(self):
+        letter = self.log_path('REF-1', [('Received', 0), ('Review', 2)])
+        self.assertEqual(self.stats()['Received']['count'], 1)
+        with CaptureQueriesContext(connection) as ctx:
+            self.stats()
+        self.assertFalse(any('LAG(' in query['sql'] for query in ctx.captured_queries))
+
+        log = CorrespondenceStatusLog.objects.create(correspondence=letter, to_status_name='Approved')
+        CorrespondenceStatusLog.objects.filter(pk=log.pk).update(created_at=self.start + timedelta(hours=5))
+        stats = self.stats()
+        self.assertEqual(stats['Received']['count'], 1)
+        self.assertEqual(stats['Review']['count'], 1)
+        self.assertAlmostEqual(stats['Review']['mean_seconds'], 3 * 3600)
+
+    def test_request_folds_one_batch(self):
+        from unittest import mock
+        from .analytics import refresh_dwell_rollup, rollup_is_current
+
+        for n in range(3):
+            self.log_path(f'REF-{n}', [('Received', 0), ('Review', 1)])
+        refresh_dwell_rollup(batch_size=2, max_batches=1)
+        self.assertFalse(rollup_is_current())
+        with mock.patch('core.views.refresh_dwell_rollup', wraps=refresh_dwell_rollup) as refresh:
+            response = self.client.get('/api/correspondence-status-logs/dwell-times/')
+        refresh.assert_called_once_with(max_batches=1)
+        self.assertTrue(response.data['complete'])
+        self.assertEqual({row['status_name']: row['count'] for row in response.data['results']}, {'Received': 3})
+
+
+class BulkCreateTests(APITestCase):
+    """/api/correspondence/bulk/ validates and writes a whole import at once"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='pass12345')
+        self.client.force_authenticate(self.user)
+        self.corr_type = CorrespondenceTypes.objects.create(type_name='Russian Letter', category='Russian')
+        self.received = CorrespondenceTypeProcedure.objects.create(
+            correspondence_type=self.corr_type, procedure_name='Received', is_initial=True
+        )
+        Correspondence.objects.create(
+            reference_number='EXISTING', correspondence_date=date(2025, 1, 1),
+            subject='Existing', direction='Incoming'
+        )
+
+    def row(self, ref, **extra):
+        return {
+            'reference_number': ref, 'correspondence_date': '2025-01-01', 'subject': ref,
+            'direction': 'Incoming', 'type': self.corr_type.pk, 'current_status': self.received.pk, **extra
+        }
+
+    def test_bulk_create_reports_per_row_results(self):
+        rows = [
+            self.row('A-1'),
+            self.row('EXISTING'),
+            self.row('A-1'),
+            self.row('A-2', direction='Sideways'),
+            self.row('A-3', contact=999999),
+            self.row('A-4'),
+        ]
+        response = self.client.post('/api/correspondence/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['created'], 2)
+        outcomes = [result['status'] for result in response.data['results']]
+        self.assertEqual(outcomes, ['created', 'invalid', 'invalid', 'invalid', 'invalid', 'created'])
+        self.assertIn('direction', response.data['results'][3]['errors'])
+        self.assertIn('contact', response.data['results'][4]['errors'])
+
+        letter = Correspondence.objects.get(pk=response.data['results'][0]['correspondence_id'])
+        log = letter.status_logs.get()
+        self.assertEqual(log.to_status_name, 'Received')
+        self.assertEqual(log.changed_by, self.user)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def run(prefix, count):
+            rows = [self.row(f'{prefix}-{n}') for n in range(count)]
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post('/api/correspondence/bulk/', rows, format='json')
+            self.assertEqual(response.status_code, 201)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(run('small', 3), run('large', 60))
+
+    def test_all_or_nothing(self):
+        payload = {'items': [self.row('B-1'), self.row('EXISTING')], 'all_or_nothing': True}
+        response = self.client.post('/api/correspondence/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['results'][0]['status'], 'skipped')
+        self.assertFalse(Correspondence.objects.filter(reference_number='B-1').exists())
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.post('/api/correspondence/bulk/', [self.row('C-1')], format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+class BulkTransitionTests(APITestCase):
+    """/api/correspondence/transition/ moves many letters with one UPDATE and one log insert"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='clerk', password='pass12345')
+        self.client.force_authenticate(self.user)
+        self.corr_type = CorrespondenceTypes.objects.create(type_name='Russian Letter', category='Russian')
+        other_type = CorrespondenceTypes.objects.create(type_name='Internal Memo', category='Internal')
+        self.received = CorrespondenceTypeProcedure.objects.create(
+            correspondence_type=self.corr_type, procedure_name='Received', procedure_order=1
+        )
+        self.closed = CorrespondenceTypeProcedure.objects.create(
+            correspondence_type=self.corr_type, procedure_name='Closed', procedure_order=2
+        )
+        self.letters = [
+            Correspondence.objects.create(
+                reference_number=f'T-{n}', correspondence_date=date.today(), subject=f'T-{n}',
+                direction='Incoming', type=self.corr_type, current_status=self.received
+            )
+            for n in range(5)
+        ]
+        self.memo = Correspondence.objects.create(
+            reference_number='MEMO', correspondence_date=date.today(), subject='Memo',
+            direction='Internal', type=other_type
+        )
+
+    def test_transition_updates_and_logs_in_fixed_queries(self):
+        ids = [letter.pk for letter in self.letters] + [self.memo.pk, 999999]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/correspondence/transition/', {
+                'ids': ids, 'to_status': self.closed.pk, 'change_reason': 'Day closed'
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['changed']), 5)
+        self.assertEqual(
+            {row['correspondence_id'] for row in response.data['rejected']}, {self.memo.pk, 999999}
+        )
+        statements = [query['sql'] for query in ctx.captured_queries]
+        self.assertEqual(sum(sql.startswith('UPDATE "correspondence"') for sql in statements), 1)
+        self.assertEqual(sum(sql.startswith('INSERT INTO "correspondence_status_log"') for sql in statements), 1)
+        # The locked read of the letters must not join (FOR UPDATE on an outer join fails on PostgreSQL)
+        self.assertFalse(any('FROM "correspondence" ' in sql and 'JOIN' in sql for sql in statements))
+
+        self.assertEqual(Correspondence.objects.filter(current_status=self.closed).count(), 5)
+        log = CorrespondenceStatusLog.objects.get(correspondence=self.letters[0])
+        self.assertEqual((log.form_status_name, log.to_status_name), ('Received', 'Closed'))
+        self.assertEqual((log.changed_by, log.change_reason), (self.user, 'Day closed'))
+
+    def test_all_or_nothing_rejects_the_batch(self):
+        response = self.client.post('/api/correspondence/transition/', {
+            'ids': [self.letters[0].pk, self.memo.pk], 'to_status': self.closed.pk, 'all_or_nothing': True
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Correspondence.objects.filter(current_status=self.closed).exists())
+        self.assertFalse(CorrespondenceStatusLog.objects.exists())
+
+    def test_unknown_procedure(self):
+        response = self.client.post('/api/correspondence/transition/', {
+            'ids': [self.letters[0].pk], 'to_status': 999999
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(FixtureMixin, APITestCase):
+    """ETag / Last-Modified on correspondence and lookup endpoints"""
+
+    def setUp(self):
+        self.seed(3)
+
+    def test_unchanged_list_is_304_without_fetching_rows(self):
+        first = self.client.get('/api/correspondence/')
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('Last-Modified', first)
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get('/api/correspondence/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(len(ctx.captured_queries), 2)  # aggregate + related table generations
+
+    def test_etag_changes_on_update_delete_and_child_write(self):
+        etag = self.client.get('/api/correspondence/')['ETag']
+        letter = Correspondence.objects.order_by('pk').first()
+        CorrespondenceStatusLog.objects.create(correspondence=letter, to_status_name='Closed')
+        touched = self.client.get('/api/correspondence/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(touched.status_code, 200)
+        self.assertNotEqual(touched['ETag'], etag)
+
+        etag = touched['ETag']
+        Correspondence.objects.filter(pk=Correspondence.objects.order_by('pk').last().pk).delete()
+        self.assertEqual(self.client.get('/api/correspondence/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_depends_on_query_params(self):
+        etag = self.client.get('/api/correspondence/')['ETag']
+        response = self.client.get('/api/correspondence/', {'page_size': 1}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_validators_follow_get_queryset(self):
+        from unittest import mock
+        from .viewsets import CorrespondenceViewSet
+
+        etag = self.client.get('/api/correspondence/')['ETag']
+        restricted = mock.patch.object(
+            CorrespondenceViewSet, 'get_queryset', lambda view: Correspondence.objects.filter(reference_number='REF-0')
+        )
+        with restricted:
+            response = self.client.get('/api/correspondence/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_renaming_a_related_row_changes_the_etag(self):
+        letter = Correspondence.objects.order_by('pk').first()
+        list_etag = self.client.get('/api/correspondence/')['ETag']
+        detail_etag = self.client.get(f'/api/correspondence/{letter.pk}/')['ETag']
+        letter.type.type_name = 'Renamed'
+        letter.type.save()
+
+        response = self.client.get('/api/correspondence/', HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(f'/api/correspondence/{letter.pk}/', HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['type_name'], 'Renamed')
+
+    def test_malformed_pk_is_404(self):
+        for url in ('/api/correspondence/abc/', '/api/correspondence-types/abc/', '/api/settings/abc/'):
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_detail_and_lookup_tables(self):
+        letter = Correspondence.objects.first()
+        detail = self.client.get(f'/api/correspondence/{letter.pk}/')
+        self.assertEqual(
+            self.client.get(f'/api/correspondence/{letter.pk}/', HTTP_IF_NONE_MATCH=detail['ETag']).status_code, 304
+        )
+        for url in ('/api/correspondence-types/', '/api/correspondence-type-procedures/', '/api/settings/'):
+            response = self.client.get(url)
+            self.assertIn('ETag', response)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class CachedLookupListTests(APITestCase):
+    """Lookup table lists are served from cache until the table changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.corr_type = CorrespondenceTypes.objects.create(type_name='Russian Letter', category='Russian')
+        CorrespondenceTypeProcedure.objects.create(correspondence_type=self.corr_type, procedure_name='Received')
+
+    def names(self, response):
+        return [row['correspondence_type_name'] for row in response.data['results']]
+
+    def test_hit_skips_the_table_and_writes_invalidate(self):
+        url = '/api/correspondence-type-procedures/'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(self.names(response), ['Russian Letter'])
+        self.assertFalse(any('FROM "correspondence_type_procedure"' in query['sql'] and 'LIMIT' in query['sql']
+                             for query in ctx.captured_queries))
+
+        # Renaming the type (a table the list depends on) invalidates the procedures list
+        self.corr_type.type_name = 'Russian Note'
+        self.corr_type.save()
+        self.assertEqual(self.names(self.client.get(url)), ['Russian Note'])
+
+    def test_params_are_normalized(self):
+        Contacts.objects.create(name='Ministry', contact_type='Organization', is_approver=True)
+        self.client.get('/api/contacts/?is_approver=true&search=Min')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/contacts/?search=Min&is_approver=true')
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        Contacts.objects.create(name='Ministry Annex', contact_type='Organization', is_approver=True)
+        self.assertEqual(self.client.get('/api/contacts/?search=Min&is_approver=true').data['count'], 2)
+
+    def test_pagination_links_follow_the_requested_host(self):
+        from django.test import override_settings
+
+        Contacts.objects.create(name='Ministry', contact_type='Organization')
+        Contacts.objects.create(name='Ministry Annex', contact_type='Organization')
+        with override_settings(ALLOWED_HOSTS=['testserver', 'api.example.org']):
+            self.client.get('/api/contacts/?page_size=1')
+            response = self.client.get('/api/contacts/?page_size=1', HTTP_HOST='api.example.org', secure=True)
+        self.assertTrue(response.data['next'].startswith('https://api.example.org/'), response.data['next'])
+
+
+class SettingsRegistryTests(APITestCase):
+    """Typed settings served from memory, reloaded when the version stamp moves"""
+
+    def setUp(self):
+        from .models import Settings
+        from .settings_registry import settings_registry
+
+        self.registry = settings_registry
+        self.setting = Settings.objects.create(key='max_file_size_mb', value='1', setting_type='number')
+        Settings.objects.create(key='allowed_file_types', value='["pdf"]', setting_type='json')
+
+    def tearDown(self):
+        # The rollback sends no signals; don't leak this test's values into the next one
+        self.registry.invalidate()
+
+    def test_reads_are_free_until_the_stamp_changes(self):
+        from .generations import bump_generation
+        from .models import Settings
+
+        self.assertEqual(self.registry.get('allowed_file_types'), ['pdf'])
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.registry.get('max_file_size_mb'), 1)
+            self.assertIsNone(self.registry.get('missing'))
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        # A write from another worker: no signal here, only the stamp moves
+        Settings.objects.filter(pk=self.setting.pk).update(value='5')
+        with self.settings(SETTINGS_REGISTRY_CHECK_INTERVAL=0):
+            self.assertEqual(self.registry.get('max_file_size_mb'), 1)
+            bump_generation('settings')
+            self.assertEqual(self.registry.get('max_file_size_mb'), 5)
+
+    def test_local_writes_reload_and_drive_upload_limits(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        user = User.objects.create_user(username='uploader', password='pass12345')
+        self.client.force_authenticate(user)
+        letter = Correspondence.objects.create(
+            reference_number='UP-1', correspondence_date=date.today(), subject='Upload', direction='Incoming'
+        )
+        big = SimpleUploadedFile('big.pdf', b'x' * (1024 * 1024 + 1), content_type='application/pdf')
+        response = self.client.post('/api/attachments/upload/', {'correspondence_id': letter.pk, 'files': [big]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['files'], ['big.pdf'])
+
+        self.setting.value = '2'
+        self.setting.save()
+        self.assertEqual(self.registry.get('max_file_size_mb'), 2)
+
+
+class ExportTests(FixtureMixin, APITestCase):
+    """CSV exports stream the filtered rows with a single query"""
+
+    def setUp(self):
+        self.seed(4)
+
+    def read_csv(self, response):
+        import csv
+        import io
+
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_correspondence_export_honours_filters_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/correspondence/export/', {'search': 'Subject 2'})
+            rows = self.read_csv(response)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment;', response['Content-Disposition'])
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(rows[0][:2], ['correspondence_id', 'reference_number'])
+        self.assertEqual([row[1] for row in rows[1:]], ['REF-2'])
+        self.assertEqual(rows[1][7], 'Type 0')
+
+    def test_people_export(self):
+        rows = self.read_csv(self.client.get('/api/people-history/export/', {'ordering': 'full_name_arabic'}))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[1][2], 'شخص 0')
+        self.assertEqual(rows[1][11], 'REF-0')
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/correspondence/export/', {'file_format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DashboardStatsTests(FixtureMixin, APITestCase):
+    """Dashboard figures are aggregate queries, cached and computed once"""
+
+    def setUp(self):
+        self.seed(3)
+        self.user = User.objects.get(username='user0')
+        self.client.force_authenticate(self.user)
+
+    def test_payload(self):
+        Permits.objects.filter(pk=Permits.objects.first().pk).update(permit_status='Expired')
+        Relocation.objects.filter(pk=Relocation.objects.first().pk).update(approval_status='حاصل')
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get('/api/dashboard/stats/').json()
+        self.assertLessEqual(len(ctx.captured_queries), 12)
+        self.assertEqual(data['totals']['correspondence'], 3)
+        self.assertEqual(data['totals']['people'], 3)
+        self.assertEqual(data['correspondence']['by_direction'], [{'value': 'Incoming', 'count': 3}])
+        self.assertEqual(data['correspondence']['by_type'], [{'value': 'Type 0', 'count': 3}])
+        self.assertEqual(data['correspondence']['by_status'], [{'value': 'Received 0', 'count': 3}])
+        self.assertEqual(sum(row['count'] for row in data['correspondence']['by_month']), 3)
+        self.assertEqual(data['permits'], {'total': 3, 'active': 2, 'expiring_soon': 2})
+        self.assertEqual(data['card_permits']['total'], 3)
+        self.assertEqual(data['relocations'], {'total': 3, 'open': 2})
+
+    def test_cached_payload_runs_no_queries(self):
+        first = self.client.get('/api/dashboard/stats/').json()
+        Correspondence.objects.filter(reference_number='REF-0').delete()
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get('/api/dashboard/stats/').json()
+        self.assertEqual(second, first)
+        # Only the token/session lookup may hit the database
+        self.assertFalse(any('core_correspondence' in q['sql'] for q in ctx.captured_queries))
+
+    def test_waits_for_the_worker_holding_the_lock(self):
+        from unittest import mock
+        from . import dashboard
+
+        cache.add(dashboard.LOCK_KEY, True, 30)
+        payload = {'totals': {}}
+
+        def publish(seconds):
+            cache.set(dashboard.CACHE_KEY, payload, 30)
+
+        with mock.patch.object(dashboard.time, 'sleep', side_effect=publish), \
+                mock.patch.object(dashboard, 'compute_dashboard_stats') as compute:
+            self.assertEqual(dashboard.get_dashboard_stats(), payload)
+        compute.assert_not_called()
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get('/api/dashboard/stats/').status_code, (401, 403))
+
+
+class MetricsTests(FixtureMixin, APITestCase):
+    """The metrics middleware records per-route latency, queries, size and status"""
+
+    def setUp(self):
+        from .metrics import registry
+
+        self.registry = registry
+        self.registry.reset()
+        self.seed(2)
+
+    def test_records_route_and_renders_prometheus_text(self):
+        self.client.get('/api/correspondence/')
+        self.client.get('/api/correspondence/999999/')
+        response = self.client.get('/api/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+
+        stats = self.registry.routes[('correspondence-list', 'GET')]
+        self.assertEqual(sum(stats.latency), 1)
+        self.assertGreaterEqual(stats.query_count, 1)
+        self.assertGreater(stats.response_bytes, 0)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_count{route="correspondence-list",method="GET"', body)
+        self.assertRegex(body, r'http_responses_total\{route="correspondence-detail",method="GET",pid="\d+",status="404"\} 1')
+        self.assertIn('http_request_db_queries_bucket{route="correspondence-list",method="GET"', body)
+
+    def test_route_count_is_bounded(self):
+        from .metrics import MetricsRegistry
+
+        bounded = MetricsRegistry(max_routes=2)
+        for name in ('a', 'b', 'c', 'd'):
+            bounded.record(name, 'GET', 200, 0.001, 1, 0.0001, 10)
+        self.assertEqual(len(bounded.routes), 3)
+        self.assertEqual(sum(bounded.routes[('other', 'GET')].latency), 2)
+
+    def test_memory_is_bounded(self):
+        from .metrics import MetricsRegistry
+
+        bounded = MetricsRegistry(max_routes=2)
+        for n in range(1000):
+            bounded.record(f'route-{n % 5}', f'M{n}', 200, n / 1000, n % 7, 0.0001, 10)
+            bounded.record('a', 'GET', 200, 0.012, 3, 0.002, 2048)
+        # Made-up methods are folded into OTHER, extra routes into "other"
+        self.assertEqual(set(bounded.routes), {('route-0', 'OTHER'), ('a', 'GET'), ('other', 'OTHER')})
+        stats = bounded.routes[('a', 'GET')]
+        self.assertEqual((len(stats.latency), len(stats.queries), len(stats.statuses)), (12, 10, 1))
+        self.assertEqual(sum(stats.latency), 1000)
+
+    def test_token(self):
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/api/metrics').status_code, 401)
+            response = self.client.get('/api/metrics', HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
+
+
+class PopulateFakeDataTests(APITestCase):
+    """The fake data generator is deterministic and consistent with the schema"""
+
+    def populate(self, **options):
+        from io import StringIO
+        from django.core.management import call_command
+
+        call_command('populate_fake_data', correspondence=60, people=30, seed=7, stdout=StringIO(), **options)
+        return list(
+            Correspondence.objects.order_by('reference_number').values_list(
+                'reference_number', 'subject', 'direction', 'correspondence_date',
+                'current_status__procedure_name', 'parent_correspondence__reference_number'
+            )
+        ), list(PeopleHistory.objects.order_by('person_guid', 'version').values_list('person_guid', 'full_name_arabic', 'version'))
+
+    def test_same_seed_same_data_regardless_of_batch_size(self):
+        first = self.populate(batch_size=7)
+        second = self.populate(batch_size=1000)
+        self.assertEqual(first, second)
+        self.assertEqual(Correspondence.objects.count(), 60)
+
+    def test_rows_are_consistent(self):
+        self.populate()
+        self.assertEqual(PeopleHistory.objects.values('person_guid').distinct().count(), 30)
+        self.assertEqual(PeopleHistory.objects.filter(is_current=True).count(), 30)
+        self.assertFalse(PeopleHistory.objects.filter(name_tokens__isnull=True).exists())
+        for letter in Correspondence.objects.select_related('current_status'):
+            last = letter.status_logs.order_by('-created_at').first()
+            self.assertEqual(last.to_status_name, letter.current_status.procedure_name)
+            self.assertEqual(letter.current_status.correspondence_type_id, letter.type_id)
+        self.assertTrue(StatusDwellRollup.objects.exists())
+
+
+class BenchmarkTests(FixtureMixin, APITestCase):
+    """The benchmark runner measures scenarios and flags budget regressions"""
+
+    def test_run_scenario(self):
+        from .benchmarks import Scenario, run_scenario
+
+        self.seed(3)
+        self.client.force_authenticate(User.objects.get(username='user0'))
+        result = run_scenario(Scenario('expiring', '/api/permits/expiring_soon/'), self.client, self.client, {}, iterations=3, warmup=1)
+        self.assertEqual(result['status'], 'ok')
+        self.assertEqual(result['queries'], 1)
+        self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        self.assertEqual(len(self.client.get('/api/permits/expiring_soon/').data), 3)
+
+        missing = run_scenario(Scenario('missing', '/api/nothing-here/'), self.client, self.client, {}, iterations=1, warmup=1)
+        self.assertEqual(missing['status'], 'error')
+
+    def test_compare(self):
+        from .benchmarks import compare
+
+        baseline = {'list': {'p50_ms': 10, 'p95_ms': 20, 'queries': 3, 'peak_kb': 200}}
+        within = {'list': {'status': 'ok', 'p50_ms': 12, 'p95_ms': 24, 'queries': 3, 'peak_kb': 250}}
+        self.assertEqual(compare(within, baseline), [])
+        # Within three times the baseline's p50-p95 spread
+        noisy = {'list': {'status': 'ok', 'p50_ms': 11, 'p95_ms': 45, 'queries': 3, 'peak_kb': 200}}
+        self.assertEqual(compare(noisy, baseline), [])
+        slower = {'list': {'status': 'ok', 'p50_ms': 40, 'p95_ms': 60, 'queries': 4, 'peak_kb': 900}}
+        self.assertEqual(len(compare(slower, baseline)), 3)
+        self.assertEqual(compare({'new': {'status': 'ok', 'p95_ms': 1, 'queries': 1, 'peak_kb': 1}}, baseline), [])
+
+
+class IndexUsageTests(FixtureMixin, APITestCase):
+    """The planner answers the hot correspondence filters from the composite indexes"""
+
+    def setUp(self):
+        self.seed(3)
+        self.letter = Correspondence.objects.first()
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            from django.db import transaction
+
+            with transaction.atomic(), connection.cursor() as cursor:
+                # Tiny test tables would otherwise always be scanned sequentially
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                return queryset.explain()
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, index):
+        plan = self.plan(queryset)
+        self.assertIn(index, plan, plan)
+        self.assertNotIn('TEMP B-TREE', plan.upper(), plan)
+
+    def newest_first(self, **filters):
+        return Correspondence.objects.filter(**filters).order_by('-correspondence_date', '-correspondence_id')[:20]
+
+    def test_default_list_order(self):
+        self.assertUsesIndex(self.newest_first(), 'idx_corr_date_id')
+
+    def test_type_filter(self):
+        self.assertUsesIndex(self.newest_first(type=self.letter.type_id), 'idx_corr_type_date')
+        # Through the join the planner may walk either date-ordered index; either way nothing is sorted
+        plan = self.plan(self.newest_first(type__category='Russian'))
+        self.assertRegex(plan, r'idx_corr_(type_)?date')
+        self.assertNotIn('TEMP B-TREE', plan.upper(), plan)
+
+    def test_direction_filter(self):
+        self.assertUsesIndex(self.newest_first(direction='Incoming'), 'idx_corr_direction_date')
+
+    def test_assignee_work_queue(self):
+        queryset = Correspondence.objects.filter(
+            assigned_to=self.letter.assigned_to_id, current_status=self.letter.current_status_id
+        )
+        self.assertIn('idx_corr_assignee_status', self.plan(queryset))
+
+    def test_status_log_history(self):
+        queryset = CorrespondenceStatusLog.objects.filter(correspondence=self.letter).order_by('created_at', 'id')
+        self.assertUsesIndex(queryset, 'idx_status_log_corr_created')
+
+    def test_api_filters(self):
+        response = self.client.get('/api/correspondence/', {'type__category': 'Russian', 'assigned_to': self.letter.assigned_to_id})
+        self.assertEqual(response.data['count'], 3)
+
+
+class PdfExtractionTests(APITestCase):
+    """Template-driven PDF extraction works on one word list per page"""
+
+    # Words of an A4 Russian letter: reference and date under the letterhead, a two-line subject in block 8
+    WORDS = [
+        (10, 20, 80, 30, 'LETTERHEAD', 0, 0, 0),
+        (150, 140, 180, 150, '7612', 1, 0, 0),
+        (150, 152, 200, 160, '22.07.2025', 1, 1, 0),
+        (80, 280, 140, 290, 'On', 2, 0, 0),
+        (145, 280, 200, 290, 'site access', 2, 0, 1),
+        (80, 294, 160, 302, 'for vehicles', 2, 1, 0),
+        (80, 500, 160, 510, 'Body text', 3, 0, 0),
+    ]
+
+    def setUp(self):
+        from .parse_cache import parse_cache
+        parse_cache.clear()
+
+    def page(self, words=None):
+        from .pdf_extraction import PageText
+        return PageText(595, 842, self.WORDS if words is None else words)
+
+    def test_regions(self):
+        from .pdf_extraction import get_template
+
+        result = get_template('russian_letter').apply(self.page())
+        self.assertEqual(result['method'], 'region_based')
+        self.assertEqual(result['fields'], {
+            'reference_number': '7612',
+            'correspondence_date': '2025-07-22',
+            'subject': 'On site access for vehicles',
+        })
+        self.assertEqual(result['regions']['letter'], ['7612', '22.07.2025'])
+
+    def test_fallback(self):
+        from .pdf_extraction import get_template
+
+        words = [
+            (10, 20, 200, 30, 'Ref: 12/AB/2025', 0, 0, 0),
+            (10, 40, 200, 50, 'Date: 31/12/2024', 0, 1, 0),
+        ]
+        result = get_template().apply(self.page(words))
+        self.assertEqual(result['method'], 'pattern_matching')
+        self.assertEqual(result['fields']['reference_number'], '12/AB/2025')
+        self.assertEqual(result['fields']['correspondence_date'], '2024-12-31')
+        self.assertIsNone(result['fields']['subject'])
+
+    def test_fallback_reference_is_upper_case(self):
+        from .pdf_extraction import get_template
+
+        def reference(line):
+            page = self.page([(10, 20, 200, 30, line, 0, 0, 0)])
+            return get_template().apply(page)['fields']['reference_number']
+
+        # Only the keyword is case-insensitive; the number itself must be upper case
+        self.assertEqual(reference('Reference: 12/AB/2025'), '12/AB/2025')
+        self.assertEqual(reference('REF 7612/X'), '7612/X')
+        self.assertIsNone(reference('Notes on the visit'))
+        self.assertIsNone(reference('and/or later'))
+
+    def test_invalid_templates(self):
+        from .pdf_extraction import Template, TemplateError, get_template
+
+        with self.assertRaises(TemplateError):
+            get_template('no-such-template')
+        with self.assertRaises(TemplateError):
+            Template('bad', {'regions': {}, 'fields': {'subject': {'region': 'missing'}}})
+        with self.assertRaises(TemplateError):
+            Template('bad', {'regions': {'r': {'rect': [0, 0, 1, 1]}}, 'fields': {'d': {'region': 'r', 'type': 'date', 'patterns': [r'(\d+)']}}})
+
+    def test_endpoint_reads_upload_once(self):
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from . import pdf_extraction
+
+        self.client.force_authenticate(User.objects.create_user(username='pdf', password='x'))
+        upload = SimpleUploadedFile('letter.pdf', b'%PDF-1.4 body', content_type='application/pdf')
+        with mock.patch.object(pdf_extraction, 'read_page', return_value=self.page()) as read_page:
+            response = self.client.post('/api/parse-pdf-content/', {'file': upload}, format='multipart')
+            again = self.client.post(
+                '/api/parse-pdf-content/',
+                {'file': SimpleUploadedFile('copy.pdf', b'%PDF-1.4 body', content_type='application/pdf')},
+                format='multipart'
+            )
+        read_page.assert_called_once_with(b'%PDF-1.4 body')
+        self.assertTrue(response.data['parsed'])
+        self.assertFalse(response.data['cached'])
+        self.assertTrue(again.data['cached'])
+        self.assertEqual(again.data['data'], response.data['data'])
+        self.assertEqual(response.data['data']['confidence'], 'high')
+        self.assertEqual(response.data['data']['reference_number'], '7612')
+
+        upload = SimpleUploadedFile('letter.pdf', b'%PDF-1.4', content_type='application/pdf')
+        response = self.client.post('/api/parse-pdf-content/?template=nope', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+    def test_pool_timeout(self):
+        import time
+        from . import pdf_extraction
+
+        with self.settings(PDF_BATCH_WORKERS=2):
+            pdf_extraction.retire_pool()
+            results = pdf_extraction.run_in_pool(time.sleep, [(0,), (30,), (0,)], timeout=1)
+        self.assertEqual(results[0], (None, None))
+        self.assertIsInstance(results[1][1], TimeoutError)
+        self.assertEqual(results[2], (None, None))
+        # The pool holding the stuck call is replaced
+        self.assertIsNone(pdf_extraction._pool)
+        self.assertEqual(pdf_extraction._pool_users, {})
+
+    def test_pool_timeout_spares_concurrent_batches(self):
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from . import pdf_extraction
+
+        with self.settings(PDF_BATCH_WORKERS=2):
+            pdf_extraction.retire_pool()
+            with ThreadPoolExecutor(max_workers=2) as threads:
+                slow = threads.submit(pdf_extraction.run_in_pool, time.sleep, [(2,)], 10)
+                stuck = threads.submit(pdf_extraction.run_in_pool, time.sleep, [(30,)], 1)
+                self.assertIsInstance(stuck.result()[0][1], TimeoutError)
+                pool = next(iter(pdf_extraction._pool_users))
+                processes = list(pool._processes.values())
+                # The timed-out batch retired the pool but the other batch still finishes in it
+                self.assertEqual(slow.result(), [(None, None)])
+        # ...after which the retired pool, stuck process included, is killed
+        self.assertEqual(pdf_extraction._pool_users, {})
+        for process in processes:
+            process.join(5)
+            self.assertFalse(process.is_alive())
+
+    def test_batch_endpoint(self):
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from . import views
+        from .pdf_extraction import get_template
+
+        extracted = get_template().apply(self.page())
+        outcomes = [(extracted, None), (None, TimeoutError('Timed out after 20 seconds')), (None, ImportError())]
+        files = [
+            SimpleUploadedFile(f'letter{n}.pdf', b'%PDF-1.4 ' + str(n).encode(), content_type='application/pdf')
+            for n in range(3)
+        ]
+        files.insert(1, SimpleUploadedFile('notes.txt', b'text', content_type='text/plain'))
+
+        self.client.force_authenticate(User.objects.create_user(username='batch', password='x'))
+        with mock.patch.object(views, 'extract_pdf_batch', return_value=outcomes) as extract:
+            response = self.client.post('/api/parse-pdf-batch/', {'files': files}, format='multipart')
+        self.assertEqual(extract.call_args.args[0], [b'%PDF-1.4 0', b'%PDF-1.4 1', b'%PDF-1.4 2'])
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(response.data['parsed'], 1)
+        results = response.data['results']
+        self.assertEqual([r['file_name'] for r in results], ['letter0.pdf', 'notes.txt', 'letter1.pdf', 'letter2.pdf'])
+        self.assertEqual(results[0]['data']['reference_number'], '7612')
+        self.assertIn('Only PDF', results[1]['error'])
+        self.assertIn('timed out', results[2]['error'])
+        self.assertIn('PyMuPDF', results[3]['error'])
+
+        self.assertEqual(self.client.post('/api/parse-pdf-batch/', {}, format='multipart').status_code, 400)
+
+
+class ParseCacheTests(APITestCase):
+    """Parse results are cached by content hash and extractor version"""
+
+    def setUp(self):
+        from .parse_cache import parse_cache
+        self.cache = parse_cache
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+
+    def test_lru_eviction(self):
+        from .parse_cache import MISSING
+
+        with self.settings(PARSE_CACHE_MAX_ENTRIES=2):
+            self.cache.set('pdf', 'v1', 'a', {'n': 1})
+            self.cache.set('pdf', 'v1', 'b', {'n': 2})
+            self.assertEqual(self.cache.get('pdf', 'v1', 'a'), {'n': 1})
+            self.cache.set('pdf', 'v1', 'c', {'n': 3})
+            # 'b' was least recently used
+            self.assertIs(self.cache.get('pdf', 'v1', 'b'), MISSING)
+            self.assertEqual(self.cache.get('pdf', 'v1', 'a'), {'n': 1})
+        # Another extractor version never sees the entry
+        self.assertIs(self.cache.get('pdf', 'v2', 'a'), MISSING)
+
+        with self.settings(PARSE_CACHE_MAX_BYTES=20):
+            self.cache.set('pdf', 'v1', 'big', {'text': 'x' * 50})
+            self.assertIs(self.cache.get('pdf', 'v1', 'big'), MISSING)
+
+    def test_hits_are_copies(self):
+        self.cache.set('msg', 'v1', 'a', {'attachments': []})
+        self.cache.get('msg', 'v1', 'a')['attachments'].append('changed')
+        self.assertEqual(self.cache.get('msg', 'v1', 'a'), {'attachments': []})
+
+    def test_persistence(self):
+        from .parse_cache import content_hash
+
+        digest = content_hash([b'%PDF', b'-1.4'])
+        self.assertEqual(digest, content_hash(b'%PDF-1.4'))
+        with self.settings(PARSE_CACHE_PERSIST=True, PARSE_CACHE_DB_MAX_ENTRIES=2):
+            self.cache.set('pdf', 'v1', digest, {'fields': {'subject': 'Access'}})
+            self.cache.set('pdf', 'v1', digest, {'fields': {'subject': 'Access'}})
+            self.cache.clear()
+            with self.assertNumQueries(1):
+                self.assertEqual(self.cache.get('pdf', 'v1', digest), {'fields': {'subject': 'Access'}})
+            with self.assertNumQueries(0):
+                self.cache.get('pdf', 'v1', digest)
+
+            for name in 'abc':
+                self.cache.set('pdf', 'v1', name, {})
+            self.assertEqual(ParseResult.objects.count(), 2)
+
+
+class JobQueueTests(APITestCase):
+    """Jobs are claimed by one worker, retried with backoff and report their outcome"""
+
+    def setUp(self):
+        import tempfile
+        from .jobs import HANDLERS
+
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = self.settings(MEDIA_ROOT=media.name, JOB_RETRY_BACKOFF=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.calls = []
+        handlers = dict(HANDLERS)
+        self.addCleanup(lambda: (HANDLERS.clear(), HANDLERS.update(handlers)))
+        HANDLERS['echo'] = lambda payload: self.calls.append(payload) or {'echo': payload}
+
+        def flaky(payload):
+            self.calls.append(payload)
+            if len(self.calls) < payload['failures'] + 1:
+                raise RuntimeError('try again')
+            return 'done'
+        HANDLERS['flaky'] = flaky
+
+        def broken(payload):
+            from .jobs import PermanentJobError
+            raise PermanentJobError('bad input')
+        HANDLERS['broken'] = broken
+
+    def test_success_deletes_files(self):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from .jobs import enqueue, work
+
+        name = default_storage.save('jobs/input.txt', ContentFile(b'data'))
+        job = enqueue('echo', {'n': 1}, files=[name])
+        self.assertEqual(work(burst=True), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.attempts), ('succeeded', {'echo': {'n': 1}}, 1))
+        self.assertFalse(default_storage.exists(name))
+
+        with self.assertRaises(ValueError):
+            enqueue('no-such-kind')
+
+    def test_retries_then_fails(self):
+        from .jobs import enqueue, work
+
+        job = enqueue('flaky', {'failures': 1})
+        work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.result), ('succeeded', 2, 'done'))
+
+        self.calls.clear()
+        job = enqueue('flaky', {'failures': 5})
+        work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 3))
+        self.assertEqual(job.error, 'RuntimeError: try again')
+
+        job = enqueue('broken')
+        work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.error), ('failed', 1, 'bad input'))
+
+    def test_claim_and_lease_expiry(self):
+        from datetime import timedelta
+        from .jobs import claim, enqueue, run_job
+
+        job = enqueue('echo')
+        first = claim('worker-a')
+        self.assertEqual(first.job_id, job.job_id)
+        self.assertIsNone(claim('worker-b'))
+
+        # worker-a died: once its lease runs out the job goes to another worker
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        second = claim('worker-b')
+        self.assertEqual((second.job_id, second.attempts, second.locked_by), (job.job_id, 2, 'worker-b'))
+
+        # A late result from worker-a is ignored
+        run_job(first, 'worker-a')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+        run_job(second, 'worker-b')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'succeeded')
+
+    def test_async_parse_endpoint(self):
+        from unittest import mock
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from . import pdf_extraction
+        from .jobs import work
+        from .parse_cache import parse_cache
+
+        parse_cache.clear()
+        owner = User.objects.create_user(username='owner', password='x')
+        self.client.force_authenticate(owner)
+        upload = SimpleUploadedFile('letter.pdf', b'%PDF-1.4 queued', content_type='application/pdf')
+        response = self.client.post('/api/parse-pdf-content/?async=true', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['job_id']
+        self.assertTrue(response.data['status_url'].endswith(f'/api/jobs/{job_id}/'))
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/').data['status'], 'queued')
+
+        page = pdf_extraction.PageText(595, 842, PdfExtractionTests.WORDS)
+        with mock.patch.object(pdf_extraction, 'read_page', return_value=page):
+            work(burst=True)
+        data = self.client.get(f'/api/jobs/{job_id}/').data
+        self.assertEqual(data['status'], 'succeeded')
+        self.assertEqual(data['result']['data']['reference_number'], '7612')
+        self.assertEqual(Job.objects.get(pk=job_id).created_by, owner)
+
+        self.client.force_authenticate(User.objects.create_user(username='other', password='x'))
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/').status_code, 404)
+
+    def test_run_workers_command(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .jobs import enqueue
+
+        jobs = [enqueue('echo', {'n': n}) for n in range(3)]
+        out = StringIO()
+        call_command('run_workers', workers=1, burst=True, stdout=out)
+        self.assertIn('3 jobs', out.getvalue())
+        self.assertEqual(Job.objects.filter(pk__in=[job.pk for job in jobs], status='succeeded').count(), 3)
+
+
+class StagingTests(FixtureMixin, APITestCase):
+    """Extracted attachments stay on the server and are attached by staged id"""
+
+    def setUp(self):
+        import tempfile
+        from .parse_cache import parse_cache
+
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overrides = self.settings(MEDIA_ROOT=media.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        parse_cache.clear()
+
+        self.seed(1)
+        self.user = User.objects.get(username='user0')
+        self.letter_id = Correspondence.objects.values_list('pk', flat=True).first()
+        self.client.force_authenticate(self.user)
+
+    def fake_message(self):
+        from unittest import mock
+
+        attachment = mock.Mock(data=b'%PDF-1.4 attached', longFilename='7612 dd 22072025.pdf', mimeType='application/pdf')
+        message = mock.Mock(attachments=[attachment], subject='Letter', sender='a@example.com', date='today', body='Hello')
+        return mock.patch('core.msg_extraction.extract_msg.Message', return_value=message)
+
+    def process_msg(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = SimpleUploadedFile('mail.msg', b'msg bytes', content_type='application/vnd.ms-outlook')
+        return self.client.post('/api/process-msg/', {'file': upload}, format='multipart')
+
+    def test_process_msg_stages_attachments(self):
+        with self.fake_message() as message:
+            response = self.process_msg()
+            again = self.process_msg()
+        self.assertEqual(message.call_count, 1)
+        attachment = response.data['attachments'][0]
+        self.assertNotIn('data', attachment)
+        self.assertEqual((attachment['name'], attachment['size']), ('7612 dd 22072025.pdf', 17))
+        self.assertTrue(again.data['cached'])
+
+        staged = StagedFile.objects.get(pk=attachment['staged_id'])
+        self.assertEqual(staged.created_by, self.user)
+        with staged.file.open('rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.4 attached')
+
+        # Once the staged file is used up the cached result is stale and the message is parsed again
+        StagedFile.objects.all().delete()
+        with self.fake_message() as message:
+            self.process_msg()
+        self.assertEqual(message.call_count, 1)
+
+    def test_upload_staged_ids(self):
+        from .staging import stage
+
+        staged = stage('scan.pdf', b'%PDF-1.4 scan', user=self.user)
+        foreign = stage('other.pdf', b'%PDF', user=User.objects.create_user(username='other', password='x'))
+
+        response = self.client.post('/api/attachments/upload/', {
+            'correspondence_id': self.letter_id, 'staged_ids': [str(foreign.pk), 'not-a-uuid'],
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['staged_ids'], [str(foreign.pk), 'not-a-uuid'])
+
+        response = self.client.post('/api/attachments/upload/', {
+            'correspondence_id': self.letter_id, 'staged_ids': [str(staged.pk)],
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        attachment = Attachments.objects.get(pk=response.data['files'][0]['attachment_id'])
+        self.assertEqual((attachment.file_name, attachment.file_type, attachment.file_size), ('scan.pdf', 'application/pdf', 13))
+        with attachment.file.open('rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.4 scan')
+        # Consumed
+        self.assertFalse(StagedFile.objects.filter(pk=staged.pk).exists())
+        self.assertFalse(staged.file.storage.exists(staged.file.name))
+
+    def test_parse_staged_pdf(self):
+        from unittest import mock
+        from . import pdf_extraction
+        from .staging import stage
+
+        staged = stage('letter.pdf', b'%PDF-1.4 staged', user=self.user)
+        page = pdf_extraction.PageText(595, 842, PdfExtractionTests.WORDS)
+        with mock.patch.object(pdf_extraction, 'read_page', return_value=page) as read_page:
+            response = self.client.post('/api/parse-pdf-content/', {'staged_id': str(staged.pk)}, format='multipart')
+        read_page.assert_called_once_with(b'%PDF-1.4 staged')
+        self.assertEqual(response.data['data']['reference_number'], '7612')
+        # Parsing does not consume the staged file
+        self.assertTrue(StagedFile.objects.filter(pk=staged.pk).exists())
+
+    def test_sweep(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .staging import stage, lookup
+
+        expired = stage('old.pdf', b'old', user=self.user)
+        StagedFile.objects.filter(pk=expired.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        fresh = stage('new.pdf', b'new', user=self.user)
+        self.assertEqual(lookup([expired.pk, fresh.pk, fresh.pk], self.user), ([fresh], [str(expired.pk)]))
+
+        out = StringIO()
+        call_command('sweep_staged_files', stdout=out)
+        self.assertIn('Deleted 1', out.getvalue())
+        self.assertFalse(expired.file.storage.exists(expired.file.name))
+        self.assertEqual(list(StagedFile.objects.all()), [fresh])
+
+
+class MsgImportTests(FixtureMixin, APITestCase):
+    """A .msg file becomes a letter with its attachments and status log in one request"""
+
+    def setUp(self):
+        import tempfile
+        from .parse_cache import parse_cache
+
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        overrides = self.settings(MEDIA_ROOT=media.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        parse_cache.clear()
+
+        self.seed(1)
+        self.user = User.objects.get(username='user0')
+        self.procedure = CorrespondenceTypeProcedure.objects.get()
+        self.client.force_authenticate(self.user)
+
+    def fake_message(self, *attachments):
+        from unittest import mock
+
+        message = mock.Mock(
+            attachments=[
+                mock.Mock(data=data, longFilename=name, mimeType=mime_type) for name, data, mime_type in attachments
+            ],
+            subject='Fwd: site access', sender='a@example.com', date='Mon, 04 Aug 2025 09:30:00 +0300', body='Hello'
+        )
+        return mock.patch('core.msg_extraction.extract_msg.Message', return_value=message)
+
+    def import_msg(self, **data):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = SimpleUploadedFile('mail.msg', b'msg bytes', content_type='application/vnd.ms-outlook')
+        return self.client.post('/api/correspondence/import-msg/', {'file': upload, **data}, format='multipart')
+
+    def test_import_prefills_from_pdf(self):
+        from unittest import mock
+        from . import pdf_extraction
+
+        page = pdf_extraction.PageText(595, 842, PdfExtractionTests.WORDS)
+        message = self.fake_message(
+            ('notes.txt', b'notes', None),
+            ('7612 dd 22072025.pdf', b'%PDF-1.4 letter', 'application/pdf'),
+        )
+        with message, mock.patch.object(pdf_extraction, 'read_page', return_value=page) as read_page:
+            response = self.import_msg(current_status=self.procedure.pk, priority='high')
+        self.assertEqual(response.status_code, 201)
+        read_page.assert_called_once_with(b'%PDF-1.4 letter')
+        self.assertEqual(response.data['prefill']['extracted_from'], ['7612 dd 22072025.pdf'])
+
+        letter = Correspondence.objects.get(pk=response.data['correspondence']['correspondence_id'])
+        self.assertEqual(
+            (letter.reference_number, letter.correspondence_date, letter.subject, letter.direction, letter.priority),
+            ('7612', date(2025, 7, 22), 'On site access for vehicles', 'Incoming', 'high')
+        )
+        attachments = {attachment.file_name: attachment for attachment in letter.attachments.all()}
+        self.assertEqual(set(attachments), {'notes.txt', '7612 dd 22072025.pdf'})
+        self.assertEqual(attachments['notes.txt'].file_type, 'text/plain')
+        with attachments['7612 dd 22072025.pdf'].file.open('rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.4 letter')
+        log = letter.status_logs.get()
+        self.assertEqual((log.to_status_name, log.changed_by), (self.procedure.procedure_name, self.user))
+
+    def test_email_fallback_and_overrides(self):
+        with self.fake_message():
+            response = self.import_msg(reference_number='MAIL-1')
+        self.assertEqual(response.status_code, 201)
+        letter = Correspondence.objects.get(pk=response.data['correspondence']['correspondence_id'])
+        self.assertEqual(
+            (letter.reference_number, letter.correspondence_date, letter.subject),
+            ('MAIL-1', date(2025, 8, 4), 'Fwd: site access')
+        )
+        self.assertFalse(letter.status_logs.exists())
+
+        # Same reference number and date again: nothing is written
+        attachments = Attachments.objects.count()
+        with self.fake_message(('scan.pdf', b'%PDF', 'application/pdf')):
+            response = self.import_msg(reference_number='MAIL-1', correspondence_date='2025-08-04')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Attachments.objects.count(), attachments)
+
+    def test_unreadable_pdf_is_logged_and_skipped(self):
+        from unittest import mock
+        from . import pdf_extraction
+
+        broken = mock.patch.object(pdf_extraction, 'read_page', side_effect=ValueError('not a PDF'))
+        with self.fake_message(('scan.pdf', b'%PDF broken', 'application/pdf')), broken:
+            with self.assertLogs('core.msg_import', 'WARNING') as logs:
+                response = self.import_msg(reference_number='MAIL-3')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['prefill']['extracted_from'], [])
+        self.assertIn('scan.pdf', logs.output[0])
+
+    def test_failure_removes_written_files(self):
+        import os
+        from unittest import mock
+
+        before = Correspondence.objects.count()
+        failing = mock.patch('core.msg_import.CorrespondenceStatusLog.objects.create', side_effect=RuntimeError('boom'))
+        with self.fake_message(('scan.pdf', b'%PDF', 'application/pdf')), failing:
+            with self.assertRaises(RuntimeError):
+                self.import_msg(reference_number='MAIL-2', current_status=self.procedure.pk)
+        self.assertEqual(Correspondence.objects.count(), before)
+        written = [name for _, _, names in os.walk(self.media_root) for name in names]
+        self.assertEqual(written, [])
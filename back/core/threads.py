@@ -0,0 +1,80 @@
+"""
+Correspondence reply threads.
+
+``parent_correspondence`` links a letter to the one it answers. A thread is
+loaded in one query: a recursive CTE collects the ids of the ancestor chain
+and of the whole descendant tree, and the rows are fetched through the ORM
+with ``pk IN (<cte>)``. Depths and the display order are then worked out in
+Python from the parent links of the fetched rows.
+
+The CTEs use ``UNION`` rather than ``UNION ALL`` so a cycle in the parent
+links (nothing in the schema forbids one) ends the recursion instead of
+looping forever.
+"""
+from django.db.models.expressions import RawSQL
+
+
+THREAD_IDS_SQL = """
+    WITH RECURSIVE
+    ancestors(id, parent_id) AS (
+        SELECT correspondence_id, parent_correspondence_id FROM correspondence WHERE correspondence_id = %s
+        UNION
+        SELECT c.correspondence_id, c.parent_correspondence_id
+        FROM correspondence c JOIN ancestors a ON c.correspondence_id = a.parent_id
+    ),
+    descendants(id) AS (
+        SELECT correspondence_id FROM correspondence WHERE correspondence_id = %s
+        UNION
+        SELECT c.correspondence_id
+        FROM correspondence c JOIN descendants d ON c.parent_correspondence_id = d.id
+    )
+    SELECT id FROM ancestors
+    UNION
+    SELECT id FROM descendants
+"""
+
+
+def thread_queryset(queryset, pk):
+    """Restrict ``queryset`` (of Correspondence) to the thread around ``pk``"""
+    return queryset.filter(pk__in=RawSQL(THREAD_IDS_SQL, [pk, pk]))
+
+
+def build_thread(rows, pk):
+    """
+    Order the rows of a thread for display and set ``depth`` on each.
+
+    Returns the ancestors from the root down (negative depths), the requested
+    letter (depth 0), then its descendants in pre-order (positive depths).
+    Siblings keep the order of ``rows``. Returns None if ``pk`` is missing.
+    """
+    by_id = {row.pk: row for row in rows}
+    focus = by_id.get(pk)
+    if focus is None:
+        return None
+
+    ancestors = []
+    seen = {focus.pk}
+    parent_id = focus.parent_correspondence_id
+    while parent_id in by_id and parent_id not in seen:
+        seen.add(parent_id)
+        ancestors.append(by_id[parent_id])
+        parent_id = by_id[parent_id].parent_correspondence_id
+    ancestors.reverse()
+    for depth, row in enumerate(ancestors, start=-len(ancestors)):
+        row.depth = depth
+
+    children = {}
+    for row in rows:
+        children.setdefault(row.parent_correspondence_id, []).append(row)
+
+    ordered = []
+    stack = [(focus, 0)]
+    while stack:
+        row, depth = stack.pop()
+        row.depth = depth
+        ordered.append(row)
+        for child in reversed(children.get(row.pk, [])):
+            if child.pk not in seen:
+                seen.add(child.pk)
+                stack.append((child, depth + 1))
+    return ancestors + ordered
@@ -8,7 +8,8 @@ from .views import (
     RelocationViewSet, RelocationPeriodViewSet, VehicleViewSet,
     CarPermitViewSet, CardPermitsViewSet, CardPhotosViewSet, SettingsViewSet,
     CorrespondenceTypeProcedureViewSet, CorrespondenceStatusLogViewSet, 
-    parse_pdf_content, parse_filename, process_msg_file
+    parse_pdf_content, parse_pdf_batch, parse_filename, process_msg_file, job_detail,
+    dashboard_stats, metrics
 )
 from .viewsets import AttachmentsViewSet, CorrespondenceViewSet
 from .auth_views import (
@@ -77,6 +78,16 @@ urlpatterns = [
     
     # File processing endpoints
     path('api/parse-pdf-content/', parse_pdf_content, name='parse_pdf_content'),
+    path('api/parse-pdf-batch/', parse_pdf_batch, name='parse_pdf_batch'),
     path('api/parse-filename/', parse_filename, name='parse_filename'),
     path('api/process-msg/', process_msg_file, name='process_msg_file'),
+
+    # Background jobs
+    path('api/jobs/<int:job_id>/', job_detail, name='job_detail'),
+
+    # Dashboard
+    path('api/dashboard/stats/', dashboard_stats, name='dashboard_stats'),
+
+    # Prometheus metrics (per worker)
+    path('api/metrics', metrics, name='metrics'),
 ]
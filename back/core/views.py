@@ -3,23 +3,27 @@ from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.response import Response
-from django.http import FileResponse
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.crypto import constant_time_compare
 from django_filters.rest_framework import DjangoFilterBackend
 from django.core.files.base import ContentFile
-import os
-import tempfile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.db.models import Prefetch
 import json
-import extract_msg
 import email
 from email import policy
 import mimetypes
 import re
+import uuid
 from .models import (
     PeopleHistory, CompaniesHistory, EmploymentHistory, FamilyRelationships,
     CorrespondenceTypes, Contacts, Correspondence,
     Attachments, Permits, ApprovalDecisions,
     Accidents, Relocation, RelocationPeriod, Vehicle, CarPermit,
-    CardPermits, CardPhotos, Settings, CorrespondenceTypeProcedure, CorrespondenceStatusLog
+    CardPermits, CardPhotos, Settings, CorrespondenceTypeProcedure, CorrespondenceStatusLog,
+    StatusDwellRollup, RollupCheckpoint, Job
 )
 from .serializers import (
     PeopleHistorySerializer, CompaniesHistorySerializer, EmploymentHistorySerializer,
@@ -28,22 +32,69 @@ from .serializers import (
     PermitsSerializer, ApprovalDecisionsSerializer,
     AccidentsSerializer, RelocationSerializer, RelocationPeriodSerializer,
     VehicleSerializer, CarPermitSerializer, CardPermitsSerializer,
-    CardPhotosSerializer, SettingsSerializer, CorrespondenceTypeProcedureSerializer, CorrespondenceStatusLogSerializer
+    CardPhotosSerializer, SettingsSerializer, CorrespondenceTypeProcedureSerializer, CorrespondenceStatusLogSerializer,
+    JobSerializer
 )
+from .mixins import QueryPlanMixin, FacetMixin, ConditionalGetMixin, CachedListMixin, ExportMixin
+from .pagination import KeysetPagination
+from .search import FullTextSearchFilter, ArabicNameSearchFilter
+from .viewsets import (
+    CORRESPONDENCE_QUERY_PLANS, CORRESPONDENCE_CONDITIONAL_TABLES, CORRESPONDENCE_FACET_FIELDS, CORRESPONDENCE_EXPORT_COLUMNS
+)
+from .analytics import refresh_dwell_rollup, rollup_is_current, dwell_statistics, CHECKPOINT_NAME as DWELL_CHECKPOINT
+from .dashboard import get_dashboard_stats
+from .metrics import registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .pdf_extraction import (
+    extract as extract_pdf_fields, extract_many as extract_pdf_batch, get_template as get_pdf_template,
+    cache_version as pdf_cache_version, parse_payload as pdf_parse_payload, TemplateError as PdfTemplateError
+)
+from .msg_extraction import parse_msg, cached_msg, msg_payload, MSG_CACHE_VERSION
+from .jobs import enqueue as enqueue_job
+from .staging import lookup as lookup_staged
+from .parse_cache import parse_cache, content_hash, MISSING
+from .settings_registry import settings_registry
 
 
 # ====================================== PEOPLE VIEWSETS ======================================
-class PeopleHistoryViewSet(viewsets.ModelViewSet):
+class PeopleHistoryViewSet(ExportMixin, FacetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = PeopleHistory.objects.all()
     serializer_class = PeopleHistorySerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-start_date', '-person_record_id']
+    facet_fields = {
+        'nationality': 'nationality',
+        'qualification': 'qualification',
+        'access_areas': 'access_areas',
+        'is_current': 'is_current',
+        'alive': 'alive',
+    }
+    export_columns = [
+        ('person_record_id', 'person_record_id'),
+        ('person_guid', 'person_guid'),
+        ('full_name_arabic', 'full_name_arabic'),
+        ('full_name_english', 'full_name_english'),
+        ('nationality', 'nationality'),
+        ('national_id', 'national_id'),
+        ('date_of_birth', 'date_of_birth'),
+        ('qualification', 'qualification'),
+        ('access_areas', 'access_areas'),
+        ('id_address', 'id_address'),
+        ('alive', 'alive'),
+        ('sc_request_letter', 'sc_request_letter__reference_number'),
+        ('response_letter', 'response_letter__reference_number'),
+        ('start_date', 'start_date'),
+        ('end_date', 'end_date'),
+        ('is_current', 'is_current'),
+        ('version', 'version'),
+    ]
+    filter_backends = [DjangoFilterBackend, ArabicNameSearchFilter, filters.OrderingFilter]
     filterset_fields = ['is_current', 'nationality', 'alive']
     search_fields = ['full_name_arabic', 'full_name_english', 'national_id']
     ordering_fields = ['start_date', 'full_name_arabic']
     ordering = ['-start_date']
 
 
-class CompaniesHistoryViewSet(viewsets.ModelViewSet):
+class CompaniesHistoryViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = CompaniesHistory.objects.all()
     serializer_class = CompaniesHistorySerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -51,15 +102,18 @@ class CompaniesHistoryViewSet(viewsets.ModelViewSet):
     search_fields = ['company_name']
 
 
-class EmploymentHistoryViewSet(viewsets.ModelViewSet):
+class EmploymentHistoryViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = EmploymentHistory.objects.all()
     serializer_class = EmploymentHistorySerializer
+    query_plans = {
+        'list': {'select_related': ('company',)},
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['still_hired', 'is_current']
     search_fields = ['person_guid', 'job_title']
 
 
-class FamilyRelationshipsViewSet(viewsets.ModelViewSet):
+class FamilyRelationshipsViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = FamilyRelationships.objects.all()
     serializer_class = FamilyRelationshipsSerializer
     filter_backends = [DjangoFilterBackend]
@@ -67,14 +121,14 @@ class FamilyRelationshipsViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== CORRESPONDENCE VIEWSETS ======================================
-class CorrespondenceTypesViewSet(viewsets.ModelViewSet):
+class CorrespondenceTypesViewSet(ConditionalGetMixin, CachedListMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = CorrespondenceTypes.objects.all()
     serializer_class = CorrespondenceTypesSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['type_name']
 
 
-class ContactsViewSet(viewsets.ModelViewSet):
+class ContactsViewSet(CachedListMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Contacts.objects.all()
     serializer_class = ContactsSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -82,10 +136,16 @@ class ContactsViewSet(viewsets.ModelViewSet):
     search_fields = ['name']
 
 
-class CorrespondenceViewSet(viewsets.ModelViewSet):
+class CorrespondenceViewSet(ConditionalGetMixin, ExportMixin, FacetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Correspondence.objects.all()
     serializer_class = CorrespondenceSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-correspondence_date', '-correspondence_id']
+    query_plans = CORRESPONDENCE_QUERY_PLANS
+    conditional_tables = CORRESPONDENCE_CONDITIONAL_TABLES
+    facet_fields = CORRESPONDENCE_FACET_FIELDS
+    export_columns = CORRESPONDENCE_EXPORT_COLUMNS
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     filterset_fields = ['direction', 'priority', 'type']
     search_fields = ['reference_number', 'subject', 'summary']
     ordering_fields = ['correspondence_date']
@@ -98,10 +158,15 @@ class CorrespondenceViewSet(viewsets.ModelViewSet):
 
 
 
-class CorrespondenceTypeProcedureViewSet(viewsets.ModelViewSet):
+class CorrespondenceTypeProcedureViewSet(ConditionalGetMixin, CachedListMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for managing correspondence type procedures"""
     queryset = CorrespondenceTypeProcedure.objects.all()
     serializer_class = CorrespondenceTypeProcedureSerializer
+    query_plans = {
+        'list': {'select_related': ('correspondence_type',)},
+    }
+    cache_tables = ('correspondence_type_procedure', 'correspondence_types')
+    conditional_tables = ('correspondence_types',)
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['correspondence_type', 'is_initial', 'is_final']
     search_fields = ['procedure_name', 'description']
@@ -109,31 +174,99 @@ class CorrespondenceTypeProcedureViewSet(viewsets.ModelViewSet):
     ordering = ['correspondence_type', 'procedure_order']
 
 
-class CorrespondenceStatusLogViewSet(viewsets.ModelViewSet):
+class CorrespondenceStatusLogViewSet(FacetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """ViewSet for managing correspondence status change logs"""
     queryset = CorrespondenceStatusLog.objects.all()
     serializer_class = CorrespondenceStatusLogSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-created_at', '-id']
+    facet_fields = {
+        'form_status_name': 'form_status_name',
+        'to_status_name': 'to_status_name',
+        'changed_by': 'changed_by__username',
+    }
+    query_plans = {
+        'list': {'select_related': ('correspondence', 'changed_by')},
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['correspondence', 'from_status', 'to_status', 'changed_by']
+    filterset_fields = ['correspondence', 'form_status_name', 'to_status_name', 'changed_by']
     search_fields = ['change_reason', 'correspondence__reference_number']
     ordering_fields = ['created_at']
     ordering = ['-created_at']
 
+    @action(detail=False, methods=['get'], url_path='dwell-times')
+    def dwell_times(self, request):
+        """
+        Get time-in-status statistics per correspondence type and status.
+        Folds in at most one batch of new log rows; ``complete`` is false while
+        older rows are still pending (``manage.py refresh_status_analytics``).
+        """
+        refresh_dwell_rollup(max_batches=1)
+        rollups = StatusDwellRollup.objects.select_related('correspondence_type')
+        if request.query_params.get('correspondence_type'):
+            rollups = rollups.filter(correspondence_type=request.query_params['correspondence_type'])
+        if request.query_params.get('status_name'):
+            rollups = rollups.filter(status_name=request.query_params['status_name'])
+        checkpoint = RollupCheckpoint.objects.filter(name=DWELL_CHECKPOINT).first()
+        return Response({
+            'refreshed_at': checkpoint.refreshed_at if checkpoint else None,
+            'complete': rollup_is_current(),
+            'results': [dwell_statistics(rollup) for rollup in rollups],
+        })
+
 
 # ====================================== PERMITS VIEWSETS ======================================
-class PermitsViewSet(viewsets.ModelViewSet):
+class PermitsViewSet(FacetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Permits.objects.all()
     serializer_class = PermitsSerializer
+    facet_fields = {
+        'permit_holder_type': 'permit_holder_type',
+        'permit_status': 'permit_status',
+        'company': 'company__company_name',
+    }
+    query_plans = {
+        'list': {
+            'select_related': ('company',),
+            'expand': {
+                'approval_decisions': (
+                    Prefetch('approvaldecisions_set', queryset=ApprovalDecisions.objects.select_related('approver_contact')),
+                ),
+            },
+        },
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['permit_holder_type', 'permit_status']
     search_fields = ['person_guid']
     ordering_fields = ['effective_date', 'expiry_date']
     ordering = ['-effective_date']
 
+    @action(detail=False, methods=['get'])
+    def active(self, request):
+        """Get only active permits"""
+        active_permits = self.get_queryset().filter(permit_status='Active')
+        serializer = self.get_serializer(active_permits, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def expiring_soon(self, request):
+        """Get permits expiring in the next 30 days"""
+        from datetime import date, timedelta
+        expiry_threshold = date.today() + timedelta(days=30)
+        expiring_permits = self.get_queryset().filter(
+            permit_status='Active',
+            expiry_date__lte=expiry_threshold,
+            expiry_date__gte=date.today()
+        )
+        serializer = self.get_serializer(expiring_permits, many=True)
+        return Response(serializer.data)
+
 
-class ApprovalDecisionsViewSet(viewsets.ModelViewSet):
+class ApprovalDecisionsViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = ApprovalDecisions.objects.all()
     serializer_class = ApprovalDecisionsSerializer
+    query_plans = {
+        'list': {'select_related': ('approver_contact',)},
+    }
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['decision_status']
     ordering_fields = ['decision_date']
@@ -141,7 +274,7 @@ class ApprovalDecisionsViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== ACCIDENTS VIEWSETS ======================================
-class AccidentsViewSet(viewsets.ModelViewSet):
+class AccidentsViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Accidents.objects.all()
     serializer_class = AccidentsSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -151,15 +284,18 @@ class AccidentsViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== RELOCATION VIEWSETS ======================================
-class RelocationViewSet(viewsets.ModelViewSet):
+class RelocationViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Relocation.objects.all()
     serializer_class = RelocationSerializer
+    query_plans = {
+        'list': {'select_related': ('relocation_letter',), 'expand': {'periods': ('periods',)}},
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['approval_status', 'building_letter']
     search_fields = ['person_guid']
 
 
-class RelocationPeriodViewSet(viewsets.ModelViewSet):
+class RelocationPeriodViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = RelocationPeriod.objects.all()
     serializer_class = RelocationPeriodSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
@@ -168,9 +304,16 @@ class RelocationPeriodViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== VEHICLES VIEWSETS ======================================
-class VehicleViewSet(viewsets.ModelViewSet):
+class VehicleViewSet(FacetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Vehicle.objects.all()
     serializer_class = VehicleSerializer
+    facet_fields = {
+        'organization': 'organization',
+        'company': 'company__company_name',
+    }
+    query_plans = {
+        'list': {'select_related': ('company', 'correspondence'), 'expand': {'permits': ('carpermit_set',)}},
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['organization']
     search_fields = ['plate_number', 'vehicle_id']
@@ -178,7 +321,7 @@ class VehicleViewSet(viewsets.ModelViewSet):
     ordering = ['-start_date']
 
 
-class CarPermitViewSet(viewsets.ModelViewSet):
+class CarPermitViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = CarPermit.objects.all()
     serializer_class = CarPermitSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
@@ -187,9 +330,18 @@ class CarPermitViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== CARD PERMITS VIEWSETS ======================================
-class CardPermitsViewSet(viewsets.ModelViewSet):
+class CardPermitsViewSet(FacetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = CardPermits.objects.all()
     serializer_class = CardPermitsSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-issue_date', '-permit_id']
+    facet_fields = {
+        'permit_type': 'permit_type',
+        'status': 'status',
+    }
+    query_plans = {
+        'list': {'select_related': ('cardphotos',)},
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['permit_type', 'status']
     search_fields = ['permit_number', 'person_guid']
@@ -197,7 +349,7 @@ class CardPermitsViewSet(viewsets.ModelViewSet):
     ordering = ['-issue_date']
 
 
-class CardPhotosViewSet(viewsets.ModelViewSet):
+class CardPhotosViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = CardPhotos.objects.all()
     serializer_class = CardPhotosSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -206,7 +358,7 @@ class CardPhotosViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== SETTINGS VIEWSETS ======================================
-class SettingsViewSet(viewsets.ModelViewSet):
+class SettingsViewSet(ConditionalGetMixin, CachedListMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Settings.objects.all()
     serializer_class = SettingsSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -221,285 +373,54 @@ class SettingsViewSet(viewsets.ModelViewSet):
 @permission_classes([IsAuthenticated])
 def parse_pdf_content(request):
     """
-    Parse PDF file content to extract Russian letter reference number and date.
-    Uses region-based extraction with PyMuPDF for high accuracy.
+    Parse PDF file content to extract Russian letter reference number, date and subject.
+    The PDF is read once and the fields are taken from the regions of a template
+    (core/pdf_extraction.py, ``?template=`` or PDF_DEFAULT_TEMPLATE).
+    With ``?async=true`` the parse is queued as a job and answered with 202.
+    Instead of a ``file``, a ``staged_id`` (core/staging.py) can name a staged PDF.
     """
-    if 'file' not in request.FILES:
+    staged_id = request.data.get('staged_id')
+    if staged_id:
+        found, _ = lookup_staged([staged_id], request.user)
+        if not found:
+            return Response({'error': 'Staged file not found or expired'}, status=status.HTTP_400_BAD_REQUEST)
+        pdf_file = found[0].file
+        file_name = found[0].file_name
+    elif 'file' in request.FILES:
+        pdf_file = request.FILES['file']
+        file_name = pdf_file.name
+    else:
         return Response(
             {'error': 'PDF file is required'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    pdf_file = request.FILES['file']
-    
     # Validate file type
-    if not pdf_file.name.lower().endswith('.pdf'):
+    if not file_name.lower().endswith('.pdf'):
         return Response(
             {'error': 'Only PDF files are supported'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
     try:
-        import fitz  # PyMuPDF
-        from io import BytesIO
-        from datetime import datetime
-        
-        # Read PDF content into memory
-        pdf_content = BytesIO(pdf_file.read())
-        
-        # Open PDF document
-        doc = fitz.open(stream=pdf_content, filetype="pdf")
-        
-        if len(doc) == 0:
-            doc.close()
-            return Response({
-                'success': True,
-                'parsed': False,
-                'message': 'PDF file appears to be empty'
-            }, status=status.HTTP_200_OK)
-        
-        # Get first page
-        page = doc[0]
-        page_rect = page.rect
-        
-        # Define relative coordinates for letter data region (based on your working script)
-        # These percentages work universally across different PDF sizes
-        letter_x1_percent, letter_y1_percent = 0.234, 0.159  # 23.4%, 15.9%
-        letter_x2_percent, letter_y2_percent = 0.376, 0.193  # 37.6%, 19.3%
-        
-        # Define relative coordinates for Block 8 (subject/vehicle info)
-        # Block 8 coordinates: (70.9,276.3) to (496.6,291.8) on 595x842 PDF
-        block8_x1_percent, block8_y1_percent = 0.119, 0.328  # 11.9%, 32.8%
-        block8_x2_percent, block8_y2_percent = 0.95, 0.347  # 83.4%, 34.7%
-        
-        # Calculate absolute coordinates for current PDF
-        letter_x1 = letter_x1_percent * page_rect.width
-        letter_y1 = letter_y1_percent * page_rect.height
-        letter_x2 = letter_x2_percent * page_rect.width
-        letter_y2 = letter_y2_percent * page_rect.height
-        
-        block8_x1 = block8_x1_percent * page_rect.width
-        block8_y1 = block8_y1_percent * page_rect.height
-        block8_x2 = block8_x2_percent * page_rect.width
-        block8_y2 = block8_y2_percent * page_rect.height
-        
-        # Extract text from the letter data region
-        rect = fitz.Rect(letter_x1, letter_y1, letter_x2, letter_y2)
-        region_text = page.get_text("text", clip=rect).strip()
-        
-        # Extract text from Block 8 (subject info) - enhanced for multi-line extraction
-        block8_rect = fitz.Rect(block8_x1, block8_y1, block8_x2, block8_y2)
-        block8_text = page.get_text("text", clip=block8_rect).strip()
-        
-        # Check for additional text blocks within 15 pixels below Block 8 for multi-line subjects
-        additional_subject_text = ""
-        search_height = 15  # pixels to search below Block 8
-        
-        # Define extended search area (15px below Block 8)
-        extended_y1 = block8_y2  # Start from bottom of Block 8
-        extended_y2 = block8_y2 + search_height  # Search 15px below
-        extended_rect = fitz.Rect(block8_x1, extended_y1, block8_x2, extended_y2)
-        
-        # Extract text from the extended area
-        extended_text = page.get_text("text", clip=extended_rect).strip()
-        
-        if extended_text:
-            # Clean and append the extended text
-            additional_subject_text = extended_text.strip().replace('\n', ' ').replace('\r', ' ')
-            additional_subject_text = ' '.join(additional_subject_text.split())  # Remove extra whitespace
-            
-        # Combine Block 8 text with any additional text found below
-        if block8_text and additional_subject_text:
-            # Combine with a space separator
-            full_block8_text = f"{block8_text} {additional_subject_text}"
-        elif additional_subject_text:
-            # Only additional text found
-            full_block8_text = additional_subject_text
-        else:
-            # Only main Block 8 text
-            full_block8_text = block8_text
-            
-        # Use the combined text as the final block8_text
-        block8_text = full_block8_text
-        
-        # Split into paragraphs/lines
-        paragraphs = [p.strip() for p in region_text.split('\n') if p.strip()]
-        
-        reference_number = None
-        correspondence_date = None
-        subject = None
-        
-        # Process extracted paragraphs
-        if len(paragraphs) >= 1:
-            # First paragraph typically contains the reference number
-            ref_text = paragraphs[0]
-            # Clean and extract reference number
-            reference_number = ref_text.strip()
-            
-        if len(paragraphs) >= 2:
-            # Second paragraph typically contains the date
-            date_text = paragraphs[1]
-            
-            # Try to parse the date from various formats
-            date_patterns = [
-                r'(\d{1,2}[/\-\.]\d{1,2}[/\-\.]\d{4})',  # DD/MM/YYYY, DD-MM-YYYY, or DD.MM.YYYY
-                r'(\d{4}[/\-\.]\d{1,2}[/\-\.]\d{1,2})',  # YYYY/MM/DD, YYYY-MM-DD, or YYYY.MM.YYYY
-                r'(\d{1,2}\s+\w+\s+\d{4})',  # DD Month YYYY
-            ]
-            
-            # First try to parse the entire date_text as a date (common case)
-            try:
-                # Check if the date_text is already in a date format (like "22.07.2025")
-                if re.match(r'^\d{1,2}[.\-/]\d{1,2}[.\-/]\d{4}$', date_text):
-                    # Determine separator (., -, or /)
-                    separator = '.' if '.' in date_text else ('/' if '/' in date_text else '-')
-                    parts = date_text.split(separator)
-                    
-                    if len(parts) == 3:
-                        # Assume DD.MM.YYYY format (common for Russian letters)
-                        day, month, year = parts
-                        parsed_date = datetime(int(year), int(month), int(day))
-                        correspondence_date = parsed_date.strftime('%Y-%m-%d')
-            except (ValueError, IndexError):
-                # If direct parsing fails, try pattern matching
-                for pattern in date_patterns:
-                    match = re.search(pattern, date_text)
-                    if match:
-                        date_str = match.group(1).strip()
-                        try:
-                            # Handle different date formats with different separators
-                            separator = None
-                            for sep in ['.', '/', '-']:
-                                if sep in date_str:
-                                    separator = sep
-                                    break
-                                    
-                            if separator and len(date_str.split(separator)) == 3:
-                                parts = date_str.split(separator)
-                                
-                                # Determine date format
-                                if len(parts[0]) == 4:  # YYYY/MM/DD
-                                    year, month, day = parts
-                                else:  # DD/MM/YYYY (most common for Russian letters)
-                                    day, month, year = parts
-                                
-                                # Validate and format
-                                parsed_date = datetime(int(year), int(month), int(day))
-                                correspondence_date = parsed_date.strftime('%Y-%m-%d')
-                                break
-                        except (ValueError, IndexError):
-                            continue
-        
-        # Close the document
-        doc.close()
-        
-        # If region extraction didn't work, try fallback full-page extraction
-        if not reference_number and not correspondence_date:
-            # Fallback: extract from full page and use pattern matching
-            doc = fitz.open(stream=BytesIO(pdf_file.read()), filetype="pdf")
-            page = doc[0]
-            full_text = page.get_text("text")
-            lines = full_text.split('\n')
-            
-            # Search for reference number patterns in full text
-            ref_patterns = [
-                r'(?:رقم|Ref|Reference|REF|No\.?)\s*:?\s*([A-Z0-9/\-]+)',
-                r'([A-Z0-9]+/[A-Z0-9/\-]+)',  # Direct pattern like "123/ABC/2025"
-            ]
-            
-            # Search for date patterns in full text
-            date_patterns = [
-                r'(?:تاريخ|Date|DATE)\s*:?\s*(\d{1,2}[/\-]\d{1,2}[/\-]\d{4})',
-                r'(\d{1,2}[/\-]\d{1,2}[/\-]\d{4})',
-            ]
-            
-            # Process first 15 lines for patterns
-            for line in lines[:15]:
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                # Try to find reference number
-                if not reference_number:
-                    for pattern in ref_patterns:
-                        match = re.search(pattern, line, re.IGNORECASE)
-                        if match:
-                            reference_number = match.group(1).strip()
-                            break
-                
-                # Try to find date
-                if not correspondence_date:
-                    for pattern in date_patterns:
-                        match = re.search(pattern, line, re.IGNORECASE)
-                        if match:
-                            date_str = match.group(1).strip()
-                            try:
-                                parts = date_str.replace('-', '/').split('/')
-                                if len(parts) == 3:
-                                    if len(parts[0]) == 4:
-                                        year, month, day = parts
-                                    else:
-                                        day, month, year = parts
-                                    
-                                    parsed_date = datetime(int(year), int(month), int(day))
-                                    correspondence_date = parsed_date.strftime('%Y-%m-%d')
-                                    break
-                            except (ValueError, IndexError):
-                                continue
-            
-            doc.close()
-        
-        # Extract subject from Block 8 text
-        if block8_text:
-            # Clean up the extracted text and use it as subject
-            subject = block8_text.strip().replace('\n', ' ').replace('\r', ' ')
-            # Remove extra whitespace
-            subject = ' '.join(subject.split())
-        
-        # Determine parsing success and confidence
-        if reference_number or correspondence_date or subject:
-            confidence = 'high' if (reference_number and correspondence_date and subject) else 'medium'
-            extraction_method = 'region_based' if paragraphs else 'pattern_matching'
-            
-            return Response({
-                'success': True,
-                'parsed': True,
-                'method': f'pdf_content_extraction_{extraction_method}',
-                'data': {
-                    'reference_number': reference_number,
-                    'correspondence_date': correspondence_date,
-                    'subject': subject,
-                    'confidence': confidence,
-                    'extracted_from': 'pdf_content',
-                    'extraction_method': extraction_method
-                },
-                'debug_info': {
-                    'region_paragraphs': paragraphs[:5] if paragraphs else [],
-                    'block8_text': block8_text,
-                    'block8_main_text': page.get_text("text", clip=block8_rect).strip(),
-                    'block8_extended_text': additional_subject_text,
-                    'pdf_dimensions': f'{page_rect.width}x{page_rect.height}',
-                    'correspondence_date': correspondence_date
-                }
-            }, status=status.HTTP_200_OK)
-        else:
-            return Response({
-                'success': True,
-                'parsed': False,
-                'message': 'No reference number, date, or subject found in PDF content',
-                'debug_info': {
-                    'region_paragraphs': paragraphs[:5] if paragraphs else [],
-                    'block8_text': block8_text,
-                    'block8_main_text': page.get_text("text", clip=block8_rect).strip() if 'block8_rect' in locals() else '',
-                    'block8_extended_text': additional_subject_text if 'additional_subject_text' in locals() else '',
-                    'pdf_dimensions': f'{page_rect.width}x{page_rect.height}',
-                    'region_coordinates': f'({letter_x1:.1f},{letter_y1:.1f}) to ({letter_x2:.1f},{letter_y2:.1f})',
-                    'block8_coordinates': f'({block8_x1:.1f},{block8_y1:.1f}) to ({block8_x2:.1f},{block8_y2:.1f})',
-                    'block8_extended_coordinates': f'({block8_x1:.1f},{extended_y1:.1f}) to ({block8_x2:.1f},{extended_y2:.1f})',
-                    'correspondence_date': correspondence_date
-                }
-            }, status=status.HTTP_200_OK)
-            
+        template = get_pdf_template(request.query_params.get('template'))
+    except PdfTemplateError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    with pdf_file.open('rb'):
+        data = pdf_file.read()
+    digest, version = content_hash(data), pdf_cache_version(template)
+    result = parse_cache.get('pdf', version, digest)
+    if result is not MISSING:
+        return Response({**pdf_parse_payload(result), 'cached': True}, status=status.HTTP_200_OK)
+
+    if _wants_async(request):
+        name = default_storage.save(f'jobs/{uuid.uuid4().hex}.pdf', ContentFile(data))
+        job = enqueue_job('parse_pdf', {'file': name, 'template': template.name}, files=[name], user=request.user)
+        return _accepted(request, job)
+
+    try:
+        result = extract_pdf_fields(data, template)
     except ImportError:
         return Response(
             {'error': 'PyMuPDF (fitz) library is not installed. Please install it to process PDF files.'}, 
@@ -511,6 +432,71 @@ def parse_pdf_content(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+    parse_cache.set('pdf', version, digest, result)
+    return Response({**pdf_parse_payload(result), 'cached': False}, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def parse_pdf_batch(request):
+    """
+    Parse many PDFs (multipart ``files``) in one request. Extraction runs in a
+    process pool (core.pdf_extraction.extract_many) with a per-file timeout;
+    ``results`` hold one ``parse-pdf-content`` body per file, in input order,
+    plus ``file_name`` (and ``error`` for files that could not be parsed).
+    """
+    files = request.FILES.getlist('files')
+    if not files:
+        return Response({'error': 'No files provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_files = getattr(settings, 'PDF_BATCH_MAX_FILES', 50)
+    if len(files) > max_files:
+        return Response(
+            {'error': f'At most {max_files} files can be parsed per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        template = get_pdf_template(request.query_params.get('template'))
+    except PdfTemplateError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_file_size_mb = settings_registry.get('max_file_size_mb')
+    version = pdf_cache_version(template)
+    results = [{'file_name': file.name} for file in files]
+    pending = []
+    for result, file in zip(results, files):
+        if not file.name.lower().endswith('.pdf'):
+            result.update(success=False, parsed=False, error='Only PDF files are supported')
+        elif max_file_size_mb and file.size > max_file_size_mb * 1024 * 1024:
+            result.update(success=False, parsed=False, error=f'Files larger than {max_file_size_mb} MB are not allowed')
+        else:
+            data = file.read()
+            digest = content_hash(data)
+            cached = parse_cache.get('pdf', version, digest)
+            if cached is not MISSING:
+                result.update(pdf_parse_payload(cached), cached=True)
+            else:
+                pending.append((result, digest, data))
+
+    outcomes = extract_pdf_batch([data for _, _, data in pending], template)
+    for (result, digest, _), (extracted, error) in zip(pending, outcomes):
+        if error is None:
+            parse_cache.set('pdf', version, digest, extracted)
+            result.update(pdf_parse_payload(extracted), cached=False)
+        elif isinstance(error, ImportError):
+            result.update(success=False, parsed=False, error='PyMuPDF (fitz) library is not installed. Please install it to process PDF files.')
+        elif isinstance(error, TimeoutError):
+            result.update(success=False, parsed=False, error=f'Parsing timed out: {error}')
+        else:
+            result.update(success=False, parsed=False, error=f'Failed to parse PDF content: {error}')
+
+    return Response({
+        'count': len(results),
+        'parsed': sum(1 for result in results if result.get('parsed')),
+        'results': results
+    }, status=status.HTTP_200_OK)
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -580,12 +566,15 @@ def parse_filename(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def process_msg_file(request):
     """
     Process a .msg file and extract its attachments.
-    Returns the extracted attachments as a list of file objects.
+    The attachments are staged on the server (core/staging.py); the response
+    lists their metadata and ``staged_id``s for the attachments upload.
+    With ``?async=true`` the extraction is queued as a job and answered with 202.
     """
     if 'file' not in request.FILES:
         return Response(
@@ -602,67 +591,74 @@ def process_msg_file(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    digest = content_hash(msg_file.chunks())
+    parsed = cached_msg(digest, request.user)
+    if parsed is not MISSING:
+        return Response({**msg_payload(parsed, msg_file.name), 'cached': True}, status=status.HTTP_200_OK)
+
+    if _wants_async(request):
+        name = default_storage.save(f'jobs/{uuid.uuid4().hex}.msg', msg_file)
+        job = enqueue_job(
+            'process_msg', {'file': name, 'file_name': msg_file.name, 'user_id': request.user.pk}, files=[name], user=request.user
+        )
+        return _accepted(request, job)
+
     try:
-        # Create a temporary file to save the uploaded .msg file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.msg') as temp_file:
-            # Write the uploaded file content to temp file
-            for chunk in msg_file.chunks():
-                temp_file.write(chunk)
-            temp_file_path = temp_file.name
-        
-        try:
-            # Parse the .msg file using extract-msg library
-            msg = extract_msg.Message(temp_file_path)
-            
-            # Extract attachments from the .msg file
-            attachments_data = []
-            
-            if hasattr(msg, 'attachments') and msg.attachments:
-                for i, attachment in enumerate(msg.attachments):
-                    try:
-                        # Get attachment data
-                        attachment_data = attachment.data
-                        attachment_name = attachment.longFilename or attachment.shortFilename or f'attachment_{i}'
-                        
-                        if attachment_data:
-                            # Create file-like object for the attachment
-                            attachment_info = {
-                                'name': attachment_name,
-                                'size': len(attachment_data),
-                                'data': attachment_data.hex(),  # Convert to hex for JSON serialization
-                                'mime_type': getattr(attachment, 'mimeType', 'application/octet-stream')
-                            }
-                            attachments_data.append(attachment_info)
-                    except Exception as e:
-                        print(f'Error processing attachment {i}: {str(e)}')
-                        continue
-            
-            # Extract email metadata for reference
-            email_info = {
-                'subject': getattr(msg, 'subject', ''),
-                'sender': getattr(msg, 'sender', ''),
-                'date': str(getattr(msg, 'date', '')),
-                'body': getattr(msg, 'body', '')[:500] if getattr(msg, 'body', '') else ''  # First 500 chars
-            }
-            
-            return Response({
-                'success': True,
-                'attachments': attachments_data,
-                'email_info': email_info,
-                'message': f'Successfully extracted {len(attachments_data)} attachments from {msg_file.name}'
-            }, status=status.HTTP_200_OK)
-            
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
-                
+        parsed = parse_msg(msg_file.chunks(), request.user)
     except Exception as e:
-        # Clean up temporary file in case of error
-        if 'temp_file_path' in locals() and os.path.exists(temp_file_path):
-            os.unlink(temp_file_path)
-            
         return Response(
             {'error': f'Failed to process .msg file: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+    parse_cache.set('msg', MSG_CACHE_VERSION, digest, parsed)
+    return Response({**msg_payload(parsed, msg_file.name), 'cached': False}, status=status.HTTP_200_OK)
+
+
+def _wants_async(request):
+    return request.query_params.get('async', '').lower() in ('1', 'true', 'yes')
+
+
+def _accepted(request, job):
+    """202 response pointing at the status endpoint of a queued job"""
+    return Response({
+        'job_id': job.job_id,
+        'status': job.status,
+        'status_url': request.build_absolute_uri(reverse('job_detail', args=[job.job_id]))
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_detail(request, job_id):
+    """
+    Status of a background job (core/jobs.py) and, once finished, its result or error.
+    Users see their own jobs; admins see all.
+    """
+    jobs = Job.objects.all() if request.user.is_admin() else Job.objects.filter(created_by=request.user)
+    job = jobs.filter(job_id=job_id).first()
+    if job is None:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(JobSerializer(job).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_stats(request):
+    """
+    Dashboard counters and breakdowns in one response.
+    Cached for DASHBOARD_CACHE_TIMEOUT seconds; see core.dashboard.
+    """
+    return Response(get_dashboard_stats(), status=status.HTTP_200_OK)
+
+
+def metrics(request):
+    """
+    Prometheus scrape endpoint for this worker's request metrics (see core.metrics).
+    A plain Django view to keep scrapes cheap; when METRICS_TOKEN is set the scraper
+    must send it as "Authorization: Bearer <token>".
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
@@ -4,11 +4,15 @@ from rest_framework.response import Response
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.db.models import Prefetch, OuterRef, Subquery, Count, IntegerField
+from django.db.models.functions import Coalesce
 from .models import (
     PeopleHistory, CompaniesHistory, EmploymentHistory, FamilyRelationships,
     CorrespondenceTypes, Contacts, Correspondence,
-    Attachments, CorrespondenceStatusLog, Permits, ApprovalDecisions,
+    Attachments, CorrespondenceStatusLog, CorrespondenceTypeProcedure, Permits, ApprovalDecisions,
     Accidents, Relocation, RelocationPeriod, Vehicle, CarPermit,
     CardPermits, CardPhotos
 )
@@ -20,14 +24,107 @@ from .serializers import (
     PermitsSerializer, ApprovalDecisionsSerializer,
     AccidentsSerializer, RelocationSerializer, RelocationPeriodSerializer,
     VehicleSerializer, CarPermitSerializer, CardPermitsSerializer, CardPhotosSerializer,
-    PeopleHistorySummarySerializer, CorrespondenceSummarySerializer
+    PeopleHistorySummarySerializer, CorrespondenceSummarySerializer, CorrespondenceThreadSerializer
 )
+from .mixins import QueryPlanMixin, FacetMixin, ConditionalGetMixin, ExportMixin
+from .pagination import KeysetPagination
+from .search import FullTextSearchFilter, ArabicNameSearchFilter
+from .threads import thread_queryset, build_thread
+from .bulk import bulk_create_correspondence, bulk_transition
+from .settings_registry import settings_registry
+from .staging import lookup as lookup_staged, attach as attach_staged
+from .msg_import import read_message, import_message
+from .pdf_extraction import get_template as get_pdf_template, TemplateError as PdfTemplateError
 
 User = get_user_model()
 
 
+# Columns needed to render CorrespondenceSerializer without per-row lookups
+CORRESPONDENCE_LIST_ONLY = (
+    'correspondence_id', 'parent_correspondence', 'reference_number', 'correspondence_date',
+    'subject', 'direction', 'priority', 'summary', 'created_at', 'updated_at',
+    'type', 'type__type_name',
+    'current_status', 'current_status__procedure_name',
+    'assigned_to', 'assigned_to__username', 'assigned_to__full_name_arabic',
+    'contact', 'contact__name',
+)
+
+def related_count(model, fk_name):
+    """Correlated COUNT(*) of `model` rows pointing at the outer row (0 when none)"""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{fk_name: OuterRef('pk')})
+            .order_by().values(fk_name).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+# (header, ORM path) columns of /api/correspondence/export/
+CORRESPONDENCE_EXPORT_COLUMNS = [
+    ('correspondence_id', 'correspondence_id'),
+    ('reference_number', 'reference_number'),
+    ('correspondence_date', 'correspondence_date'),
+    ('direction', 'direction'),
+    ('priority', 'priority'),
+    ('subject', 'subject'),
+    ('summary', 'summary'),
+    ('type', 'type__type_name'),
+    ('current_status', 'current_status__procedure_name'),
+    ('contact', 'contact__name'),
+    ('assigned_to', 'assigned_to__username'),
+    ('parent_reference_number', 'parent_correspondence__reference_number'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+]
+
+
+CORRESPONDENCE_QUERY_PLANS = {
+    'list': {
+        'select_related': ('type', 'current_status', 'assigned_to', 'contact'),
+        'expand': {
+            'attachments': ('attachments',),
+            'status_logs': (
+                Prefetch('status_logs', queryset=CorrespondenceStatusLog.objects.select_related('changed_by')),
+            ),
+        },
+        'only': CORRESPONDENCE_LIST_ONLY,
+        'annotate': {
+            'attachments_total': related_count(Attachments, 'correspondence'),
+            'status_logs_total': related_count(CorrespondenceStatusLog, 'correspondence'),
+        },
+    },
+    'retrieve': {
+        'select_related': ('type', 'current_status', 'assigned_to', 'contact'),
+        'prefetch_related': (
+            'attachments',
+            Prefetch('status_logs', queryset=CorrespondenceStatusLog.objects.select_related('changed_by')),
+        ),
+    },
+    'thread': {'select_related': ('type',)},
+    'summary': {
+        'select_related': ('type',),
+    },
+}
+
+# Tables the correspondence serializer reads names from (part of its ETag)
+CORRESPONDENCE_CONDITIONAL_TABLES = ('correspondence_types', 'correspondence_type_procedure', 'contacts', 'auth_user')
+
+# Column name (as used by the Russian letters table) -> ORM path
+CORRESPONDENCE_FACET_FIELDS = {
+    'type': 'type__type_name',
+    'contact': 'contact__name',
+    'current_status': 'current_status__procedure_name',
+    'assigned_to': 'assigned_to__username',
+    'priority': 'priority',
+    'direction': 'direction',
+    'correspondence_date': 'correspondence_date',
+}
+
+
 # ====================================== USER VIEWSETS ======================================
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -38,10 +135,12 @@ class UserViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== PEOPLE VIEWSETS ======================================
-class PeopleHistoryViewSet(viewsets.ModelViewSet):
+class PeopleHistoryViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = PeopleHistory.objects.all()
     serializer_class = PeopleHistorySerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-start_date', '-person_record_id']
+    filter_backends = [DjangoFilterBackend, ArabicNameSearchFilter, filters.OrderingFilter]
     search_fields = ['full_name_arabic', 'full_name_english', 'national_id', 'person_guid']
     filterset_fields = ['is_current', 'nationality', 'alive', 'version']
     ordering_fields = ['full_name_arabic', 'start_date', 'version']
@@ -50,7 +149,7 @@ class PeopleHistoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def current_only(self, request):
         """Get only current versions of people records"""
-        current_people = self.queryset.filter(is_current=True)
+        current_people = self.get_queryset().filter(is_current=True)
         serializer = PeopleHistorySummarySerializer(current_people, many=True)
         return Response(serializer.data)
 
@@ -63,7 +162,7 @@ class PeopleHistoryViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class CompaniesHistoryViewSet(viewsets.ModelViewSet):
+class CompaniesHistoryViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = CompaniesHistory.objects.all()
     serializer_class = CompaniesHistorySerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -75,14 +174,17 @@ class CompaniesHistoryViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def current_only(self, request):
         """Get only current versions of company records"""
-        current_companies = self.queryset.filter(is_current=True)
+        current_companies = self.get_queryset().filter(is_current=True)
         serializer = self.get_serializer(current_companies, many=True)
         return Response(serializer.data)
 
 
-class EmploymentHistoryViewSet(viewsets.ModelViewSet):
+class EmploymentHistoryViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = EmploymentHistory.objects.all()
     serializer_class = EmploymentHistorySerializer
+    query_plans = {
+        'list': {'select_related': ('company',)},
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['person_guid', 'job_title', 'company__company_name']
     filterset_fields = ['still_hired', 'is_current', 'company']
@@ -90,7 +192,7 @@ class EmploymentHistoryViewSet(viewsets.ModelViewSet):
     ordering = ['-start_date']
 
 
-class FamilyRelationshipsViewSet(viewsets.ModelViewSet):
+class FamilyRelationshipsViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = FamilyRelationships.objects.all()
     serializer_class = FamilyRelationshipsSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -101,7 +203,7 @@ class FamilyRelationshipsViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== CORRESPONDENCE VIEWSETS ======================================
-class CorrespondenceTypesViewSet(viewsets.ModelViewSet):
+class CorrespondenceTypesViewSet(ConditionalGetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = CorrespondenceTypes.objects.all()
     serializer_class = CorrespondenceTypesSerializer
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -109,7 +211,7 @@ class CorrespondenceTypesViewSet(viewsets.ModelViewSet):
     ordering = ['type_name']
 
 
-class ContactsViewSet(viewsets.ModelViewSet):
+class ContactsViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Contacts.objects.all()
     serializer_class = ContactsSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -121,24 +223,32 @@ class ContactsViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def approvers(self, request):
         """Get only contacts that are approvers"""
-        approvers = self.queryset.filter(is_approver=True)
+        approvers = self.get_queryset().filter(is_approver=True)
         serializer = self.get_serializer(approvers, many=True)
         return Response(serializer.data)
 
 
-class CorrespondenceViewSet(viewsets.ModelViewSet):
+class CorrespondenceViewSet(ConditionalGetMixin, ExportMixin, FacetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Correspondence.objects.all()
     serializer_class = CorrespondenceSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-correspondence_date', '-correspondence_id']
+    query_plans = CORRESPONDENCE_QUERY_PLANS
+    conditional_tables = CORRESPONDENCE_CONDITIONAL_TABLES
+    facet_fields = CORRESPONDENCE_FACET_FIELDS
+    export_columns = CORRESPONDENCE_EXPORT_COLUMNS
     authentication_classes = [TokenAuthentication]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
     search_fields = ['reference_number', 'subject', 'summary']
-    filterset_fields = ['direction', 'priority', 'type', 'correspondence_date']
+    filterset_fields = [
+        'direction', 'priority', 'type', 'type__category', 'current_status', 'assigned_to', 'correspondence_date'
+    ]
     ordering_fields = ['correspondence_date', 'reference_number', 'priority']
     ordering = ['-correspondence_date']
     
     def get_permissions(self):
         """Set permissions based on action"""
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk', 'transition', 'import_msg']:
             # Require authentication for write operations
             permission_classes = [IsAuthenticated]
         else:
@@ -196,6 +306,51 @@ class CorrespondenceViewSet(viewsets.ModelViewSet):
                 headers=headers
             )
 
+    @action(detail=False, methods=['post'], url_path='import-msg')
+    def import_msg(self, request):
+        """
+        Create a letter from an emailed .msg file in one request (core/msg_import.py).
+        Reference number, date and subject are prefilled from its PDF attachments
+        (``?template=`` as for parse-pdf-content); other correspondence fields may be
+        sent alongside ``file`` and override the prefilled values. The letter, its
+        attachments and its initial status log are created together.
+        """
+        msg_file = request.FILES.get('file')
+        if msg_file is None:
+            return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+        if not msg_file.name.lower().endswith('.msg'):
+            return Response({'error': 'File must be a .msg file'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            template = get_pdf_template(request.query_params.get('template'))
+        except PdfTemplateError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            message = read_message(msg_file.chunks())
+        except Exception as e:
+            return Response(
+                {'error': f'Failed to process .msg file: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        data = {key: value for key, value in request.data.items() if key != 'file'}
+        try:
+            correspondence, report = import_message(message, data, request.user, template)
+        except IntegrityError:
+            return Response(
+                {'error': 'A correspondence with this reference number and date already exists'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            {
+                'correspondence': self.get_serializer(correspondence).data,
+                'prefill': report,
+                'message': f'Imported {msg_file.name} with {len(message.attachments)} attachments'
+            },
+            status=status.HTTP_201_CREATED
+        )
+
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get correspondence summary for listings"""
@@ -207,11 +362,105 @@ class CorrespondenceViewSet(viewsets.ModelViewSet):
         serializer = CorrespondenceSummarySerializer(correspondences, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create many correspondence records with their initial status logs.
+
+        Accepts a list of rows, or ``{"items": [...], "all_or_nothing": true}``.
+        Returns one result per row, in input order.
+        """
+        payload = request.data
+        all_or_nothing = False
+        if isinstance(payload, dict):
+            all_or_nothing = str(payload.get('all_or_nothing', '')).lower() in ('true', '1')
+            payload = payload.get('items')
+        if not isinstance(payload, list) or not payload:
+            return Response(
+                {'error': 'Expected a non-empty list of correspondence rows'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_rows = getattr(settings, 'BULK_MAX_ROWS', 5000)
+        if len(payload) > max_rows:
+            return Response(
+                {'error': f'At most {max_rows} rows can be imported per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results, created = bulk_create_correspondence(payload, request.user, all_or_nothing=all_or_nothing)
+        if created == len(payload):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(
+            {'created': created, 'failed': len(payload) - created, 'results': results},
+            status=response_status
+        )
 
+    @action(detail=False, methods=['post'])
+    def transition(self, request):
+        """
+        Move many letters to one procedure in a single transaction.
+
+        Body: ``{"ids": [...], "to_status": <procedure id>, "change_reason": "...",
+        "all_or_nothing": false}``. Each letter's type must match the
+        procedure's type; rejected letters are reported and left unchanged.
+        """
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            return Response({'error': 'ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(pk) for pk in ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        max_rows = getattr(settings, 'BULK_MAX_ROWS', 5000)
+        if len(ids) > max_rows:
+            return Response(
+                {'error': f'At most {max_rows} letters can be moved per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        to_status = request.data.get('to_status')
+        procedure = None
+        if str(to_status).isdigit():
+            procedure = CorrespondenceTypeProcedure.objects.filter(pk=to_status).first()
+        if procedure is None:
+            return Response({'error': 'to_status must be an existing procedure id'}, status=status.HTTP_400_BAD_REQUEST)
+
+        all_or_nothing = str(request.data.get('all_or_nothing', '')).lower() in ('true', '1')
+        changed, rejected = bulk_transition(
+            ids, procedure, request.user,
+            reason=request.data.get('change_reason') or None,
+            all_or_nothing=all_or_nothing
+        )
+        return Response(
+            {'to_status': procedure.pk, 'to_status_name': procedure.procedure_name, 'changed': changed, 'rejected': rejected},
+            status=status.HTTP_200_OK if changed or not rejected else status.HTTP_400_BAD_REQUEST
+        )
 
+    @action(detail=True, methods=['get'])
+    def thread(self, request, pk=None):
+        """Get the ancestor chain and reply tree of a correspondence in one query"""
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            return Response({'error': 'Correspondence not found'}, status=status.HTTP_404_NOT_FOUND)
+        rows = list(thread_queryset(self.get_queryset(), pk).order_by('correspondence_date', 'correspondence_id'))
+        thread = build_thread(rows, pk)
+        if thread is None:
+            return Response({'error': 'Correspondence not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'correspondence_id': pk,
+            'root_id': thread[0].pk,
+            'results': CorrespondenceThreadSerializer(thread, many=True).data,
+        })
 
 
-class AttachmentsViewSet(viewsets.ModelViewSet):
+
+
+
+class AttachmentsViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Attachments.objects.all()
     serializer_class = AttachmentsSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -222,7 +471,10 @@ class AttachmentsViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def upload(self, request):
-        """Upload files for a correspondence"""
+        """
+        Upload files for a correspondence. Besides uploaded ``files``, ``staged_ids``
+        attach files already staged on the server (core/staging.py), which are consumed.
+        """
         import os
         from django.conf import settings
         from django.core.files.storage import default_storage
@@ -230,6 +482,10 @@ class AttachmentsViewSet(viewsets.ModelViewSet):
         import mimetypes
         correspondence_id = request.data.get('correspondence_id')
         files = request.FILES.getlist('files')
+        if hasattr(request.data, 'getlist'):
+            staged_ids = request.data.getlist('staged_ids')
+        else:
+            staged_ids = request.data.get('staged_ids') or []
         
         if not correspondence_id:
             return Response(
@@ -237,12 +493,19 @@ class AttachmentsViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if not files:
+        if not files and not staged_ids:
             return Response(
                 {'error': 'No files provided'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        staged_files, missing = lookup_staged(staged_ids, request.user)
+        if missing:
+            return Response(
+                {'error': 'Staged files not found or expired', 'staged_ids': missing},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         try:
             correspondence = Correspondence.objects.get(correspondence_id=correspondence_id)
         except Correspondence.DoesNotExist:
@@ -251,18 +514,34 @@ class AttachmentsViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        uploaded_files = []
+        max_file_size_mb = settings_registry.get('max_file_size_mb')
+        if max_file_size_mb:
+            too_large = [file.name for file in files if file.size > max_file_size_mb * 1024 * 1024] + [
+                staged.file_name for staged in staged_files if staged.file_size > max_file_size_mb * 1024 * 1024
+            ]
+            if too_large:
+                return Response(
+                    {'error': f'Files larger than {max_file_size_mb} MB are not allowed', 'files': too_large},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
         
-        for file in files:
+        attachments = [
             # Create attachment record with FileField handling the file storage
-            attachment = Attachments.objects.create(
+            Attachments.objects.create(
                 correspondence=correspondence,
                 file=file,  # FileField handles the upload path and storage
                 file_name=file.name,
                 file_type=file.content_type,
                 file_size=file.size
             )
-            
+            for file in files
+        ]
+        # Staged files are copied storage-to-storage, never through the client
+        attachments += [attach_staged(staged, correspondence) for staged in staged_files]
+        
+        uploaded_files = []
+        
+        for attachment in attachments:
             uploaded_files.append({
                 'attachment_id': attachment.attachment_id,
                 'file_name': attachment.file_name,
@@ -303,9 +582,19 @@ class AttachmentsViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== APPROVAL VIEWSETS ======================================
-class PermitsViewSet(viewsets.ModelViewSet):
+class PermitsViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Permits.objects.all()
     serializer_class = PermitsSerializer
+    query_plans = {
+        'list': {
+            'select_related': ('company',),
+            'expand': {
+                'approval_decisions': (
+                    Prefetch('approvaldecisions_set', queryset=ApprovalDecisions.objects.select_related('approver_contact')),
+                ),
+            },
+        },
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['person_guid', 'company__company_name']
     filterset_fields = ['permit_holder_type', 'permit_status', 'effective_date', 'expiry_date']
@@ -315,7 +604,7 @@ class PermitsViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def active(self, request):
         """Get only active permits"""
-        active_permits = self.queryset.filter(permit_status='Active')
+        active_permits = self.get_queryset().filter(permit_status='Active')
         serializer = self.get_serializer(active_permits, many=True)
         return Response(serializer.data)
 
@@ -324,7 +613,7 @@ class PermitsViewSet(viewsets.ModelViewSet):
         """Get permits expiring in the next 30 days"""
         from datetime import date, timedelta
         expiry_threshold = date.today() + timedelta(days=30)
-        expiring_permits = self.queryset.filter(
+        expiring_permits = self.get_queryset().filter(
             permit_status='Active',
             expiry_date__lte=expiry_threshold,
             expiry_date__gte=date.today()
@@ -333,9 +622,12 @@ class PermitsViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ApprovalDecisionsViewSet(viewsets.ModelViewSet):
+class ApprovalDecisionsViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = ApprovalDecisions.objects.all()
     serializer_class = ApprovalDecisionsSerializer
+    query_plans = {
+        'list': {'select_related': ('approver_contact',)},
+    }
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['decision_status', 'approver_contact', 'permit', 'decision_date']
     ordering_fields = ['decision_date', 'decision_status']
@@ -343,7 +635,7 @@ class ApprovalDecisionsViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== ACCIDENTS VIEWSETS ======================================
-class AccidentsViewSet(viewsets.ModelViewSet):
+class AccidentsViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Accidents.objects.all()
     serializer_class = AccidentsSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -354,9 +646,12 @@ class AccidentsViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== RELOCATION VIEWSETS ======================================
-class RelocationViewSet(viewsets.ModelViewSet):
+class RelocationViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Relocation.objects.all()
     serializer_class = RelocationSerializer
+    query_plans = {
+        'list': {'select_related': ('relocation_letter',), 'expand': {'periods': ('periods',)}},
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['person_guid']
     filterset_fields = ['approval_status', 'building_letter', 'building_number']
@@ -364,7 +659,7 @@ class RelocationViewSet(viewsets.ModelViewSet):
     ordering = ['building_number', 'building_letter', 'flat_number']
 
 
-class RelocationPeriodViewSet(viewsets.ModelViewSet):
+class RelocationPeriodViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = RelocationPeriod.objects.all()
     serializer_class = RelocationPeriodSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
@@ -374,9 +669,12 @@ class RelocationPeriodViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== VEHICLES VIEWSETS ======================================
-class VehicleViewSet(viewsets.ModelViewSet):
+class VehicleViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Vehicle.objects.all()
     serializer_class = VehicleSerializer
+    query_plans = {
+        'list': {'select_related': ('company', 'correspondence'), 'expand': {'permits': ('carpermit_set',)}},
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['plate_number', 'vehicle_id']
     filterset_fields = ['organization', 'company', 'start_date', 'end_date']
@@ -384,7 +682,7 @@ class VehicleViewSet(viewsets.ModelViewSet):
     ordering = ['vehicle_id']
 
 
-class CarPermitViewSet(viewsets.ModelViewSet):
+class CarPermitViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = CarPermit.objects.all()
     serializer_class = CarPermitSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
@@ -394,9 +692,14 @@ class CarPermitViewSet(viewsets.ModelViewSet):
 
 
 # ====================================== CARD PERMITS VIEWSETS ======================================
-class CardPermitsViewSet(viewsets.ModelViewSet):
+class CardPermitsViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = CardPermits.objects.all()
     serializer_class = CardPermitsSerializer
+    pagination_class = KeysetPagination
+    keyset_ordering = ['-issue_date', '-permit_id']
+    query_plans = {
+        'list': {'select_related': ('cardphotos',)},
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['permit_number', 'person_guid']
     filterset_fields = ['permit_type', 'status', 'issue_date', 'expiration_date']
@@ -406,7 +709,7 @@ class CardPermitsViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def active(self, request):
         """Get only active card permits"""
-        active_cards = self.queryset.filter(status='Active')
+        active_cards = self.get_queryset().filter(status='Active')
         serializer = self.get_serializer(active_cards, many=True)
         return Response(serializer.data)
 
@@ -415,7 +718,7 @@ class CardPermitsViewSet(viewsets.ModelViewSet):
         """Get card permits expiring in the next 30 days"""
         from datetime import date, timedelta
         expiry_threshold = date.today() + timedelta(days=30)
-        expiring_cards = self.queryset.filter(
+        expiring_cards = self.get_queryset().filter(
             status='Active',
             expiration_date__lte=expiry_threshold,
             expiration_date__gte=date.today()
@@ -424,7 +727,7 @@ class CardPermitsViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class CardPhotosViewSet(viewsets.ModelViewSet):
+class CardPhotosViewSet(QueryPlanMixin, viewsets.ModelViewSet):
     queryset = CardPhotos.objects.all()
     serializer_class = CardPhotosSerializer
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
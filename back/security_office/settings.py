@@ -53,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',  # first, so it times the whole stack
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -163,7 +164,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Allow unauthenticated access for development
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.StandardPageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -172,6 +173,71 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Upper bound for the client-selectable ?page_size=
+MAX_PAGE_SIZE = 200
+
+# Cache Configuration
+# Local-memory by default; point 'default' at Redis/Memcached to share it across workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'security-office',
+    }
+}
+
+# Cached list responses of lookup tables (types, procedures, contacts, settings),
+# invalidated through per-table generation counters
+LOOKUP_CACHE_ALIAS = 'default'
+LOOKUP_CACHE_TIMEOUT = 300  # seconds
+
+# How often (seconds) core.settings_registry checks the Settings version stamp
+SETTINGS_REGISTRY_CHECK_INTERVAL = 2
+
+# Column filter facets (/api/<resource>/facets/)
+FACET_CACHE_TIMEOUT = 60  # seconds
+FACET_MAX_VALUES = 500
+
+# Per-route request metrics (/api/metrics, Prometheus text format)
+METRICS_ENABLED = True
+METRICS_MAX_ROUTES = 256  # routes beyond this are reported as route="other"
+METRICS_TOKEN = config('METRICS_TOKEN', default=None)  # if set, scrapes need "Authorization: Bearer <token>"
+
+# Dashboard statistics (/api/dashboard/stats/)
+DASHBOARD_CACHE_TIMEOUT = 30  # seconds
+DASHBOARD_LOCK_WAIT = 5  # seconds other workers wait for the one recomputing
+
+# Streaming exports (/api/<resource>/export/): rows fetched per database round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# Bulk correspondence import (/api/correspondence/bulk/)
+BULK_MAX_ROWS = 5000
+BULK_BATCH_SIZE = 500  # rows written per transaction
+
+# PDF field extraction (core/pdf_extraction.py): region templates keyed by name
+PDF_TEMPLATES_FILE = BASE_DIR / 'core' / 'pdf_templates.json'
+PDF_DEFAULT_TEMPLATE = 'russian_letter'
+
+# Batch PDF parsing (/api/parse-pdf-batch/) in a process pool
+PDF_BATCH_WORKERS = None  # pool processes; None = one per core
+PDF_BATCH_TIMEOUT = 20  # seconds per file
+PDF_BATCH_MAX_FILES = 50
+
+# Parse results of uploaded PDF/.msg files keyed by content hash (core/parse_cache.py)
+PARSE_CACHE_MAX_ENTRIES = 256  # per process, least recently used evicted first
+PARSE_CACHE_MAX_BYTES = 64 * 1024 * 1024  # per process, measured on the stored JSON
+PARSE_CACHE_PERSIST = False  # also store results in the parse_results table
+PARSE_CACHE_DB_MAX_ENTRIES = 10000
+
+# Background jobs (core/jobs.py, processed by `manage.py run_workers`)
+JOB_WORKERS = None  # worker processes; None = one per core
+JOB_VISIBILITY_TIMEOUT = 300  # seconds a claimed job is leased to its worker
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_BACKOFF = 10  # seconds before the first retry, doubled on each further one
+JOB_POLL_INTERVAL = 1  # seconds an idle worker waits before looking again
+
+# Server-side staging of extracted files (core/staging.py); `manage.py sweep_staged_files` deletes expired ones
+STAGING_TTL = 3600  # seconds
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -197,8 +263,13 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
+    'if-modified-since',
 ]
 
+# Let the frontend read the conditional GET validators
+CORS_EXPOSE_HEADERS = ['etag', 'last-modified']
+
 # Allow specific methods
 CORS_ALLOW_METHODS = [
     'DELETE',
@@ -260,8 +260,10 @@ const UniversalDataTable = ({
         );
       
       case 'attachments':
+        // List responses carry only attachments_count unless ?expand=attachments
         const attachments = Array.isArray(value) ? value : [];
-        if (attachments.length === 0) {
+        const attachmentsCount = Array.isArray(row.attachments) ? attachments.length : (row.attachments_count || 0);
+        if (attachmentsCount === 0) {
           return (
             <Typography variant="body2" color="textSecondary">
               لا توجد مرفقات
@@ -271,7 +273,7 @@ const UniversalDataTable = ({
         return (
           <Box sx={{ display: 'flex', alignItems: 'center', gap: 1 }}>
             <Chip
-              label={`${attachments.length} مرفق`}
+              label={`${attachmentsCount} مرفق`}
               color="info"
               size="small"
               icon={<AttachFileIcon />}
@@ -291,7 +293,8 @@ const UniversalDataTable = ({
       
       case 'status_logs':
         const logs = Array.isArray(value) ? value : [];
-        if (logs.length === 0) {
+        const logsCount = Array.isArray(row.status_logs) ? logs.length : (row.status_logs_count || 0);
+        if (logsCount === 0) {
           return (
             <Typography variant="body2" color="textSecondary">
               لا يوجد سجل
@@ -301,7 +304,7 @@ const UniversalDataTable = ({
         return (
           <Box sx={{ display: 'flex', alignItems: 'center', gap: 1 }}>
             <Chip
-              label={`${logs.length} إدخال`}
+              label={`${logsCount} إدخال`}
               color="default"
               size="small"
               icon={<HistoryIcon />}
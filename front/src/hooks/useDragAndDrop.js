@@ -40,26 +40,14 @@ export const useDragAndDrop = (formData, setFormData, setDragActive,resetForm) =
         const result = await response.json();
         
         if (result.success && result.attachments && result.attachments.length > 0) {
-          // Convert hex data back to File objects
-          const extractedFiles = result.attachments.map(attachment => {
-            // Convert hex string back to binary data
-            const binaryData = new Uint8Array(
-              attachment.data.match(/.{1,2}/g).map(byte => parseInt(byte, 16))
-            );
-            
-            // Create a new File object from the binary data
-            const file = new File([binaryData], attachment.name, {
-              type: attachment.mime_type || 'application/octet-stream'
-            });
-            
-            // Add size property for display
-            Object.defineProperty(file, 'size', {
-              value: attachment.size,
-              writable: false
-            });
-            
-            return file;
-          });
+          // Attachments stay staged on the server; keep their metadata and staged_id
+          // (upload and PDF parsing accept staged ids, so the bytes never come to the browser)
+          const extractedFiles = result.attachments.map(attachment => ({
+            name: attachment.name,
+            size: attachment.size,
+            type: attachment.mime_type || 'application/octet-stream',
+            staged_id: attachment.staged_id
+          }));
           
           // REPLACE previous attachments with MSG file + extracted files (don't append)
           const allFiles = [msgFile, ...extractedFiles];
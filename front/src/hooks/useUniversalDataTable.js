@@ -23,14 +23,18 @@ export const useUniversalDataTable = ({
   const [columnValuesCache, setColumnValuesCache] = useState({});
   
   const loadingRef = useRef(false);
+  // Columns the facets endpoint rejected; their values are collected from rows
+  const unfacetableColumnsRef = useRef(new Set());
+  // Keyset cursor for the next page (see back/core/pagination.py)
+  const nextCursorRef = useRef(null);
 
-  // Build filter parameters for API calls
-  const buildFilterParams = useCallback(() => {
+  // Build filter parameters for API calls (optionally without one column's own filter)
+  const buildFilterParams = useCallback((excludeColumn = null) => {
     const params = { ...defaultFilters };
     
     // Add column filters
     Object.entries(columnFilters).forEach(([column, values]) => {
-      if (values && values.length > 0) {
+      if (column !== excludeColumn && values && values.length > 0) {
         // Handle different column types
         switch (column) {
           case 'type':
@@ -126,7 +130,12 @@ export const useUniversalDataTable = ({
 
     try {
       const params = {
-        page: pageNum,
+        pagination: 'cursor',
+        // Deeper pages follow the cursor and skip the COUNT(*) already known
+        cursor: append ? nextCursorRef.current || undefined : undefined,
+        count: append ? 'false' : undefined,
+        // Endpoints without keyset support (and relevance-ranked searches) keep using page numbers
+        page: append && !nextCursorRef.current ? pageNum : undefined,
         page_size: pageSize,
         search: searchTerm,
         ordering: sortConfig.field && sortConfig.direction 
@@ -151,8 +160,13 @@ export const useUniversalDataTable = ({
         setCurrentPage(1);
       }
       
-      setTotalCount(responseData.count || newItems.length);
-      setHasMore(newItems.length === pageSize && responseData.next);
+      if (!append) {
+        setTotalCount(responseData.count || newItems.length);
+      }
+      nextCursorRef.current = responseData.next
+        ? new URL(responseData.next).searchParams.get('cursor')
+        : null;
+      setHasMore(Boolean(responseData.next));
       
     } catch (err) {
       console.error('Error fetching data:', err);
@@ -210,16 +224,49 @@ export const useUniversalDataTable = ({
 
   // Get unique values for column filters (with caching)
   const getColumnUniqueValues = useCallback(async (column) => {
+    // Values follow the table's search and the other columns' filters
+    const contextParams = {
+      ...buildFilterParams(column),
+      search: searchTerm || undefined
+    };
+    Object.keys(contextParams).forEach(key =>
+      contextParams[key] === undefined && delete contextParams[key]
+    );
+    const cacheKey = `${column}:${JSON.stringify(contextParams)}`;
+
     // Check cache first
-    if (columnValuesCache[column]) {
-      return columnValuesCache[column];
+    if (columnValuesCache[cacheKey]) {
+      return columnValuesCache[cacheKey];
     }
 
     try {
+      // Prefer the server-side facet endpoint (one GROUP BY query)
+      if (apiService.getFacets && !unfacetableColumnsRef.current.has(column)) {
+        try {
+          const facetResponse = await apiService.getFacets(column, contextParams);
+          const facetValues = (facetResponse.data.values || [])
+            .map(item => item.value)
+            .filter(value => value !== null && value !== undefined && value !== '');
+
+          setColumnValuesCache(prev => ({
+            ...prev,
+            [cacheKey]: facetValues
+          }));
+
+          return facetValues;
+        } catch (facetError) {
+          // 400: the field is not facetable on this resource
+          if (facetError.response?.status !== 400) {
+            throw facetError;
+          }
+          unfacetableColumnsRef.current.add(column);
+        }
+      }
+
       // Fetch all data to get unique values
       const response = await apiService.getAll({
         page_size: 1000,
-        ...defaultFilters
+        ...contextParams
       });
       
       const allData = response.data.results || response.data || [];
@@ -268,7 +315,7 @@ export const useUniversalDataTable = ({
       // Cache the values
       setColumnValuesCache(prev => ({
         ...prev,
-        [column]: sortedValues
+        [cacheKey]: sortedValues
       }));
       
       return sortedValues;
@@ -276,7 +323,7 @@ export const useUniversalDataTable = ({
       console.error('Error fetching column unique values:', error);
       return [];
     }
-  }, [apiService, defaultFilters, columnValuesCache]);
+  }, [apiService, buildFilterParams, searchTerm, columnValuesCache]);
 
   // Helper function to get nested values from objects
   const getNestedValue = (obj, column) => {
@@ -17,7 +17,7 @@ import {
   CreditCard as CardIcon,
   ReportProblem as AccidentIcon,
 } from '@mui/icons-material';
-import { apiService } from '../services/apiService';
+import { dashboardApi } from '../services/apiService';
 
 const StatCard = ({ title, value, icon, color = 'primary' }) => (
   <Card sx={{ height: '100%', transition: 'transform 0.2s', '&:hover': { transform: 'translateY(-4px)' } }}>
@@ -65,30 +65,17 @@ const Dashboard = () => {
       try {
         setLoading(true);
         
-        // Fetch statistics from all endpoints
-        const [
-          peopleResponse,
-          correspondenceResponse,
-          permitsResponse,
-          vehiclesResponse,
-          cardsResponse,
-          accidentsResponse,
-        ] = await Promise.all([
-          apiService.get('/people-history/'),
-          apiService.get('/correspondence/'),
-          apiService.get('/permits/'),
-          apiService.get('/vehicles/'),
-          apiService.get('/card-permits/'),
-          apiService.get('/accidents/'),
-        ]);
+        // All counters come from one cached aggregate endpoint
+        const { data } = await dashboardApi.getStats();
+        const { totals } = data;
 
         setStats({
-          people: peopleResponse.data.count || 0,
-          correspondence: correspondenceResponse.data.count || 0,
-          permits: permitsResponse.data.count || 0,
-          vehicles: vehiclesResponse.data.count || 0,
-          cards: cardsResponse.data.count || 0,
-          accidents: accidentsResponse.data.count || 0,
+          people: totals.people || 0,
+          correspondence: totals.correspondence || 0,
+          permits: totals.permits || 0,
+          vehicles: totals.vehicles || 0,
+          cards: totals.card_permits || 0,
+          accidents: totals.accidents || 0,
         });
       } catch (err) {
         console.error('Error fetching dashboard stats:', err);
@@ -111,6 +111,8 @@ function showAuthError(message, type = 'error') {
 export const peopleApi = {
   getAll: (params = {}) => apiService.get('/people-history/', { params }),
   getCurrentOnly: () => apiService.get('/people-history/current_only/'),
+  getFacets: (field, params = {}) => apiService.get('/people-history/facets/', { params: { ...params, field } }),
+  export: (params = {}, fileFormat = 'csv') => apiService.get('/people-history/export/', { params: { ...params, file_format: fileFormat }, responseType: 'blob' }),
   getById: (id) => apiService.get(`/people-history/${id}/`),
   getHistory: (id) => apiService.get(`/people-history/${id}/history/`),
   create: (data) => apiService.post('/people-history/', data),
@@ -120,8 +122,13 @@ export const peopleApi = {
 
 export const correspondenceApi = {
   getAll: (params = {}) => apiService.get('/correspondence/', { params }),
+  getFacets: (field, params = {}) => apiService.get('/correspondence/facets/', { params: { ...params, field } }),
+  export: (params = {}, fileFormat = 'csv') => apiService.get('/correspondence/export/', { params: { ...params, file_format: fileFormat }, responseType: 'blob' }),
   getById: (id) => apiService.get(`/correspondence/${id}/`),
+  getThread: (id) => apiService.get(`/correspondence/${id}/thread/`),
   create: (data) => apiService.post('/correspondence/', data),
+  bulkCreate: (rows, options = {}) => apiService.post('/correspondence/bulk/', { items: rows, ...options }),
+  transition: (ids, toStatus, options = {}) => apiService.post('/correspondence/transition/', { ids, to_status: toStatus, ...options }),
   update: (id, data) => apiService.put(`/correspondence/${id}/`, data),
   delete: (id) => apiService.delete(`/correspondence/${id}/`),
   addContact: (correspondenceId, contactData) => apiService.post('/correspondence-contacts/', {
@@ -149,6 +156,8 @@ export const correspondenceTypeProceduresApi = {
 
 export const correspondenceStatusLogsApi = {
   getAll: (params = {}) => apiService.get('/correspondence-status-logs/', { params }),
+  getFacets: (field, params = {}) => apiService.get('/correspondence-status-logs/facets/', { params: { ...params, field } }),
+  getDwellTimes: (params = {}) => apiService.get('/correspondence-status-logs/dwell-times/', { params }),
   getById: (id) => apiService.get(`/correspondence-status-logs/${id}/`),
   create: (data) => apiService.post('/correspondence-status-logs/', data),
   update: (id, data) => apiService.put(`/correspondence-status-logs/${id}/`, data),
@@ -175,9 +184,13 @@ export const attachmentsApi = {
     const formData = new FormData();
     formData.append('correspondence_id', correspondenceId);
     
-    // Add all files to FormData
+    // Add all files to FormData; attachments staged on the server (e.g. from a .msg) go by id
     files.forEach((file) => {
-      formData.append('files', file);
+      if (file.staged_id) {
+        formData.append('staged_ids', file.staged_id);
+      } else {
+        formData.append('files', file);
+      }
     });
     
     return apiService.post('/attachments/upload/', formData, {
@@ -194,6 +207,7 @@ export const attachmentsApi = {
 
 export const permitsApi = {
   getAll: (params = {}) => apiService.get('/permits/', { params }),
+  getFacets: (field, params = {}) => apiService.get('/permits/facets/', { params: { ...params, field } }),
   getActive: () => apiService.get('/permits/active/'),
   getExpiringSoon: () => apiService.get('/permits/expiring_soon/'),
   getById: (id) => apiService.get(`/permits/${id}/`),
@@ -204,6 +218,7 @@ export const permitsApi = {
 
 export const vehiclesApi = {
   getAll: (params = {}) => apiService.get('/vehicles/', { params }),
+  getFacets: (field, params = {}) => apiService.get('/vehicles/facets/', { params: { ...params, field } }),
   getById: (id) => apiService.get(`/vehicles/${id}/`),
   create: (data) => apiService.post('/vehicles/', data),
   update: (id, data) => apiService.patch(`/vehicles/${id}/`, data),
@@ -212,6 +227,7 @@ export const vehiclesApi = {
 
 export const cardPermitsApi = {
   getAll: (params = {}) => apiService.get('/card-permits/', { params }),
+  getFacets: (field, params = {}) => apiService.get('/card-permits/facets/', { params: { ...params, field } }),
   getActive: () => apiService.get('/card-permits/active/'),
   getExpiringSoon: () => apiService.get('/card-permits/expiring_soon/'),
   getById: (id) => apiService.get(`/card-permits/${id}/`),
@@ -247,4 +263,8 @@ export const companiesApi = {
   delete: (id) => apiService.delete(`/companies-history/${id}/`),
 };
 
+export const dashboardApi = {
+  getStats: () => apiService.get('/dashboard/stats/'),
+};
+
 export { apiService };
@@ -7,7 +7,12 @@ export const parsePdfContentViaBackend = async (file) => {
     const authToken = localStorage.getItem('authToken');
     
     const formData = new FormData();
-    formData.append('file', file);
+    if (file.staged_id) {
+      // Extracted from a .msg and staged on the server
+      formData.append('staged_id', file.staged_id);
+    } else {
+      formData.append('file', file);
+    }
     
     const response = await fetch(`${API_BASE_URL}/api/parse-pdf-content/`, {
       method: 'POST',